@@ -0,0 +1,1297 @@
+import sys
+import os
+import threading
+import time
+import math
+import random
+import argparse
+import json
+import statistics
+import sqlite3
+import tempfile
+import resource
+import subprocess
+import base64
+import quopri
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QT_VERSION_STR, QCoreApplication, QUrl, QTimer
+from PyQt5.QtGui import QPixmap, QIcon, QColor
+
+from homiBrowser import (
+    CHROMIUM_EPOCH_OFFSET, DEFAULT_RESOURCE_PROFILE, RESOURCE_PROFILES, BookmarkManager, BookmarkStore,
+    BrowserDataExporter, BrowserDataImporter, ContentFilter, ContentIndexer, FaviconStore, HistoryViewer,
+    RenderPool, SearchEngineRegistry, SearchSuggestionFetcher, SnapshotStore, SuggestionIndex, TabIndex,
+    TabSwitcher, WebBrowser, connect_database, database_size, headless_environment, migrate_database,
+    percentile, read_process_memory, run_render_pool, select_resource_profile, visit_frecency)
+
+# Benchmarks for the browser, run as "python benchmarks.py <name> [options]".
+# They import homiBrowser and drive the real classes against synthetic data
+# or the local fixture server below. Chromium's sandbox stays on; where it
+# cannot start (as root in some containers), set QTWEBENGINE_DISABLE_SANDBOX=1.
+
+
+def synthetic_words(rng, count):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "ex",
+                 "ob", "an", "id", "ul", "or", "en", "ys", "ch"]
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def bench_omnibox(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-omnibox")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--db", default="bench_omnibox.db")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    
+    rng = random.Random(42)
+    words = synthetic_words(rng, 5000)
+    domains = [f"{rng.choice(words)}{rng.choice(words)}.{rng.choice(['com', 'org', 'net', 'io'])}"
+               for _ in range(50000)]
+    
+    conn = connect_database(args.db)
+    migrate_database(conn)
+    existing = conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+    if existing < args.rows:
+        started = time.perf_counter()
+        now = time.time()
+        
+        def rows():
+            for i in range(existing, args.rows):
+                visited = now - rng.random() * 365 * 24 * 3600
+                visits = rng.randint(1, 20)
+                yield (f"https://{rng.choice(domains)}/{rng.choice(words)}/{rng.choice(words)}/{i}",
+                       " ".join(rng.choice(words) for _ in range(rng.randint(2, 6))).title(),
+                       visits,
+                       int(visited),
+                       visit_frecency(visited) + math.log(visits))
+        
+        with conn:
+            conn.executemany('''INSERT INTO urls (url, title, visit_count, last_visit, frecency)
+                                VALUES (?, ?, ?, ?, ?)''', rows())
+        print(f"Populated {args.rows - existing} urls in {time.perf_counter() - started:.1f}s")
+    conn.close()
+    
+    index = SuggestionIndex(args.db)
+    index.refresh_hot()
+    targets = [rng.choice(domains).split(".")[0] for _ in range(args.queries // 2)]
+    targets += [rng.choice(words) + " " + rng.choice(words)[:3] for _ in range(args.queries - len(targets))]
+    
+    latencies = []
+    for target in targets:
+        for end in range(1, len(target) + 1):
+            started = time.perf_counter()
+            index.search(target[:end])
+            latencies.append((time.perf_counter() - started) * 1000)
+    index.close()
+    
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{len(latencies)} keystrokes over {args.rows} urls: "
+          f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {latencies[-1]:.2f} ms")
+    within_budget = p99 <= args.budget_ms
+    print(f"p99 {'within' if within_budget else 'over'} the {args.budget_ms:.0f} ms budget")
+    return 0 if within_budget else 1
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    suggest_requests = 0
+    
+    BURST_PAGE = """<!doctype html><html><head><title>burst 0</title></head><body>
+<p>Tab event burst fixture</p>
+<script>
+let step = 0;
+const total = %(steps)d;
+const timer = setInterval(() => {
+    step += 1;
+    history.pushState({step}, '', '?step=' + step);
+    document.title = 'burst ' + step;
+    if (step >= total) clearInterval(timer);
+}, %(interval)d);
+</script></body></html>"""
+    
+    ARTICLE_PAGE = """<!doctype html><html><head><title>article %(number)d</title>
+<style>
+body { font: 16px/1.5 sans-serif; max-width: 50em; margin: auto; }
+.card { box-shadow: 0 2px 8px #0003; border-radius: 8px; padding: 1em; margin: 1em 0; }
+</style></head><body>
+<h1>Article %(number)d</h1>
+%(paragraphs)s
+<canvas id="chart" width="800" height="400"></canvas>
+<script>
+const context = document.getElementById('chart').getContext('2d');
+for (let i = 0; i < 5000; i++) {
+    context.fillStyle = `hsl(${i %% 360}, 70%%, 50%%)`;
+    context.fillRect((i * 37) %% 800, (i * 53) %% 400, 12, 12);
+}
+const cards = document.createElement('div');
+for (let i = 0; i < 1000; i++) {
+    const card = document.createElement('div');
+    card.className = 'card';
+    card.textContent = 'Card ' + i + ' of article %(number)d';
+    cards.appendChild(card);
+}
+document.body.appendChild(cards);
+</script></body></html>"""
+
+    def article_page(self, number):
+        # Text, layout and canvas work of a typical news or docs page, the
+        # same for a given number on every run.
+        rng = random.Random(number)
+        words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit",
+                 "sed", "do", "eiusmod", "tempor", "incididunt", "ut", "labore", "magna"]
+        paragraphs = "\n".join(f"<p>{' '.join(rng.choices(words, k=120))}</p>" for _ in range(60))
+        return self.ARTICLE_PAGE % {'number': number, 'paragraphs': paragraphs}
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if parts.path.startswith('/redirect/'):
+            remaining = int(parts.path.rsplit('/', 1)[1])
+            target = f"/redirect/{remaining - 1}" if remaining > 1 else '/burst'
+            self.send_response(302)
+            self.send_header('Location', target)
+            self.end_headers()
+            return
+        if parts.path == '/suggest':
+            FixtureRequestHandler.suggest_requests += 1
+            time.sleep(int(query.get('delay', ['0'])[0]) / 1000)
+            term = query.get('q', [''])[0]
+            data = json.dumps([term, [f"{term} {suffix}" for suffix in ("news", "weather", "maps")]]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-suggestions+json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if parts.path.startswith('/download/'):
+            self.send_download(parts.path.rsplit('/', 1)[1],
+                               int(query.get('size', [str(4 * 2**20)])[0]),
+                               int(query.get('rate', ['0'])[0]))
+            return
+        if parts.path == '/burst':
+            body = self.BURST_PAGE % {
+                'steps': int(query.get('steps', ['200'])[0]),
+                'interval': int(query.get('interval', ['1'])[0]),
+            }
+        elif parts.path.startswith('/article/'):
+            body = self.article_page(int(parts.path.rsplit('/', 1)[1]))
+        else:
+            time.sleep(int(query.get('delay', ['0'])[0]) / 1000)
+            body = f"<!doctype html><title>{parts.path}</title><p>{parts.path}</p>"
+        data = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def send_download(self, name, size, rate):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Disposition', f'attachment; filename="{name}"')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        chunk = bytes(64 * 1024)
+        sent = 0
+        started = time.monotonic()
+        try:
+            while sent < size:
+                part = chunk[:min(len(chunk), size - sent)]
+                self.wfile.write(part)
+                sent += len(part)
+                # Throttled so that downloads overlap long enough to queue.
+                if rate:
+                    delay = sent / rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, 0), FixtureRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def bench_tab_events(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-tab-events")
+    parser.add_argument("--tabs", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--redirects", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--budget-ms", type=float, default=16.0)
+    args = parser.parse_args(argv)
+    
+    headless_environment()
+    server, base_url = start_fixture_server()
+    workdir = tempfile.mkdtemp(prefix='homi-bench-')
+    app = QApplication([sys.argv[0]])
+    browser = WebBrowser(db_path=os.path.join(workdir, 'browser.db'))
+    browser.show()
+    
+    for i in range(args.tabs):
+        if i % 2:
+            browser.add_new_tab(f"{base_url}/redirect/{args.redirects}")
+        else:
+            browser.add_new_tab(f"{base_url}/burst?steps={args.steps}")
+    
+    # A 10 ms probe timer; any lateness is time the event loop spent busy.
+    lateness = []
+    probe_interval = 10
+    last = [time.perf_counter()]
+    
+    def probe():
+        now = time.perf_counter()
+        lateness.append(max(0.0, (now - last[0]) * 1000 - probe_interval))
+        last[0] = now
+    
+    probe_timer = QTimer()
+    probe_timer.timeout.connect(probe)
+    probe_timer.start(probe_interval)
+    QTimer.singleShot(int(args.seconds * 1000), app.quit)
+    app.exec_()
+    probe_timer.stop()
+    
+    received = browser.tab_events.received
+    delivered = browser.tab_events.delivered
+    browser.close()
+    server.shutdown()
+    
+    lateness.sort()
+    p50 = statistics.median(lateness)
+    p99 = lateness[int(len(lateness) * 0.99) - 1]
+    print(f"{args.tabs} tabs, {received} url/title signals coalesced into {delivered} updates")
+    print(f"event-loop lateness: p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {lateness[-1]:.2f} ms")
+    within_budget = p99 <= args.budget_ms
+    print(f"p99 {'within' if within_budget else 'over'} the {args.budget_ms:.0f} ms budget")
+    return 0 if within_budget else 1
+
+def wait_until(app, predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.001)
+    return True
+
+def process_tree_pids(pid):
+    # The UI process plus every QtWebEngineProcess it spawned.
+    pids = [pid]
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as children:
+                for child in children.read().split():
+                    pids += process_tree_pids(int(child))
+    except OSError:
+        pass
+    return pids
+
+def process_tree_rss(pid):
+    return sum(read_process_memory(child) or 0 for child in process_tree_pids(pid))
+
+def populate_benchmark_data(db_path, rows, rng):
+    conn = connect_database(db_path)
+    migrate_database(conn)
+    existing = conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+    if existing < rows:
+        words = synthetic_words(rng, 5000)
+        now = time.time()
+
+        def url_rows():
+            for i in range(existing, rows):
+                visited = now - rng.random() * 365 * 24 * 3600
+                yield (f"https://{rng.choice(words)}.example/{rng.choice(words)}/{i}",
+                       " ".join(rng.choice(words) for _ in range(rng.randint(2, 6))).title(),
+                       int(visited), visit_frecency(visited))
+
+        with conn:
+            conn.executemany('''INSERT INTO urls (url, title, visit_count, last_visit, frecency)
+                                VALUES (?, ?, 1, ?, ?)''', url_rows())
+            conn.execute('''INSERT INTO visits (url_id, visited_at)
+                            SELECT id, last_visit FROM urls WHERE id > ?''', (existing,))
+            conn.execute('''INSERT OR IGNORE INTO bookmarks (title, url)
+                            SELECT title, url FROM urls WHERE id > ?''', (existing,))
+    conn.close()
+
+def time_history_viewer(app, db_path):
+    conn = connect_database(db_path)
+    started = time.perf_counter()
+    viewer = HistoryViewer(conn, db_path)
+    viewer.show()
+    wait_until(app, lambda: viewer.model.rowCount() > 0 or viewer.model.exhausted, 30)
+    elapsed = time.perf_counter() - started
+    viewer.close()
+    conn.close()
+    return elapsed * 1000
+
+def time_bookmark_manager(app, db_path):
+    started = time.perf_counter()
+    store = BookmarkStore(db_path)
+    loaded = time.perf_counter()
+    manager = BookmarkManager(store)
+    manager.show()
+    app.processEvents()
+    opened = time.perf_counter()
+    manager.close()
+    store.conn.close()
+    return (loaded - started) * 1000, (opened - loaded) * 1000
+
+def bench_suite(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-suite")
+    parser.add_argument("--tabs", type=int, default=20)
+    parser.add_argument("--private-tabs", type=int, default=10)
+    parser.add_argument("--rows", default="10000,100000,1000000",
+                        help="comma-separated history/bookmark sizes for the dialog benchmarks")
+    parser.add_argument("--history-writes", type=int, default=20000)
+    parser.add_argument("--toggles", type=int, default=200)
+    parser.add_argument("--downloads", type=int, default=12)
+    parser.add_argument("--download-size", type=int, default=4 * 2**20)
+    parser.add_argument("--download-rate", type=int, default=2 * 2**20)
+    parser.add_argument("--data-dir", help="reuse populated databases between runs")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    headless_environment()
+    server, base_url = start_fixture_server()
+    workdir = tempfile.mkdtemp(prefix='homi-bench-')
+    data_dir = args.data_dir or workdir
+    os.makedirs(data_dir, exist_ok=True)
+    app = QApplication([sys.argv[0]])
+    rng = random.Random(42)
+    metrics = {}
+
+    def record(name, value, unit, better='lower'):
+        metrics[name] = {'value': round(value, 3), 'unit': unit, 'better': better}
+        print(f"{name}: {value:.2f} {unit}")
+
+    peak_rss = [0]
+
+    def sample_rss():
+        peak_rss[0] = max(peak_rss[0], process_tree_rss(os.getpid()))
+
+    rss_timer = QTimer()
+    rss_timer.timeout.connect(sample_rss)
+    rss_timer.start(100)
+
+    # Dialogs against pre-populated databases of increasing size.
+    for rows in [int(size) for size in args.rows.split(",") if size]:
+        db_path = os.path.join(data_dir, f"bench_{rows}.db")
+        populate_benchmark_data(db_path, rows, rng)
+        record(f"history_viewer_open_{rows}", time_history_viewer(app, db_path), "ms")
+        load_ms, open_ms = time_bookmark_manager(app, db_path)
+        record(f"bookmark_store_load_{rows}", load_ms, "ms")
+        record(f"bookmark_manager_open_{rows}", open_ms, "ms")
+
+    browser = WebBrowser(db_path=os.path.join(workdir, 'browser.db'))
+    browser.show()
+    wait_until(app, lambda: browser.omnibox is not None, 10)
+
+    # Opening tabs and time to loadFinished against the local fixture server.
+    open_times = []
+    load_times = []
+    for i in range(args.tabs):
+        started = time.perf_counter()
+        web_view = browser.add_new_tab(f"{base_url}/page/{i}")
+        open_times.append((time.perf_counter() - started) * 1000)
+        web_view.loadFinished.connect(
+            lambda ok, started=started: load_times.append((time.perf_counter() - started) * 1000))
+    wait_until(app, lambda: len(load_times) >= args.tabs, 60)
+    record("tab_open_p50", statistics.median(open_times), "ms")
+    record("tab_open_p95", percentile(open_times, 0.95), "ms")
+    if load_times:
+        record("load_finished_p50", statistics.median(load_times), "ms")
+        record("load_finished_p95", percentile(load_times, 0.95), "ms")
+    
+    # Private tabs share one off-the-record profile instead of one each.
+    private_times = []
+    private_loads = []
+    rss_before = process_tree_rss(os.getpid())
+    for i in range(args.private_tabs):
+        started = time.perf_counter()
+        web_view = browser.add_new_tab(f"{base_url}/private/{i}", private=True)
+        private_times.append((time.perf_counter() - started) * 1000)
+        web_view.loadFinished.connect(lambda ok: private_loads.append(ok))
+    wait_until(app, lambda: len(private_loads) >= args.private_tabs, 60)
+    if private_times:
+        record("private_tab_open_p50", statistics.median(private_times), "ms")
+        record("private_tabs_rss_delta", (process_tree_rss(os.getpid()) - rss_before) / 2**20, "MB")
+        record("private_profiles_created", browser.profiles.private_sessions, "profiles")
+
+    # add_to_history: cost on the UI thread and end-to-end write throughput.
+    recorder = browser.history_recorder
+    flushed_before = recorder.stats()['flushed']
+    started = time.perf_counter()
+    for i in range(args.history_writes):
+        browser.add_to_history(f"Page {i}", f"{base_url}/history/{i}")
+    queued = time.perf_counter() - started
+    recorder.flush()
+    wait_until(app, lambda: recorder.stats()['pending'] == 0, 120)
+    written = time.perf_counter() - started
+    record("add_to_history_calls_per_s", args.history_writes / queued, "ops/s", better='higher')
+    record("add_to_history_rows_per_s",
+           (recorder.stats()['flushed'] - flushed_before) / written, "rows/s", better='higher')
+
+    # toggle_bookmark on a loaded page.
+    browser.tabs.setCurrentIndex(0)
+    toggle_times = []
+    for _ in range(args.toggles):
+        started = time.perf_counter()
+        browser.toggle_bookmark()
+        toggle_times.append((time.perf_counter() - started) * 1000)
+    record("toggle_bookmark_p50", statistics.median(toggle_times), "ms")
+    record("toggle_bookmark_p99", percentile(toggle_times, 0.99), "ms")
+
+    # Many large downloads through the scheduler: concurrency has to stay
+    # within the limit and the UI process should stay mostly idle.
+    scheduler = browser.download_scheduler
+    scheduler.download_dir = os.path.join(workdir, 'downloads')
+    peak_active = [0]
+
+    def sample_downloads():
+        peak_active[0] = max(peak_active[0], scheduler.active_count())
+
+    download_timer = QTimer()
+    download_timer.timeout.connect(sample_downloads)
+    download_timer.start(20)
+    jobs_before = len(scheduler.jobs)
+    page = browser.tabs.currentWidget().page()
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    for i in range(args.downloads):
+        page.download(QUrl(f"{base_url}/download/file{i}.bin"
+                           f"?size={args.download_size}&rate={args.download_rate}"))
+    wait_until(app, lambda: len(scheduler.jobs) - jobs_before >= args.downloads and
+               all(job.state in ('completed', 'cancelled', 'interrupted')
+                   for job in scheduler.jobs[jobs_before:]), 600)
+    elapsed = time.perf_counter() - started
+    download_timer.stop()
+    completed = sum(1 for job in scheduler.jobs[jobs_before:] if job.state == 'completed')
+    record("downloads_wall", elapsed, "s")
+    record("downloads_ui_cpu_share", (time.process_time() - cpu_started) / elapsed * 100, "%")
+    record("downloads_completed", completed, "files", better='higher')
+    record("downloads_peak_active", peak_active[0], "downloads")
+    queueing_ok = peak_active[0] <= scheduler.max_concurrent and completed == args.downloads
+
+    sample_rss()
+    rss_timer.stop()
+    record("peak_rss_ui", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "MB")
+    record("peak_rss_total", peak_rss[0] / 2**20, "MB")
+
+    browser.close()
+    server.shutdown()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    results = {
+        'commit': commit or None,
+        'timestamp': int(time.time()),
+        'python': sys.version.split()[0],
+        'qt': QT_VERSION_STR,
+        'options': vars(args),
+        'metrics': metrics,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f"Results written to {args.output}")
+
+    status = 0
+    if not queueing_ok:
+        print(f"Download queueing check failed: peak {peak_active[0]} active "
+              f"(limit {scheduler.max_concurrent}), {completed}/{args.downloads} completed")
+        status = 1
+    if args.compare and compare_results(args.compare, results, args.tolerance):
+        status = 1
+    return status
+
+def compare_results(baseline_path, results, tolerance):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = 0
+    print(f"Compared with {baseline.get('commit') or baseline_path}:")
+    for name, current in results['metrics'].items():
+        previous = baseline.get('metrics', {}).get(name)
+        if previous is None or not previous['value']:
+            continue
+        change = (current['value'] - previous['value']) / previous['value']
+        worse = change > tolerance if current['better'] == 'lower' else change < -tolerance
+        regressions += worse
+        print(f"  {name}: {previous['value']} -> {current['value']} {current['unit']} "
+              f"({change:+.0%}){'  REGRESSION' if worse else ''}")
+    return regressions
+
+def synthetic_filter_list(rng, words, rule_count):
+    lines = ["[Adblock Plus 2.0]", "! Title: synthetic benchmark list"]
+    types = ["script", "image", "xmlhttprequest", "stylesheet", "subdocument"]
+    for i in range(rule_count):
+        kind = rng.random()
+        word = rng.choice(words)
+        if kind < 0.6:
+            lines.append(f"||{word}{i}.{rng.choice(['com', 'net', 'io'])}^")
+        elif kind < 0.7:
+            lines.append(f"||{word}{i}.com^$third-party,{rng.choice(types)}")
+        elif kind < 0.85:
+            lines.append(f"/{word}/{rng.choice(words)}{i}*.js")
+        elif kind < 0.9:
+            lines.append(f"-{word}-{i}-banner.$image,domain={rng.choice(words)}.com|~{rng.choice(words)}.org")
+        elif kind < 0.95:
+            lines.append(f"@@||{rng.choice(words)}{i}.com/{word}^")
+        else:
+            lines.append(f"{rng.choice(words)}.com##.{word}-{i}")
+    return lines
+
+def bench_content_filter(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-content-filter")
+    parser.add_argument("--lists", nargs="*", help="filter lists to compile (default: a synthetic list)")
+    parser.add_argument("--urls", help="file with one request URL per line (default: synthetic)")
+    parser.add_argument("--rules", type=int, default=80000)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--budget-us", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    words = synthetic_words(rng, 5000)
+    workdir = tempfile.mkdtemp(prefix='homi-filter-')
+    lists = args.lists
+    if not lists:
+        lists = [os.path.join(workdir, 'synthetic.txt')]
+        with open(lists[0], 'w') as synthetic:
+            synthetic.write("\n".join(synthetic_filter_list(rng, words, args.rules)))
+
+    cache_path = os.path.join(workdir, 'content_filter.cache')
+    content_filter = ContentFilter(lists, cache_path)
+    content_filter.load()
+    compile_stats = content_filter.stats()
+    content_filter = ContentFilter(lists, cache_path)
+    content_filter.load()
+    cache_stats = content_filter.stats()
+    print(f"{compile_stats['rules']} rules ({compile_stats['skipped']} lines skipped): "
+          f"compiled in {compile_stats['seconds'] * 1000:.0f} ms, "
+          f"loaded from cache in {cache_stats['seconds'] * 1000:.0f} ms "
+          f"({os.path.getsize(cache_path) / 2**20:.1f} MB)")
+
+    if args.urls:
+        with open(args.urls) as url_file:
+            urls = [line.strip() for line in url_file if line.strip()]
+    else:
+        with open(lists[0]) as filter_list:
+            block_hosts = [line[2:-2] for line in filter_list if line.startswith('||') and line.endswith('^\n')]
+        urls = []
+        for _ in range(args.requests):
+            kind = rng.random()
+            if kind < 0.2 and block_hosts:
+                host = "cdn." + rng.choice(block_hosts)
+            else:
+                host = f"{rng.choice(words)}.{rng.choice(['com', 'org', 'net'])}"
+            path = "/".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+            suffix = rng.choice(['.js', '.png', '.css', '', '?id=' + str(rng.randint(1, 10**6))])
+            urls.append(f"https://{host}/{path}{suffix}")
+
+    first_parties = [f"{rng.choice(words)}.com" for _ in range(100)]
+    resource_types = ['script', 'image', 'xmlhttprequest', 'stylesheet', 'subdocument', 'other']
+    requests = []
+    for url in urls:
+        host = urlsplit(url).hostname or ""
+        requests.append((url, host, rng.choice(first_parties), rng.choice(resource_types)))
+
+    latencies = []
+    blocked = 0
+    for url, host, first_party, resource_type in requests:
+        started = time.perf_counter()
+        blocked += content_filter.should_block(url, host, first_party, resource_type)
+        latencies.append((time.perf_counter() - started) * 1e6)
+
+    p50 = statistics.median(latencies)
+    p99 = percentile(latencies, 0.99)
+    print(f"{len(requests)} requests, {blocked} blocked: "
+          f"p50 {p50:.1f} us, p99 {p99:.1f} us, max {max(latencies):.1f} us")
+    within_budget = p99 <= args.budget_us
+    print(f"p99 {'within' if within_budget else 'over'} the {args.budget_us:.0f} us budget")
+    return 0 if within_budget else 1
+
+def bench_suggestions(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-suggestions")
+    parser.add_argument("--phrases", type=int, default=20)
+    parser.add_argument("--keystroke-ms", type=int, default=60)
+    parser.add_argument("--server-delay-ms", type=int, default=40)
+    args = parser.parse_args(argv)
+
+    server, base_url = start_fixture_server()
+    workdir = tempfile.mkdtemp(prefix='homi-suggest-')
+    db_path = os.path.join(workdir, 'browser.db')
+    conn = connect_database(db_path)
+    migrate_database(conn)
+    conn.close()
+
+    app = QCoreApplication([sys.argv[0]])
+    registry = SearchEngineRegistry(db_path)
+    registry.add("Fixture", "fx", f"{base_url}/search?q={{searchTerms}}",
+                 f"{base_url}/suggest?delay={args.server_delay_ms}&q={{searchTerms}}")
+    registry.set_default(registry.by_keyword("fx")['id'])
+    fetcher = SearchSuggestionFetcher(registry)
+
+    received = []
+    fetcher.suggestions_ready.connect(lambda text, suggestions: received.append((time.perf_counter(), text)))
+    rng = random.Random(42)
+    words = synthetic_words(rng, 500)
+    phrases = [" ".join(rng.choice(words) for _ in range(2)) for _ in range(args.phrases)]
+
+    def type_phrases():
+        keystrokes = 0
+        latencies = []
+        final_ok = 0
+        for phrase in phrases:
+            for end in range(1, len(phrase) + 1):
+                typed_at = time.perf_counter()
+                count = len(received)
+                fetcher.request(phrase[:end])
+                keystrokes += 1
+                wait_until(app, lambda: False, args.keystroke_ms / 1000)
+                answered = [at for at, text in received[count:] if text == phrase[:end]]
+                if answered:
+                    latencies.append((answered[0] - typed_at) * 1000)
+            # The last prefix is the one the user is looking at.
+            wait_until(app, lambda: received and received[-1][1] == phrase, 2)
+            final_ok += bool(received) and received[-1][1] == phrase
+        return keystrokes, latencies, final_ok
+
+    for label in ("cold", "warm"):
+        sent_before = fetcher.requests_sent
+        server_before = FixtureRequestHandler.suggest_requests
+        hits_before = fetcher.cache_hits
+        keystrokes, latencies, final_ok = type_phrases()
+        print(f"{label}: {keystrokes} keystrokes, {fetcher.requests_sent - sent_before} requests sent, "
+              f"{FixtureRequestHandler.suggest_requests - server_before} reached the server, "
+              f"{fetcher.cache_hits - hits_before} cache hits; "
+              f"{final_ok}/{len(phrases)} phrases got suggestions for their final text"
+              + (f"; p50 {statistics.median(latencies):.1f} ms to suggestions" if latencies else ""))
+
+    server.shutdown()
+    return 0
+
+def bench_tab_switcher(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-tab-switcher")
+    parser.add_argument("--tabs", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--budget-ms", type=float, default=16.0)
+    args = parser.parse_args(argv)
+
+    headless_environment()
+    app = QApplication([sys.argv[0]])
+    rng = random.Random(42)
+    words = synthetic_words(rng, 3000)
+
+    # Plain objects stand in for tabs: the index never touches the widgets.
+    index = TabIndex()
+    tabs = [object() for _ in range(args.tabs)]
+    thumbnail = QPixmap(640, 400)
+    thumbnail.fill(QColor("#88aacc"))
+    for i, tab in enumerate(tabs):
+        title = " ".join(rng.choice(words) for _ in range(rng.randint(2, 8))).title()
+        index.update(tab, f"https://{rng.choice(words)}.com/{rng.choice(words)}/{i}", title)
+        if i % 5 == 0:
+            index.set_thumbnail(tab, thumbnail)
+    for _ in range(args.tabs * 2):
+        index.touch(rng.choice(tabs))
+
+    switcher = TabSwitcher(index)
+    switcher.show()
+    app.processEvents()
+
+    latencies = []
+    for _ in range(args.queries):
+        target = index.entries[rng.choice(tabs)]['title'].lower().split()
+        query = " ".join(word[:rng.randint(2, 4)] for word in rng.sample(target, min(2, len(target))))
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            switcher.search_input.setText(query[:end])
+            app.processEvents()
+            latencies.append((time.perf_counter() - started) * 1000)
+        switcher.search_input.clear()
+        app.processEvents()
+
+    p50 = statistics.median(latencies)
+    p99 = percentile(latencies, 0.99)
+    print(f"{len(latencies)} keystrokes over {args.tabs} tabs: "
+          f"p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {max(latencies):.2f} ms "
+          f"({len(index.thumbnails)} thumbnails cached)")
+    within_budget = p99 <= args.budget_ms
+    print(f"p99 {'within' if within_budget else 'over'} the {args.budget_ms:.0f} ms budget")
+    return 0 if within_budget else 1
+
+def synthetic_browser_profile(path, format, visits, places, bookmarks, rng):
+    words = synthetic_words(rng, 2000)
+    urls = [f"https://{rng.choice(words)}.{rng.choice(['com', 'org', 'net'])}/{rng.choice(words)}/{i}"
+            for i in range(places)]
+    titles = [" ".join(rng.choice(words) for _ in range(rng.randint(2, 6))).title() for _ in range(places)]
+    # Popular pages get most of the visits, as in real histories.
+    weights = [1 / (rank + 1) for rank in range(places)]
+    started = time.time() - 365 * 86400
+    step = 365 * 86400 / visits
+    place_ids = rng.choices(range(1, places + 1), weights=weights, k=visits)
+
+    conn = sqlite3.connect(path)
+    with conn:
+        if format == 'firefox':
+            conn.execute("CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT, title TEXT)")
+            conn.execute("CREATE TABLE moz_historyvisits (id INTEGER PRIMARY KEY, place_id INTEGER, visit_date INTEGER)")
+            conn.execute("CREATE INDEX moz_historyvisits_dateindex ON moz_historyvisits (visit_date)")
+            conn.execute("CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER, title TEXT)")
+            conn.executemany("INSERT INTO moz_places (id, url, title) VALUES (?, ?, ?)",
+                             ((i + 1, urls[i], titles[i]) for i in range(places)))
+            conn.executemany("INSERT INTO moz_historyvisits (place_id, visit_date) VALUES (?, ?)",
+                             ((place_id, int((started + i * step) * 1000000)) for i, place_id in enumerate(place_ids)))
+            conn.executemany("INSERT INTO moz_bookmarks (type, fk, title) VALUES (1, ?, ?)",
+                             ((i + 1, titles[i]) for i in range(bookmarks)))
+        else:
+            conn.execute("CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT)")
+            conn.execute("CREATE TABLE visits (id INTEGER PRIMARY KEY, url INTEGER, visit_time INTEGER)")
+            conn.execute("CREATE INDEX visits_time_index ON visits (visit_time)")
+            conn.executemany("INSERT INTO urls (id, url, title) VALUES (?, ?, ?)",
+                             ((i + 1, urls[i], titles[i]) for i in range(places)))
+            conn.executemany("INSERT INTO visits (url, visit_time) VALUES (?, ?)",
+                             ((place_id, int((started + i * step + CHROMIUM_EPOCH_OFFSET) * 1000000))
+                              for i, place_id in enumerate(place_ids)))
+    conn.close()
+
+def bench_content_search(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-content-search")
+    parser.add_argument("--pages", type=int, default=30000)
+    parser.add_argument("--words", type=int, default=500, help="mean words per page")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    vocabulary = synthetic_words(rng, 20000)
+    # Word frequencies follow Zipf's law, so common words match thousands of
+    # pages and rare ones a handful.
+    cum_weights = []
+    total = 0.0
+    for rank in range(len(vocabulary)):
+        total += 1 / (rank + 1)
+        cum_weights.append(total)
+
+    workdir = tempfile.mkdtemp(prefix='homi-content-')
+    db_path = os.path.join(workdir, 'browser.db')
+    conn = connect_database(db_path)
+    migrate_database(conn)
+
+    indexer = ContentIndexer(db_path, max_pages=args.pages, max_mb=1024, flush_interval=0.5,
+                             max_pending=args.pages)
+    pages = []
+    for i in range(args.pages):
+        count = rng.randint(args.words // 2, args.words * 3 // 2)
+        text = " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=count))
+        title = " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=4)).title()
+        pages.append((f"https://{rng.choice(vocabulary)}.com/{i}", title, text))
+
+    started = time.perf_counter()
+    for url, title, text in pages:
+        indexer.record(url, title, text)
+    indexer.stop()
+    elapsed = time.perf_counter() - started
+    stats = indexer.stats()
+    print(f"Indexed {stats['indexed']:,} pages in {elapsed:.1f} s ({stats['indexed'] / elapsed:,.0f} pages/s, "
+          f"{database_size(conn) / 2**20:.0f} MB database)")
+
+    # Revisits and the same text under another URL do not add rows.
+    indexer = ContentIndexer(db_path, max_pages=args.pages, max_mb=1024, max_pending=args.pages)
+    revisits = rng.sample(pages, min(1000, len(pages)))
+    started = time.perf_counter()
+    for url, title, text in revisits:
+        indexer.record(url, title, text)
+        indexer.record(url + "?utm_source=bench", title, text)
+    indexer.stop()
+    elapsed = time.perf_counter() - started
+    stats = indexer.stats()
+    stored = conn.execute("SELECT COUNT(*) FROM page_text").fetchone()[0]
+    print(f"Revisited {len(revisits) * 2:,} pages in {elapsed:.2f} s: {stats['indexed']} new texts, "
+          f"{stats['unchanged']:,} unchanged, {stored:,} texts stored")
+
+    latencies = []
+    results = 0
+    for _ in range(args.queries):
+        words = rng.choice(pages)[2].split()
+        query = " ".join(rng.sample(words, min(rng.randint(1, 3), len(words))))
+        started = time.perf_counter()
+        results += len(ContentIndexer.search(conn, query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    conn.close()
+
+    p50 = statistics.median(latencies)
+    p99 = percentile(latencies, 0.99)
+    print(f"{args.queries} queries over {args.pages:,} pages: p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+          f"max {max(latencies):.2f} ms ({results / args.queries:.1f} results per query)")
+    within_budget = p99 <= args.budget_ms
+    print(f"p99 {'within' if within_budget else 'over'} the {args.budget_ms:.0f} ms budget")
+    return 0 if within_budget else 1
+
+def bench_favicons(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-favicons")
+    parser.add_argument("--pages", type=int, default=50000)
+    parser.add_argument("--hosts", type=int, default=5000)
+    parser.add_argument("--icons", type=int, default=1500)
+    parser.add_argument("--rows", type=int, default=40, help="rows visible at once")
+    parser.add_argument("--budget-ms", type=float, default=16.0)
+    args = parser.parse_args(argv)
+
+    headless_environment()
+    # QPixmap needs a QGuiApplication; the reference keeps it alive for the
+    # whole run.
+    app = QApplication([sys.argv[0]])
+    rng = random.Random(42)
+    words = synthetic_words(rng, args.hosts)
+
+    workdir = tempfile.mkdtemp(prefix='homi-favicons-')
+    db_path = os.path.join(workdir, 'browser.db')
+    conn = connect_database(db_path)
+    migrate_database(conn)
+
+    icons = []
+    for _ in range(args.icons):
+        pixmap = QPixmap(32, 32)
+        pixmap.fill(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        icons.append(QIcon(pixmap))
+    # Many hosts share an icon, as sites of one platform or CDN do.
+    hosts = [(f"{word}.com", icons[i % len(icons)]) for i, word in enumerate(words)]
+    # A few sites account for most of a history.
+    weights = [1 / (rank + 1) for rank in range(len(hosts))]
+    pages = []
+    for i, (host, icon) in enumerate(rng.choices(hosts, weights=weights, k=args.pages)):
+        pages.append((f"https://{host}/{rng.choice(words)}/{i}", icon))
+
+    store = FaviconStore(db_path, flush_interval=0.5)
+    started = time.perf_counter()
+    for url, icon in pages:
+        store.store(url, icon)
+    elapsed = time.perf_counter() - started
+    store.stop()
+    stored_icons, stored_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM favicons").fetchone()
+    print(f"Stored {args.pages:,} page icons in {elapsed:.1f} s ({elapsed * 1e6 / args.pages:.0f} us each on the "
+          f"GUI thread): {stored_icons:,} distinct images, {stored_bytes / 1024:.0f} KB")
+
+    # A view only asks for the rows it paints; scrolling top to bottom is
+    # the worst case, since every row is new.
+    def scroll(store, urls):
+        latencies = []
+        for start in range(0, len(urls), args.rows):
+            started = time.perf_counter()
+            for url in urls[start:start + args.rows]:
+                store.icon(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    urls = [url for url, _ in pages]
+    # Unknown pages of known hosts fall back to the host's icon.
+    urls += [f"https://{rng.choice(hosts)[0]}/unvisited/{i}" for i in range(args.pages // 10)]
+    store = FaviconStore(db_path)
+    cold = scroll(store, urls)
+    cold_stats = store.stats()
+    # Repaints of the last few screens, as when scrolling back and forth.
+    warm = scroll(store, urls[-args.rows * 5:] * 10)
+    stats = store.stats()
+    store.stop()
+    conn.close()
+    del app
+
+    for label, latencies in (("Cold", cold), ("Warm", warm)):
+        print(f"{label} scroll, {args.rows} rows per paint: p50 {statistics.median(latencies):.2f} ms, "
+              f"p99 {percentile(latencies, 0.99):.2f} ms, max {max(latencies):.2f} ms")
+    print(f"Cold: {cold_stats['decoded']:,} decodes and {cold_stats['queries']:,} queries for {len(urls):,} rows; "
+          f"warm: {stats['decoded'] - cold_stats['decoded']} decodes and "
+          f"{stats['queries'] - cold_stats['queries']} queries for {args.rows * 50:,} rows")
+    within_budget = percentile(cold, 0.99) <= args.budget_ms
+    print(f"Cold p99 {'within' if within_budget else 'over'} the {args.budget_ms:.0f} ms frame budget")
+    return 0 if within_budget else 1
+
+def synthetic_mhtml(url, title, parts):
+    # Laid out the way Chromium writes a saved page: quoted-printable text,
+    # base64 binaries, one Content-Location per part.
+    boundary = "----MultipartBoundary--homiBenchmark----"
+    lines = [
+        "From: <Saved by Blink>",
+        f"Snapshot-Content-Location: {url}",
+        f"Subject: {title}",
+        "MIME-Version: 1.0",
+        f'Content-Type: multipart/related;\r\n\ttype="text/html";\r\n\tboundary="{boundary}"',
+        "",
+    ]
+    for location, content_type, body in parts:
+        binary = not content_type.startswith('text/')
+        lines += [
+            f"--{boundary}",
+            f"Content-Type: {content_type}",
+            f"Content-Transfer-Encoding: {'base64' if binary else 'quoted-printable'}",
+            f"Content-Location: {location}",
+            "",
+            (base64.encodebytes(body) if binary else quopri.encodestring(body)).decode('ascii'),
+        ]
+    lines.append(f"--{boundary}--")
+    return "\r\n".join(lines).encode('ascii')
+
+def bench_snapshots(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-snapshots")
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--reads", type=int, default=200, help="snapshots opened for the serving test")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="p99 to serve a page and its resources")
+    args = parser.parse_args(argv)
+
+    headless_environment()
+    app = QApplication([sys.argv[0]])
+    rng = random.Random(42)
+    words = synthetic_words(rng, 5000)
+
+    def text(size):
+        return " ".join(rng.choices(words, k=size // 6)).encode()
+
+    # Every site has a stylesheet, a script and a logo that all of its pages
+    # load, plus a pool of images that pages pick from; page text and the
+    # photos on a page are unique.
+    sites = []
+    for i in range(args.sites):
+        base = f"https://{words[i]}.example"
+        shared = [(f"{base}/static/site.css", 'text/css', text(40000)),
+                  (f"{base}/static/app.js", 'application/javascript', text(120000)),
+                  (f"{base}/static/logo.png", 'image/png', rng.randbytes(24000))]
+        pool = [(f"{base}/images/{j}.jpg", 'image/jpeg', rng.randbytes(30000)) for j in range(10)]
+        sites.append((base, shared, pool))
+
+    workdir = tempfile.mkdtemp(prefix='homi-snapshots-')
+    db_path = os.path.join(workdir, 'browser.db')
+    conn = connect_database(db_path)
+    migrate_database(conn)
+
+    def save_pages(count, start):
+        files = []
+        for i in range(start, start + count):
+            base, shared, pool = sites[i % len(sites)]
+            url = f"{base}/articles/{i}"
+            parts = [(url, 'text/html', b"<html><head><title>Article</title></head><body>" + text(30000)
+                      + b"</body></html>")]
+            parts += shared + rng.sample(pool, 2)
+            parts += [(f"{url}/photo-{j}.jpg", 'image/jpeg', rng.randbytes(15000)) for j in range(2)]
+            path = os.path.join(workdir, f"{i}.mhtml")
+            with open(path, 'wb') as f:
+                f.write(synthetic_mhtml(url, f"Article {i}", parts))
+            files.append((path, url))
+        return files
+
+    files = save_pages(args.pages, 0)
+    mhtml_bytes = sum(os.path.getsize(path) for path, _ in files)
+    store = SnapshotStore(db_path, max_mb=4096)
+    started = time.perf_counter()
+    for path, url in files:
+        store.add(path, url, None)
+    store.stop()
+    elapsed = time.perf_counter() - started
+    app.processEvents()
+    stats = store.stats()
+    print(f"Saved {stats['ingested']:,} pages ({mhtml_bytes / 2**20:.0f} MB of MHTML) in {elapsed:.1f} s "
+          f"({stats['ingested'] / elapsed:.0f} pages/s, {mhtml_bytes / 2**20 / elapsed:.0f} MB/s)")
+    print(f"{stats['snapshot_bytes'] / 2**20:.0f} MB of parts stored as {stats['blobs']:,} distinct bodies: "
+          f"{stats['blob_bytes'] / 2**20:.0f} MB after deduplication "
+          f"({stats['snapshot_bytes'] / stats['blob_bytes']:.1f}x), {stats['stored_bytes'] / 2**20:.0f} MB "
+          f"compressed ({mhtml_bytes / stats['stored_bytes']:.1f}x smaller than the MHTML files)")
+
+    # Opening a snapshot reads the page and then every resource it refers to.
+    snapshots = [row[0] for row in conn.execute("SELECT id FROM snapshots")]
+    latencies = []
+    served_bytes = 0
+    for snapshot_id in rng.sample(snapshots, min(args.reads, len(snapshots))):
+        started = time.perf_counter()
+        served_bytes += len(store.read(snapshot_id)[1])
+        for (location,) in conn.execute('''SELECT location FROM snapshot_parts
+                                           WHERE snapshot_id = ? AND position > 0''', (snapshot_id,)):
+            served_bytes += len(store.read(snapshot_id, location)[1])
+        latencies.append((time.perf_counter() - started) * 1000)
+    missing = store.read(snapshots[0], "https://elsewhere.example/tracker.js")
+    print(f"Served {len(latencies)} pages with all resources: p50 {statistics.median(latencies):.2f} ms, "
+          f"p99 {percentile(latencies, 0.99):.2f} ms ({served_bytes / len(latencies) / 1024:.0f} KB per page); "
+          f"unknown resources {'answered' if missing else 'not found'}")
+
+    # With a cap at two thirds of what is stored, saving more pages evicts
+    # the least recently opened snapshots; the ones just opened survive.
+    cap_mb = max(1, stats['stored_bytes'] * 2 // 3 // 2**20)
+    with conn:
+        conn.execute("UPDATE snapshots SET last_accessed = last_accessed - 3600")
+    store = SnapshotStore(db_path, max_mb=cap_mb)
+    opened = rng.sample(snapshots, 20)
+    for snapshot_id in opened:
+        store.read(snapshot_id)
+    store.flush()
+    for path, url in save_pages(args.pages // 4, args.pages):
+        store.add(path, url, None)
+    store.stop()
+    app.processEvents()
+    stats = store.stats()
+    kept = {row[0] for row in conn.execute("SELECT id FROM snapshots")}
+    orphans = conn.execute('''SELECT COUNT(*) FROM snapshot_blobs WHERE NOT EXISTS
+                              (SELECT 1 FROM snapshot_parts WHERE blob_hash = snapshot_blobs.hash)''').fetchone()[0]
+    conn.close()
+    within_cap = stats['stored_bytes'] <= cap_mb * 2**20
+    survived = sum(snapshot_id in kept for snapshot_id in opened)
+    print(f"Cap {cap_mb} MB: {stats['evicted']:,} snapshots evicted, {stats['snapshots']:,} kept in "
+          f"{stats['stored_bytes'] / 2**20:.1f} MB ({'within' if within_cap else 'over'} the cap), "
+          f"{survived}/{len(opened)} recently opened kept, {orphans} orphaned bodies")
+
+    p99 = percentile(latencies, 0.99)
+    print(f"Serving p99 {'within' if p99 <= args.budget_ms else 'over'} the {args.budget_ms:.0f} ms budget")
+    ok = p99 <= args.budget_ms and within_cap and survived == len(opened) and not orphans and not missing
+    return 0 if ok else 1
+
+def bench_render(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-render")
+    parser.add_argument("--pages", type=int, default=48)
+    parser.add_argument("--delay-ms", type=int, default=300, help="server response time per page")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated pool sizes")
+    parser.add_argument("--format", choices=RenderPool.FORMATS, default='pdf')
+    args = parser.parse_args(argv)
+
+    headless_environment()
+    server, base_url = start_fixture_server()
+    workdir = tempfile.mkdtemp(prefix='homi-render-')
+    app = QApplication([sys.argv[0]])
+    urls = [f"{base_url}/page/{i}?delay={args.delay_ms}" for i in range(args.pages)]
+    # Two URLs that never answer in time exercise the timeout and retry path.
+    urls += [f"{base_url}/page/slow-{i}?delay=5000" for i in range(2)]
+
+    baseline = None
+    failed = 0
+    for concurrency in [int(size) for size in args.concurrency.split(",") if size]:
+        out_dir = os.path.join(workdir, f"c{concurrency}")
+        os.makedirs(out_dir)
+        summary = run_render_pool(app, urls, out_dir, concurrency=concurrency, format=args.format,
+                                  timeout=2.0, retries=1, settle_ms=50).summary()
+        baseline = baseline or summary['pages_per_second']
+        failed += summary['failed'] != 2 or summary['written'] != args.pages
+        print(f"concurrency {concurrency}: {summary['written']} written, {summary['failed']} failed, "
+              f"{summary['retried']} retries in {summary['seconds']:.1f} s "
+              f"({summary['pages_per_second']:.2f} pages/s, {summary['pages_per_second'] / baseline:.1f}x; "
+              f"p50 {summary['p50_seconds']:.2f} s per page)")
+    server.shutdown()
+    return 0 if not failed else 1
+
+def resource_profile_run(name, urls, settle_ms):
+    # Runs in its own process, since Chromium's switches are fixed once the
+    # QApplication exists.
+    headless_environment()
+    app = QApplication(select_resource_profile([sys.argv[0], f"--resource-profile={name}"]))
+    workdir = tempfile.mkdtemp(prefix='homi-resource-')
+    browser = WebBrowser(db_path=os.path.join(workdir, 'browser.db'), session_tabs=[("about:blank", None, None, 1)])
+    # Hibernating tabs would hide the difference between profiles.
+    browser.tab_lifecycle.timer.stop()
+    peak_rss = [0]
+
+    def sample_rss():
+        peak_rss[0] = max(peak_rss[0], process_tree_rss(os.getpid()))
+
+    rss_timer = QTimer()
+    rss_timer.timeout.connect(sample_rss)
+    rss_timer.start(100)
+
+    loads = {}
+    started = time.perf_counter()
+    for url in urls:
+        opened = time.perf_counter()
+        web_view = browser.add_new_tab(url, background=True)
+        web_view.loadFinished.connect(
+            lambda ok, url=url, opened=opened: loads.setdefault(url, (ok, time.perf_counter() - opened)))
+    wait_until(app, lambda: len(loads) >= len(urls), 120)
+    elapsed = time.perf_counter() - started
+    # Memory is read once the pages have settled, as after a real session's
+    # tabs finished loading.
+    settled = time.perf_counter() + settle_ms / 1000
+    wait_until(app, lambda: time.perf_counter() >= settled, settle_ms / 1000 + 1)
+    sample_rss()
+    rss_timer.stop()
+    load_seconds = [seconds for ok, seconds in loads.values() if ok]
+    result = {
+        'profile': name,
+        'pages': len(urls),
+        'loaded': len(load_seconds),
+        'seconds': elapsed,
+        'load_p50_ms': statistics.median(load_seconds) * 1000 if load_seconds else 0.0,
+        'load_p95_ms': percentile(load_seconds, 0.95) * 1000 if load_seconds else 0.0,
+        'rss_mb': process_tree_rss(os.getpid()) / 2**20,
+        'peak_rss_mb': peak_rss[0] / 2**20,
+        'processes': len(process_tree_pids(os.getpid())),
+    }
+    browser.close()
+    print(json.dumps(result))
+    return 0
+
+def bench_resource_profiles(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-resource-profiles")
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--sites", type=int, default=4, help="loopback addresses the pages are spread over")
+    parser.add_argument("--profiles", default=",".join(RESOURCE_PROFILES), help="comma-separated profile names")
+    parser.add_argument("--settle-ms", type=int, default=3000)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--urls", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        with open(args.urls) as source:
+            return resource_profile_run(args.child, json.load(source), args.settle_ms)
+
+    names = [name for name in args.profiles.split(",") if name]
+    unknown = [name for name in names if name not in RESOURCE_PROFILES]
+    if unknown:
+        print(f"Unknown resource profiles: {', '.join(unknown)}")
+        return 2
+
+    # Every loopback address is a separate site to Chromium, so the process
+    # model has something to decide.
+    servers = [start_fixture_server(f"127.0.0.{i + 1}") for i in range(args.sites)]
+    urls = [f"{servers[i % len(servers)][1]}/article/{i}" for i in range(args.pages)]
+    workdir = tempfile.mkdtemp(prefix='homi-resource-')
+    urls_path = os.path.join(workdir, 'urls.json')
+    with open(urls_path, 'w') as output:
+        json.dump(urls, output)
+
+    results = []
+    for name in names:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "bench-resource-profiles",
+                                    "--child", name, "--urls", urls_path, "--settle-ms", str(args.settle_ms)],
+                                   capture_output=True, text=True, timeout=600)
+        lines = completed.stdout.strip().splitlines()
+        try:
+            result = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            print(f"{name}: run failed (exit status {completed.returncode})")
+            print(completed.stderr.strip()[-2000:])
+            return 1
+        results.append(result)
+    for server, _ in servers:
+        server.shutdown()
+
+    baseline = next((result for result in results if result['profile'] == DEFAULT_RESOURCE_PROFILE), results[0])
+    print(f"{args.pages} pages over {args.sites} sites, memory read {args.settle_ms} ms after the last load:")
+    for result in results:
+        print(f"{result['profile']:>12}: {result['loaded']}/{result['pages']} loaded in {result['seconds']:.1f} s, "
+              f"load p50 {result['load_p50_ms']:.0f} ms, p95 {result['load_p95_ms']:.0f} ms; "
+              f"RSS {result['rss_mb']:.0f} MB ({result['rss_mb'] / baseline['rss_mb'] - 1:+.0%}), "
+              f"peak {result['peak_rss_mb']:.0f} MB, {result['processes']} processes")
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {args.output}")
+    return 0 if all(result['loaded'] == result['pages'] for result in results) else 1
+
+def bench_import(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks.py bench-import")
+    parser.add_argument("--format", choices=['firefox', 'chromium-history'], default='firefox')
+    parser.add_argument("--visits", type=int, default=1000000)
+    parser.add_argument("--places", type=int, default=50000)
+    parser.add_argument("--bookmarks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=BrowserDataImporter.BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='homi-import-')
+    source_path = os.path.join(workdir, 'places.sqlite' if args.format == 'firefox' else 'History')
+    started = time.perf_counter()
+    synthetic_browser_profile(source_path, args.format, args.visits, args.places, args.bookmarks,
+                              random.Random(42))
+    print(f"Generated {args.visits:,} visits over {args.places:,} pages "
+          f"({os.path.getsize(source_path) / 2**20:.0f} MB) in {time.perf_counter() - started:.1f} s")
+
+    def fresh_database(name):
+        db_path = os.path.join(workdir, name)
+        conn = connect_database(db_path)
+        migrate_database(conn)
+        conn.close()
+        return db_path
+
+    def measure(job, path):
+        # ru_maxrss never goes down, so peak growth is sampled per run.
+        rss_before = read_process_memory(os.getpid()) or 0
+        peak = [rss_before]
+        done = threading.Event()
+        def sample():
+            while not done.wait(0.05):
+                peak[0] = max(peak[0], read_process_memory(os.getpid()) or 0)
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            return job.run(path), peak[0] - rss_before
+        finally:
+            done.set()
+            sampler.join()
+
+    def report(label, job, path):
+        result, rss_growth = measure(job, path)
+        rate = result['read'] / result['seconds'] if result['seconds'] else 0
+        print(f"{label}: {result['visits']:,} visits and {result['bookmarks']:,} bookmarks added, "
+              f"{result['skipped']:,} skipped, in {result['seconds']:.2f} s "
+              f"({rate:,.0f} records/s, peak RSS +{rss_growth / 2**20:.0f} MB)")
+
+    db_path = fresh_database('browser.db')
+    progress_calls = []
+    report("Import", BrowserDataImporter(db_path, batch_size=args.batch_size,
+                                         progress=lambda done, total: progress_calls.append(done)),
+           source_path)
+    print(f"  {len(progress_calls)} progress callbacks")
+
+    report("Re-import", BrowserDataImporter(db_path, batch_size=args.batch_size), source_path)
+
+    export_path = os.path.join(workdir, 'export.jsonl')
+    exported, rss_growth = measure(BrowserDataExporter(db_path), export_path)
+    print(f"Export: {exported['written']:,} records "
+          f"({os.path.getsize(export_path) / 2**20:.0f} MB) in {exported['seconds']:.2f} s "
+          f"(peak RSS +{rss_growth / 2**20:.0f} MB)")
+
+    round_trip_path = fresh_database('round_trip.db')
+    report("JSONL import", BrowserDataImporter(round_trip_path, batch_size=args.batch_size), export_path)
+
+    counts = []
+    for path in (db_path, round_trip_path):
+        conn = sqlite3.connect(path)
+        counts.append(tuple(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                            for table in ('visits', 'urls', 'bookmarks')))
+        conn.close()
+    print(f"Round trip {'matches' if counts[0] == counts[1] else 'differs'}: "
+          f"{counts[0]} -> {counts[1]} (visits, urls, bookmarks)")
+    return 0 if counts[0] == counts[1] and counts[0][0] == args.visits else 1
+
+BENCHMARKS = {
+    'bench-omnibox': bench_omnibox,
+    'bench-tab-events': bench_tab_events,
+    'bench-suite': bench_suite,
+    'bench-content-filter': bench_content_filter,
+    'bench-suggestions': bench_suggestions,
+    'bench-tab-switcher': bench_tab_switcher,
+    'bench-import': bench_import,
+    'bench-content-search': bench_content_search,
+    'bench-favicons': bench_favicons,
+    'bench-render': bench_render,
+    'bench-snapshots': bench_snapshots,
+    'bench-resource-profiles': bench_resource_profiles,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"usage: benchmarks.py {{{','.join(BENCHMARKS)}}} [options]")
+        sys.exit(2)
+    sys.exit(BENCHMARKS[sys.argv[1]](sys.argv[2:]))
+
+if __name__ == "__main__":
+    main()
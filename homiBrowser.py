@@ -1,26 +1,634 @@
 import sys
 import sqlite3
 import os
+import threading
+import time
+
+STARTUP_STARTED = time.perf_counter()
+
+import math
+import bisect
+import argparse
+import json
+import statistics
+import heapq
 from datetime import datetime
-from PyQt5.QtWidgets import (QHBoxLayout, QMessageBox, QApplication, QMainWindow, QToolBar, QLineEdit, QPushButton, QVBoxLayout, QWidget, QTabWidget, QDialog, QTableWidget, QTableWidgetItem, QMenu, QAction, QComboBox, QLabel, QProgressBar, QCheckBox)
-from PyQt5.QtCore import QUrl, Qt, QSettings, QTimer
-from PyQt5.QtWebEngineWidgets import (QWebEngineView, QWebEngineProfile, QWebEngineSettings, QWebEnginePage, QWebEngineDownloadItem)
-from PyQt5.QtGui import QIcon, QColor, QCursor, QPalette
+from urllib.parse import urlsplit, urlunsplit, quote, quote_plus
+from html.parser import HTMLParser
+import html
+import tempfile
+import resource
+import csv
+import re
+import hashlib
+import zlib
+import signal
+import email
+import binascii
+from collections import OrderedDict, deque
+from PyQt5.QtWidgets import (QHBoxLayout, QMessageBox, QApplication, QMainWindow, QToolBar, QLineEdit, QPushButton, QVBoxLayout, QWidget, QTabWidget, QDialog, QTableWidget, QTableWidgetItem, QMenu, QAction, QActionGroup, QLabel, QProgressBar, QCheckBox, QTableView, QHeaderView, QAbstractItemView, QCompleter, QScrollArea, QFileDialog, QListView, QProgressDialog)
+from PyQt5.QtCore import (QUrl, Qt, QSize, QEvent, QAbstractListModel, QSettings, QTimer, QObject, QThread, QAbstractTableModel, QModelIndex, QByteArray, QDataStream, QIODevice, QBuffer, pyqtSignal, pyqtSlot)
+from PyQt5.QtWebEngineWidgets import (QWebEngineView, QWebEngineProfile, QWebEngineSettings, QWebEnginePage, QWebEngineDownloadItem, QWebEngineScript)
+from PyQt5.QtWebEngineCore import (QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo, QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob)
+from PyQt5.QtNetwork import (QLocalServer, QLocalSocket, QAbstractSocket, QNetworkAccessManager, QNetworkRequest, QNetworkReply)
+from PyQt5 import sip
+from PyQt5.QtGui import QPixmap, QIcon, QCursor, QPalette, QStandardItemModel, QStandardItem
+
+IMPORTS_FINISHED = time.perf_counter()
+
+DB_PATH = 'browser_data.db'
+HOME_URL = 'https://www.google.com'
+STARTUP_PROFILE_PATH = 'startup_profile.jsonl'
+FILTER_LIST_DIR = 'filters'
+CONTENT_FILTER_CACHE = 'content_filter_cache.json'
+SNAPSHOT_SCHEME = 'homi-snapshot'
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    path = parts.path or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+
+# Frecency is kept as log(sum(exp(rate * visit_time))) so that scores decay
+# with age without ever having to be rewritten: ordering by the stored value
+# is the same as ordering by the decayed score at any later time.
+FRECENCY_HALF_LIFE = 30 * 24 * 3600
+FRECENCY_RATE = math.log(2) / FRECENCY_HALF_LIFE
+BOOKMARK_FRECENCY_BONUS = math.log(4)
+
+
+def visit_frecency(timestamp):
+    return timestamp * FRECENCY_RATE
+
+
+def frecency_add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+class FrecencySum:
+    def __init__(self):
+        self.total = None
+
+    def step(self, timestamp):
+        if timestamp is not None:
+            self.total = frecency_add(self.total, visit_frecency(timestamp))
+
+    def finalize(self):
+        return self.total
+
+
+def serialize_history(history):
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.WriteOnly)
+    stream << history
+    return bytes(data)
+
+
+def restore_history(history, data):
+    stream = QDataStream(QByteArray(data))
+    stream >> history
+
+
+def read_process_memory(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+PAGE_SIZE = resource.getpagesize()
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def read_process_stats(pid, pss=False):
+    # /proc/<pid>/stat gives CPU time and RSS in one small read. PSS comes
+    # from smaps_rollup, which makes the kernel walk the page tables, so it
+    # is only read when asked for.
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        stats = {
+            'cpu_seconds': (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+            'rss': int(fields[21]) * PAGE_SIZE,
+            'pss': None,
+        }
+    except (OSError, ValueError, IndexError):
+        return None
+    if pss:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as rollup:
+                for line in rollup:
+                    if line.startswith("Pss:"):
+                        stats['pss'] = int(line.split()[1]) * 1024
+                        break
+        except (OSError, ValueError, IndexError):
+            pass
+    return stats
+
+
+def percentile(values, fraction):
+    # Nearest rank: the smallest value with at least that fraction of the
+    # values at or below it. Rounding keeps 0.07 * 100 from ranking 8th.
+    ordered = sorted(values)
+    rank = math.ceil(round(len(ordered) * fraction, 9))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def connect_database(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.create_function("frecency_add", 2, frecency_add, deterministic=True)
+    conn.create_aggregate("frecency_sum", 1, FrecencySum)
+    return conn
+
+
+def migrate_initial_schema(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS bookmarks
+                      (id INTEGER PRIMARY KEY, 
+                       title TEXT, 
+                       url TEXT UNIQUE)''')
+    
+    cursor.execute('''CREATE TABLE IF NOT EXISTS history
+                      (id INTEGER PRIMARY KEY, 
+                       title TEXT, 
+                       url TEXT, 
+                       visited_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+    
+    cursor.execute('''CREATE TABLE IF NOT EXISTS session_tabs
+                      (window INTEGER,
+                       position INTEGER,
+                       url TEXT,
+                       title TEXT,
+                       history BLOB,
+                       active INTEGER DEFAULT 0,
+                       PRIMARY KEY (window, position))''')
+    
+    has_urls = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'urls'"
+    ).fetchone()
+    
+    cursor.execute('''CREATE TABLE IF NOT EXISTS urls
+                      (id INTEGER PRIMARY KEY,
+                       url TEXT UNIQUE,
+                       title TEXT,
+                       visit_count INTEGER DEFAULT 0,
+                       last_visit DATETIME,
+                       frecency REAL)''')
+    
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_urls_frecency
+                      ON urls (frecency DESC)''')
+    
+    cursor.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS urls_fts
+                      USING fts5(url, title, content='urls', content_rowid='id', prefix='2 3')''')
+    
+    if not has_urls:
+        cursor.execute('''INSERT INTO urls (url, title, visit_count, last_visit, frecency)
+                          SELECT url, title, COUNT(*), MAX(visited_at),
+                                 frecency_sum(CAST(strftime('%s', visited_at) AS INTEGER))
+                          FROM history
+                          GROUP BY url''')
+        cursor.execute("INSERT INTO urls_fts (urls_fts) VALUES ('rebuild')")
+    
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS urls_fts_insert AFTER INSERT ON urls BEGIN
+                          INSERT INTO urls_fts (rowid, url, title) VALUES (new.id, new.url, new.title);
+                      END''')
+    
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS urls_fts_delete AFTER DELETE ON urls BEGIN
+                          INSERT INTO urls_fts (urls_fts, rowid, url, title)
+                          VALUES ('delete', old.id, old.url, old.title);
+                      END''')
+    
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS urls_fts_update AFTER UPDATE OF url, title ON urls
+                      WHEN old.url IS NOT new.url OR old.title IS NOT new.title BEGIN
+                          INSERT INTO urls_fts (urls_fts, rowid, url, title)
+                          VALUES ('delete', old.id, old.url, old.title);
+                          INSERT INTO urls_fts (rowid, url, title) VALUES (new.id, new.url, new.title);
+                      END''')
+
+
+def migrate_normalize_history(cursor):
+    # Every visit used to repeat the full URL and title; visits now point at
+    # the urls row and store an integer timestamp.
+    cursor.execute('''CREATE TABLE visits
+                      (id INTEGER PRIMARY KEY,
+                       url_id INTEGER NOT NULL REFERENCES urls (id),
+                       visited_at INTEGER NOT NULL)''')
+    
+    cursor.execute('''INSERT INTO urls (url, title, visit_count, last_visit, frecency)
+                      SELECT url, title, COUNT(*), MAX(visited_at),
+                             frecency_sum(CAST(strftime('%s', visited_at) AS INTEGER))
+                      FROM history
+                      WHERE url NOT IN (SELECT url FROM urls)
+                      GROUP BY url''')
+    
+    cursor.execute('''INSERT INTO visits (url_id, visited_at)
+                      SELECT u.id, CAST(strftime('%s', h.visited_at) AS INTEGER)
+                      FROM history h JOIN urls u ON u.url = h.url
+                      ORDER BY h.visited_at, h.id''')
+    
+    cursor.execute('''UPDATE urls
+                      SET last_visit = CAST(strftime('%s', last_visit) AS INTEGER)
+                      WHERE typeof(last_visit) = 'text' ''')
+    
+    cursor.execute("DROP TABLE history")
+    
+    cursor.execute('''CREATE INDEX idx_visits_visited_at
+                      ON visits (visited_at, id)''')
+    
+    cursor.execute('''CREATE INDEX idx_visits_url_id
+                      ON visits (url_id)''')
+
+
+def migrate_add_downloads(cursor):
+    cursor.execute('''CREATE TABLE downloads
+                      (id INTEGER PRIMARY KEY,
+                       url TEXT,
+                       path TEXT,
+                       state TEXT,
+                       received INTEGER DEFAULT 0,
+                       total INTEGER DEFAULT -1,
+                       priority INTEGER DEFAULT 0,
+                       created_at INTEGER,
+                       finished_at INTEGER)''')
+    
+    cursor.execute('''CREATE INDEX idx_downloads_created_at
+                      ON downloads (created_at)''')
+
+
+def migrate_add_page_loads(cursor):
+    cursor.execute('''CREATE TABLE page_loads
+                      (id INTEGER PRIMARY KEY,
+                       url TEXT,
+                       domain TEXT,
+                       started_at INTEGER,
+                       ok INTEGER,
+                       wall_ms REAL,
+                       first_progress_ms REAL,
+                       ttfb_ms REAL,
+                       dom_content_loaded_ms REAL,
+                       load_event_ms REAL,
+                       transfer_bytes INTEGER,
+                       resource_count INTEGER,
+                       resource_bytes INTEGER)''')
+
+
+def migrate_add_search_engines(cursor):
+    cursor.execute('''CREATE TABLE search_engines
+                      (id INTEGER PRIMARY KEY,
+                       name TEXT UNIQUE,
+                       keyword TEXT UNIQUE,
+                       url_template TEXT,
+                       suggest_template TEXT,
+                       is_default INTEGER DEFAULT 0,
+                       position INTEGER DEFAULT 0)''')
+    
+    cursor.executemany('''INSERT INTO search_engines
+                          (name, keyword, url_template, suggest_template, is_default, position)
+                          VALUES (?, ?, ?, ?, ?, ?)''', [
+        ("Google", "g", "https://www.google.com/search?q={searchTerms}",
+         "https://suggestqueries.google.com/complete/search?client=firefox&q={searchTerms}", 1, 0),
+        ("Bing", "b", "https://www.bing.com/search?q={searchTerms}",
+         "https://api.bing.com/osjson.aspx?query={searchTerms}", 0, 1),
+        ("DuckDuckGo", "ddg", "https://duckduckgo.com/?q={searchTerms}",
+         "https://duckduckgo.com/ac/?q={searchTerms}&type=list", 0, 2),
+    ])
+
+
+def migrate_add_visit_lookup_index(cursor):
+    # Looking up a visit by URL and time lets imports skip visits that are
+    # already stored; the composite index also serves url_id lookups.
+    cursor.execute('''CREATE INDEX idx_visits_url_id_visited_at
+                      ON visits (url_id, visited_at)''')
+    
+    cursor.execute("DROP INDEX idx_visits_url_id")
+
+
+def migrate_add_closed_tabs(cursor):
+    cursor.execute('''CREATE TABLE closed_tabs
+                      (id INTEGER PRIMARY KEY,
+                       entry INTEGER NOT NULL,
+                       window INTEGER DEFAULT 0,
+                       position INTEGER,
+                       url TEXT,
+                       title TEXT,
+                       history BLOB,
+                       scroll_x INTEGER DEFAULT 0,
+                       scroll_y INTEGER DEFAULT 0,
+                       closed_at INTEGER)''')
+    
+    cursor.execute('''CREATE INDEX idx_closed_tabs_entry
+                      ON closed_tabs (entry)''')
+
+
+def migrate_add_page_text(cursor):
+    # Page text is stored once per distinct content; several URLs can point
+    # at the same row. The full-text index reads its content from page_text.
+    cursor.execute('''CREATE TABLE page_text
+                      (id INTEGER PRIMARY KEY,
+                       content_hash TEXT UNIQUE NOT NULL,
+                       title TEXT,
+                       size INTEGER,
+                       indexed_at INTEGER,
+                       body TEXT)''')
+    
+    # Retention only needs age and size; the index covers both so the
+    # bodies are never read to enforce it.
+    cursor.execute('''CREATE INDEX idx_page_text_indexed_at
+                      ON page_text (indexed_at, size)''')
+    
+    cursor.execute('''CREATE TABLE page_text_urls
+                      (url TEXT PRIMARY KEY,
+                       text_id INTEGER NOT NULL,
+                       indexed_at INTEGER)''')
+    
+    cursor.execute('''CREATE INDEX idx_page_text_urls_text_id
+                      ON page_text_urls (text_id)''')
+    
+    cursor.execute('''CREATE VIRTUAL TABLE page_text_fts
+                      USING fts5(title, body, content='page_text', content_rowid='id',
+                                 tokenize='unicode61 remove_diacritics 2')''')
+    
+    cursor.execute('''CREATE TRIGGER page_text_fts_insert AFTER INSERT ON page_text BEGIN
+                          INSERT INTO page_text_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+                      END''')
+    
+    cursor.execute('''CREATE TRIGGER page_text_fts_delete AFTER DELETE ON page_text BEGIN
+                          INSERT INTO page_text_fts (page_text_fts, rowid, title, body)
+                          VALUES ('delete', old.id, old.title, old.body);
+                      END''')
+    
+    cursor.execute('''CREATE TRIGGER page_text_fts_update AFTER UPDATE OF title, body ON page_text
+                      WHEN old.title IS NOT new.title OR old.body IS NOT new.body BEGIN
+                          INSERT INTO page_text_fts (page_text_fts, rowid, title, body)
+                          VALUES ('delete', old.id, old.title, old.body);
+                          INSERT INTO page_text_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+                      END''')
+
+
+def migrate_add_favicons(cursor):
+    # Each distinct icon image is stored once, keyed by its hash; pages
+    # point at it, and a host lookup finds an icon for pages never seen.
+    cursor.execute('''CREATE TABLE favicons
+                      (hash TEXT PRIMARY KEY,
+                       data BLOB NOT NULL,
+                       updated_at INTEGER)''')
+    
+    cursor.execute('''CREATE TABLE favicon_pages
+                      (page_url TEXT PRIMARY KEY,
+                       host TEXT,
+                       icon_hash TEXT NOT NULL,
+                       updated_at INTEGER)''')
+    
+    cursor.execute('''CREATE INDEX idx_favicon_pages_host
+                      ON favicon_pages (host, updated_at)''')
+    
+    cursor.execute('''CREATE INDEX idx_favicon_pages_icon_hash
+                      ON favicon_pages (icon_hash)''')
+    
+    cursor.execute('''CREATE INDEX idx_favicon_pages_updated_at
+                      ON favicon_pages (updated_at)''')
+
+def migrate_add_snapshots(cursor):
+    # A snapshot is the list of parts of a saved MHTML page; the parts'
+    # bodies are stored compressed, once per distinct content.
+    cursor.execute('''CREATE TABLE snapshots
+                      (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       url TEXT NOT NULL,
+                       title TEXT,
+                       root INTEGER NOT NULL,
+                       size INTEGER NOT NULL,
+                       created_at INTEGER,
+                       last_accessed INTEGER)''')
+    
+    cursor.execute('''CREATE INDEX idx_snapshots_url
+                      ON snapshots (url)''')
+    
+    cursor.execute('''CREATE INDEX idx_snapshots_last_accessed
+                      ON snapshots (last_accessed)''')
+    
+    cursor.execute('''CREATE TABLE snapshot_blobs
+                      (hash TEXT PRIMARY KEY,
+                       size INTEGER NOT NULL,
+                       stored_size INTEGER NOT NULL,
+                       compressed INTEGER NOT NULL,
+                       data BLOB NOT NULL)''')
+    
+    cursor.execute('''CREATE TABLE snapshot_parts
+                      (snapshot_id INTEGER NOT NULL,
+                       position INTEGER NOT NULL,
+                       location TEXT,
+                       content_id TEXT,
+                       content_type TEXT,
+                       blob_hash TEXT NOT NULL,
+                       PRIMARY KEY (snapshot_id, position))''')
+    
+    cursor.execute('''CREATE INDEX idx_snapshot_parts_location
+                      ON snapshot_parts (snapshot_id, location)''')
+    
+    cursor.execute('''CREATE INDEX idx_snapshot_parts_blob_hash
+                      ON snapshot_parts (blob_hash)''')
+
+
+MIGRATIONS = [
+    migrate_initial_schema,
+    migrate_normalize_history,
+    migrate_add_downloads,
+    migrate_add_page_loads,
+    migrate_add_search_engines,
+    migrate_add_visit_lookup_index,
+    migrate_add_closed_tabs,
+    migrate_add_page_text,
+    migrate_add_favicons,
+    migrate_add_snapshots,
+]
+
+
+def database_size(conn):
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def time_queries(conn):
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'visits' in tables:
+        history_page = '''SELECT u.title, u.url, v.visited_at
+                          FROM visits v JOIN urls u ON u.id = v.url_id
+                          ORDER BY v.visited_at DESC, v.id DESC LIMIT 200'''
+        url_visits = '''SELECT COUNT(*) FROM visits
+                        WHERE url_id = (SELECT id FROM urls WHERE url = ?)'''
+    elif 'history' in tables:
+        history_page = '''SELECT title, url, visited_at FROM history
+                          ORDER BY visited_at DESC, id DESC LIMIT 200'''
+        url_visits = "SELECT COUNT(*) FROM history WHERE url = ?"
+    else:
+        return {}
+    
+    probe = HOME_URL
+    queries = {
+        'history_page': (history_page, ()),
+        'url_visits': (url_visits, (probe,)),
+        'bookmark_lookup': ("SELECT 1 FROM bookmarks WHERE url = ?", (probe,)),
+    }
+    timings = {}
+    for name, (sql, params) in queries.items():
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings[name] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def migrate_database(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT version FROM schema_version").fetchone()
+    version = row[0] if row else 0
+    if version >= len(MIGRATIONS):
+        return None
+    
+    report = {'from_version': version, 'size_before': database_size(conn),
+              'timings_before': time_queries(conn)}
+    
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        for target, migration in enumerate(MIGRATIONS[version:], version + 1):
+            conn.execute("BEGIN")
+            try:
+                migration(conn.cursor())
+                conn.execute("DELETE FROM schema_version")
+                conn.execute("INSERT INTO schema_version (version) VALUES (?)", (target,))
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        
+        # Incremental auto-vacuum only takes effect after a full VACUUM, which
+        # is needed once per database file.
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+    finally:
+        conn.isolation_level = isolation_level
+    
+    report.update(to_version=len(MIGRATIONS), size_after=database_size(conn),
+                  timings_after=time_queries(conn))
+    return report
+
+
+def print_migration_report(report):
+    print(f"Migrated database schema from version {report['from_version']} "
+          f"to {report['to_version']}")
+    print(f"  size: {report['size_before'] / 2**20:.1f} MB -> {report['size_after'] / 2**20:.1f} MB")
+    for name, after in report['timings_after'].items():
+        before = report['timings_before'].get(name)
+        before_text = f"{before:.2f} ms" if before is not None else "n/a"
+        print(f"  {name}: {before_text} -> {after:.2f} ms")
+
+
+class HistoryMaintenance:
+    BATCH_SIZE = 5000
+    VACUUM_PAGES = 2000
+
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path, max_age_days, max_visits):
+        maintenance = cls.instances.get(db_path)
+        if maintenance is None:
+            maintenance = cls(db_path, max_age_days, max_visits)
+            cls.instances[db_path] = maintenance
+        return maintenance
+
+    def __init__(self, db_path, max_age_days=180, max_visits=500000):
+        self.db_path = db_path
+        self.max_age_days = max_age_days
+        self.max_visits = max_visits
+        self.thread = None
+        self.last_result = None
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, name="HistoryMaintenance", daemon=True)
+        self.thread.start()
+
+    def delete_visits_before(self, conn, cutoff):
+        # Short transactions keep the history recorder from waiting on the
+        # write lock while a large backlog is trimmed.
+        deleted = 0
+        while True:
+            with conn:
+                rows = conn.execute('''SELECT id, url_id FROM visits
+                                        WHERE visited_at < ?
+                                        ORDER BY visited_at LIMIT ?''',
+                                    (cutoff, self.BATCH_SIZE)).fetchall()
+                if not rows:
+                    return deleted
+                conn.executemany("DELETE FROM visits WHERE id = ?", [(row[0],) for row in rows])
+                url_ids = {(row[1],) for row in rows}
+                conn.executemany('''UPDATE urls
+                                      SET visit_count = (SELECT COUNT(*) FROM visits WHERE url_id = urls.id)
+                                      WHERE id = ?''', url_ids)
+                conn.executemany('''DELETE FROM urls
+                                      WHERE id = ? AND visit_count = 0''', url_ids)
+            deleted += len(rows)
+
+    def run(self):
+        started = time.perf_counter()
+        conn = connect_database(self.db_path)
+        try:
+            size_before = database_size(conn)
+            deleted = self.delete_visits_before(conn, int(time.time()) - self.max_age_days * 86400)
+            
+            overflow = conn.execute('''SELECT visited_at FROM visits
+                                        ORDER BY visited_at DESC LIMIT 1 OFFSET ?''',
+                                    (self.max_visits,)).fetchone()
+            if overflow is not None:
+                deleted += self.delete_visits_before(conn, overflow[0] + 1)
+            
+            while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+                conn.execute(f"PRAGMA incremental_vacuum({self.VACUUM_PAGES})").fetchall()
+            
+            self.last_result = {
+                'deleted_visits': deleted,
+                'size_before': size_before,
+                'size_after': database_size(conn),
+                'seconds': time.perf_counter() - started,
+            }
+            if deleted:
+                print(f"History maintenance removed {deleted} visits, database "
+                      f"{self.last_result['size_before'] / 2**20:.1f} MB -> "
+                      f"{self.last_result['size_after'] / 2**20:.1f} MB")
+        except sqlite3.Error as e:
+            print(f"Error during history maintenance: {e}")
+        finally:
+            conn.close()
 
 
 class CustomWebEngineView(QWebEngineView):
+    next_history_source = 0
+
     def __init__(self, parent=None, is_incognito=False):
         super().__init__(parent)
         self.browser = None
         self.current_link = None
+        # Keys this tab's queued visits; unlike id(), it is never reused by
+        # a tab opened after this one closes.
+        self.history_source = CustomWebEngineView.next_history_source
+        CustomWebEngineView.next_history_source += 1
         
-        if is_incognito:
-            self.profile = QWebEngineProfile()
-            self.profile.setHttpCacheType(QWebEngineProfile.NoCache)
-            self.profile.setPersistentStoragePath("")
-            self.page().setProfile(self.profile)
-        else:
-            self.profile = QWebEngineProfile.defaultProfile()
+        self.setPage(ProfileManager.shared().create_page(is_incognito, self))
 
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.prepare_context_menu)
@@ -71,10 +679,815 @@ class CustomWebEngineView(QWebEngineView):
     def forward(self):
         self.page().triggerAction(QWebEnginePage.Forward)
 
+class TabPlaceholder(QWidget):
+    def __init__(self, url, title, history=None, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self.title = title
+        self.history = history
+
+class ClosedTabStore:
+    # Closed tabs live only in SQLite; nothing is kept in memory, and the
+    # table is trimmed to the newest `capacity` entries on every push. A
+    # closed window is one entry holding all of its tabs.
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path, capacity=25):
+        store = cls.instances.get(db_path)
+        if store is None:
+            store = cls(db_path, capacity)
+            cls.instances[db_path] = store
+        return store
+
+    def __init__(self, db_path, capacity=25):
+        self.conn = sqlite3.connect(db_path)
+        self.capacity = capacity
+
+    def push(self, tabs, window=False):
+        if not tabs:
+            return
+        closed_at = int(time.time())
+        try:
+            with self.conn:
+                entry = self.conn.execute("SELECT COALESCE(MAX(entry), 0) + 1 FROM closed_tabs").fetchone()[0]
+                self.conn.executemany('''INSERT INTO closed_tabs
+                                         (entry, window, position, url, title, history, scroll_x, scroll_y, closed_at)
+                                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', [
+                    (entry, int(window), tab['position'], tab['url'], tab['title'],
+                     zlib.compress(tab['history']) if tab['history'] else None,
+                     tab['scroll'][0], tab['scroll'][1], closed_at)
+                    for tab in tabs
+                ])
+                self.conn.execute('''DELETE FROM closed_tabs
+                                     WHERE entry <= (SELECT entry FROM (SELECT DISTINCT entry FROM closed_tabs
+                                                                        ORDER BY entry DESC LIMIT 1 OFFSET ?))''',
+                                  (self.capacity,))
+        except sqlite3.Error as e:
+            print(f"Error saving closed tab: {e}")
+
+    def pop(self):
+        try:
+            with self.conn:
+                rows = self.conn.execute('''SELECT window, position, url, title, history, scroll_x, scroll_y
+                                            FROM closed_tabs
+                                            WHERE entry = (SELECT MAX(entry) FROM closed_tabs)
+                                            ORDER BY position''').fetchall()
+                self.conn.execute("DELETE FROM closed_tabs WHERE entry = (SELECT MAX(entry) FROM closed_tabs)")
+        except sqlite3.Error as e:
+            print(f"Error reading closed tabs: {e}")
+            return None
+        if not rows:
+            return None
+        tabs = [
+            {'position': position, 'url': url, 'title': title,
+             'history': zlib.decompress(history) if history else None, 'scroll': (scroll_x, scroll_y)}
+            for _, position, url, title, history, scroll_x, scroll_y in rows
+        ]
+        return bool(rows[0][0]), tabs
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(DISTINCT entry) FROM closed_tabs").fetchone()[0]
+
+class FaviconStore(QObject):
+    # Icons are looked up by page URL, falling back to any icon of the same
+    # host. Decoded QIcons live in an LRU keyed by image hash, so a site's
+    # icon is decoded once however many rows show it, and only for rows a
+    # view actually asks about.
+    ICON_SIZE = 32
+
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path):
+        store = cls.instances.get(db_path)
+        if store is None:
+            settings = QSettings("HomiBrowser", "HomiBrowser")
+            store = cls(
+                db_path,
+                capacity=settings.value("history/favicon_cache", 256, type=int),
+                max_pages=settings.value("history/favicon_pages", 20000, type=int),
+            )
+            cls.instances[db_path] = store
+        return store
+
+    def __init__(self, db_path, capacity=256, max_pages=20000, flush_interval=2.0):
+        super().__init__()
+        self.db_path = db_path
+        self.capacity = capacity
+        self.max_pages = max_pages
+        self.flush_interval = flush_interval
+        self.conn = connect_database(db_path)
+        self.icons = OrderedDict()
+        self.lookups = OrderedDict()
+        self.misses = OrderedDict()
+        self.empty = QIcon()
+
+        self.hits = 0
+        self.decoded = 0
+        self.queries = 0
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = {}
+        self.stopping = False
+        self.stored = 0
+
+        self.thread = threading.Thread(target=self.run, name="FaviconStore", daemon=True)
+        self.thread.start()
+
+    def lookup(self, url):
+        try:
+            digest = self.lookups[url]
+            self.lookups.move_to_end(url)
+            return digest
+        except KeyError:
+            pass
+        # Misses are remembered too, so rows without an icon cost nothing
+        # on the next paint.
+        if url in self.misses:
+            return None
+        self.queries += 1
+        row = self.conn.execute("SELECT icon_hash FROM favicon_pages WHERE page_url = ?", (url,)).fetchone()
+        if row is None:
+            host = urlsplit(url).hostname
+            if host:
+                row = self.conn.execute('''SELECT icon_hash FROM favicon_pages WHERE host = ?
+                                           ORDER BY updated_at DESC LIMIT 1''', (host,)).fetchone()
+            if row is None and host:
+                with self.lock:
+                    row = next(((digest,) for page_host, digest, _ in self.pending.values() if page_host == host),
+                               None)
+        if row is None:
+            self.remember_lookup(self.misses, url, None)
+            return None
+        self.remember_lookup(self.lookups, url, row[0])
+        return row[0]
+
+    def remember_lookup(self, cache, url, digest):
+        cache[url] = digest
+        cache.move_to_end(url)
+        if len(cache) > self.capacity * 16:
+            cache.popitem(last=False)
+
+    def icon(self, url):
+        digest = self.lookup(url)
+        if digest is None:
+            return self.empty
+        icon = self.icons.get(digest)
+        if icon is not None:
+            self.icons.move_to_end(digest)
+            self.hits += 1
+            return icon
+        row = self.conn.execute("SELECT data FROM favicons WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            with self.lock:
+                pending = next((item[2] for item in self.pending.values() if item[1] == digest), None)
+            if pending is None:
+                return self.empty
+            row = (pending,)
+        pixmap = QPixmap()
+        pixmap.loadFromData(row[0])
+        icon = QIcon(pixmap)
+        self.decoded += 1
+        self.remember(digest, icon)
+        return icon
+
+    def remember(self, digest, icon):
+        self.icons[digest] = icon
+        self.icons.move_to_end(digest)
+        if len(self.icons) > self.capacity:
+            self.icons.popitem(last=False)
+
+    def store(self, url, icon):
+        pixmap = icon.pixmap(self.ICON_SIZE, self.ICON_SIZE)
+        if pixmap.isNull():
+            return
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        pixmap.save(buffer, "PNG")
+        png = bytes(data)
+        digest = hashlib.sha1(png).hexdigest()
+        if self.lookups.get(url) == digest:
+            return
+        self.remember(digest, icon)
+        # Any remembered miss may be a page of this host, which now has an
+        # icon to fall back to.
+        self.misses.clear()
+        self.remember_lookup(self.lookups, url, digest)
+        with self.lock:
+            if self.stopping:
+                return
+            self.pending[url] = (urlsplit(url).hostname, digest, png)
+
+    def clear(self):
+        with self.lock:
+            self.pending = {}
+        self.icons.clear()
+        self.lookups.clear()
+        self.misses.clear()
+        with self.conn:
+            self.conn.execute("DELETE FROM favicon_pages")
+            self.conn.execute("DELETE FROM favicons")
+
+    def stats(self):
+        with self.lock:
+            pending = len(self.pending)
+        return {
+            'icons': len(self.icons),
+            'lookups': len(self.lookups) + len(self.misses),
+            'hits': self.hits,
+            'decoded': self.decoded,
+            'queries': self.queries,
+            'stored': self.stored,
+            'pending': pending,
+        }
+
+    def flush(self):
+        self.wake.set()
+
+    def stop(self):
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+        self.wake.set()
+        self.thread.join()
+
+    def write(self, conn, items):
+        now = int(time.time())
+        try:
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO favicons (hash, data, updated_at) VALUES (?, ?, ?)",
+                                 {(digest, png, now) for _, digest, png in items.values()})
+                conn.executemany('''INSERT INTO favicon_pages (page_url, host, icon_hash, updated_at)
+                                    VALUES (?, ?, ?, ?)
+                                    ON CONFLICT (page_url) DO UPDATE SET
+                                        host = excluded.host,
+                                        icon_hash = excluded.icon_hash,
+                                        updated_at = excluded.updated_at''',
+                                 [(url, host, digest, now) for url, (host, digest, _) in items.items()])
+                conn.execute('''DELETE FROM favicon_pages
+                                WHERE page_url IN (SELECT page_url FROM favicon_pages
+                                                   ORDER BY updated_at DESC LIMIT -1 OFFSET ?)''',
+                             (self.max_pages,))
+                # Images no page points at any more, after a site changed
+                # its icon or old pages were trimmed.
+                conn.execute('''DELETE FROM favicons WHERE NOT EXISTS
+                                (SELECT 1 FROM favicon_pages WHERE icon_hash = favicons.hash)''')
+        except sqlite3.Error as e:
+            print(f"Error saving favicons: {e}")
+            return
+        with self.lock:
+            self.stored += len(items)
+
+    def run(self):
+        conn = connect_database(self.db_path)
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            stopping = self.stopping
+            with self.lock:
+                items = dict(self.pending)
+            if items:
+                self.write(conn, items)
+                # Entries stay pending until written so icon() can still
+                # decode them from memory.
+                with self.lock:
+                    for url, item in items.items():
+                        if self.pending.get(url) is item:
+                            del self.pending[url]
+            if stopping:
+                break
+        conn.close()
+
+class SnapshotStore(QObject):
+    # Pages are saved as MHTML and split into their parts. Each part body is
+    # stored once, compressed and keyed by its hash, so the stylesheets,
+    # scripts and images that snapshots of one site share take space once.
+    # Snapshots are served back through SnapshotSchemeHandler and evicted
+    # least recently opened first once the store outgrows its cap.
+    snapshot_saved = pyqtSignal(str, int)
+    snapshot_failed = pyqtSignal(str, str)
+    snapshots_evicted = pyqtSignal(list)
+
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path):
+        store = cls.instances.get(db_path)
+        if store is None:
+            settings = QSettings("HomiBrowser", "HomiBrowser")
+            store = cls(db_path, max_mb=settings.value("snapshots/max_mb", 500, type=int))
+            cls.instances[db_path] = store
+        return store
+
+    def __init__(self, db_path, max_mb=500, flush_interval=5.0):
+        super().__init__()
+        self.db_path = db_path
+        self.max_bytes = max_mb * 2**20
+        self.flush_interval = flush_interval
+        self.conn = connect_database(db_path)
+        self.captures = {}
+        self.saved = {}
+        for snapshot_id, url, created_at in self.conn.execute("SELECT id, url, created_at FROM snapshots ORDER BY id"):
+            self.saved[normalize_url(url)] = (snapshot_id, created_at)
+        self.snapshot_saved.connect(self.on_snapshot_saved)
+        self.snapshots_evicted.connect(self.on_snapshots_evicted)
+        self.scheme_handler = SnapshotSchemeHandler(self, self)
+        self.served = 0
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = []
+        self.touched = {}
+        self.stopping = False
+        self.ingested = 0
+        self.evicted = 0
+
+        self.thread = threading.Thread(target=self.run, name="SnapshotStore", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def snapshot_url(snapshot_id, location=None):
+        # A bare number would be read as an IPv4 address, hence the prefix.
+        if location is None:
+            return f"{SNAPSHOT_SCHEME}://s{snapshot_id}/"
+        # The original URL is kept whole in the path, so URLs relative to a
+        # served stylesheet still name the resource they meant.
+        scheme, _, rest = location.partition(':')
+        return f"{SNAPSHOT_SCHEME}://s{snapshot_id}/{scheme}/{rest.lstrip('/')}"
+
+    @staticmethod
+    def snapshot_id(host):
+        return int(host[1:]) if re.fullmatch(r's[0-9]+', host or '') else None
+
+    def latest(self, url):
+        saved = self.saved.get(normalize_url(url))
+        return saved[0] if saved is not None else None
+
+    def saved_at(self, url):
+        saved = self.saved.get(normalize_url(url))
+        return saved[1] if saved is not None else None
+
+    def capture(self, page, url, title):
+        fd, path = tempfile.mkstemp(prefix='homi-snapshot-', suffix='.mhtml')
+        os.close(fd)
+        self.captures[os.path.normpath(path)] = (url, title)
+        page.save(path, QWebEngineDownloadItem.MimeHtmlSaveFormat)
+
+    def claim(self, download):
+        # Every download passes through here; only the saves started by
+        # capture() are taken, the rest go to the download manager.
+        if not download.isSavePageDownload():
+            return False
+        path = os.path.normpath(os.path.join(download.downloadDirectory(), download.downloadFileName()))
+        if path not in self.captures:
+            return False
+        download.finished.connect(lambda download=download, path=path: self.on_capture_finished(download, path))
+        download.accept()
+        return True
+
+    def on_capture_finished(self, download, path):
+        url, title = self.captures.pop(path)
+        if download.state() != QWebEngineDownloadItem.DownloadCompleted:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.snapshot_failed.emit(url, download.interruptReasonString())
+            return
+        self.add(path, url, title)
+
+    def add(self, path, url, title):
+        # The file is parsed and removed on the writer thread.
+        with self.lock:
+            if self.stopping:
+                return
+            self.pending.append((path, url, title))
+        self.wake.set()
+
+    def on_snapshot_saved(self, url, snapshot_id):
+        self.saved[normalize_url(url)] = (snapshot_id, int(time.time()))
+
+    def on_snapshots_evicted(self, snapshots):
+        for snapshot_id, url in snapshots:
+            key = normalize_url(url)
+            if self.saved.get(key, (None,))[0] == snapshot_id:
+                del self.saved[key]
+
+    def read(self, snapshot_id, location=None):
+        if location is None:
+            row = self.conn.execute('''SELECT s.url, p.content_type, b.compressed, b.data FROM snapshots s
+                                       JOIN snapshot_parts p ON p.snapshot_id = s.id AND p.position = s.root
+                                       JOIN snapshot_blobs b ON b.hash = p.blob_hash
+                                       WHERE s.id = ?''', (snapshot_id,)).fetchone()
+        else:
+            row = self.conn.execute('''SELECT p.location, p.content_type, b.compressed, b.data FROM snapshot_parts p
+                                       JOIN snapshot_blobs b ON b.hash = p.blob_hash
+                                       WHERE p.snapshot_id = ? AND p.location = ?
+                                       LIMIT 1''', (snapshot_id, location)).fetchone()
+        if row is None:
+            return None
+        url, content_type, compressed, data = row
+        body = zlib.decompress(data) if compressed else data
+        self.served += 1
+        if location is None:
+            if content_type.startswith('text/html'):
+                body = self.add_base(body, url)
+            # Opening a snapshot counts as a use; the writer thread records
+            # it, so serving never waits on an ingest.
+            with self.lock:
+                self.touched[snapshot_id] = int(time.time())
+        return content_type, body
+
+    @staticmethod
+    def add_base(body, url):
+        # Relative URLs in the saved page resolve against where it came
+        # from; the page's request filter sends those requests back here.
+        if re.search(rb'<base[\s>]', body, re.I):
+            return body
+        tag = b'<base href="' + html.escape(url).encode() + b'">'
+        head = re.search(rb'<head\b[^>]*>', body, re.I)
+        if head is None:
+            return tag + body
+        return body[:head.end()] + tag + body[head.end():]
+
+    def stats(self):
+        blobs, size, stored_size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM snapshot_blobs").fetchone()
+        snapshots, snapshot_size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        with self.lock:
+            pending = len(self.pending)
+        return {
+            'snapshots': snapshots,
+            'snapshot_bytes': snapshot_size,
+            'blobs': blobs,
+            'blob_bytes': size,
+            'stored_bytes': stored_size,
+            'ingested': self.ingested,
+            'evicted': self.evicted,
+            'served': self.served,
+            'pending': pending,
+        }
+
+    def flush(self):
+        self.wake.set()
+
+    def stop(self):
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+        self.wake.set()
+        self.thread.join()
+
+    @staticmethod
+    def parse(data):
+        # Saved pages are a single multipart/related level, so the body is
+        # split on the boundary directly; the email package's line by line
+        # parser took several times longer than storing the parts.
+        head, body = SnapshotStore.split_headers(data)
+        boundary = head.get_boundary()
+        if head.get_content_maintype() != 'multipart' or not boundary:
+            raise ValueError("not an MHTML file")
+        parts = []
+        for chunk in body.split(b'--' + boundary.encode())[1:]:
+            if chunk.startswith(b'--'):
+                break
+            headers, payload = SnapshotStore.split_headers(chunk.lstrip(b'\r\n'))
+            if payload.endswith(b'\r\n'):
+                payload = payload[:-2]
+            elif payload.endswith(b'\n'):
+                payload = payload[:-1]
+            encoding = (headers.get('Content-Transfer-Encoding') or '').strip().lower()
+            if encoding == 'base64':
+                payload = binascii.a2b_base64(payload)
+            elif encoding == 'quoted-printable':
+                payload = binascii.a2b_qp(payload)
+            content_type = headers.get_content_type()
+            charset = headers.get_content_charset()
+            if charset:
+                content_type += f"; charset={charset}"
+            location = headers.get('Content-Location')
+            content_id = headers.get('Content-ID')
+            parts.append((
+                "".join(location.split()) if location else None,
+                content_id.strip().strip('<>') if content_id else None,
+                content_type,
+                payload,
+            ))
+        if not parts:
+            raise ValueError("not an MHTML file")
+        return parts
+
+    @staticmethod
+    def split_headers(data):
+        end = re.search(rb'\r?\n\r?\n', data)
+        if end is None:
+            return email.message_from_bytes(data), b''
+        return email.message_from_bytes(data[:end.start()]), data[end.end():]
+
+    def write(self, conn, url, title, parts):
+        now = int(time.time())
+        # The saved frame's document comes first; anything else is a resource.
+        root = next((i for i, part in enumerate(parts) if part[2].startswith('text/html')), 0)
+        with conn:
+            snapshot_id = conn.execute('''INSERT INTO snapshots (url, title, root, size, created_at, last_accessed)
+                                          VALUES (?, ?, ?, ?, ?, ?)''',
+                                       (url, title, root, sum(len(part[3]) for part in parts), now, now)).lastrowid
+            rows = []
+            for position, (location, content_id, content_type, body) in enumerate(parts):
+                digest = hashlib.sha256(body).hexdigest()
+                if conn.execute("SELECT 1 FROM snapshot_blobs WHERE hash = ?", (digest,)).fetchone() is None:
+                    data = zlib.compress(body, 6) if self.compressible(content_type) else body
+                    compressed = len(data) < len(body)
+                    if not compressed:
+                        data = body
+                    conn.execute('''INSERT INTO snapshot_blobs (hash, size, stored_size, compressed, data)
+                                    VALUES (?, ?, ?, ?, ?)''', (digest, len(body), len(data), compressed, data))
+                if location is None and content_id is not None:
+                    location = f"cid:{content_id}"
+                rows.append((snapshot_id, position, location, content_id, content_type, digest))
+            conn.executemany('''INSERT INTO snapshot_parts
+                                (snapshot_id, position, location, content_id, content_type, blob_hash)
+                                VALUES (?, ?, ?, ?, ?, ?)''', rows)
+            # Saving a page again replaces its older copy.
+            self.delete(conn, [row[0] for row in conn.execute("SELECT id FROM snapshots WHERE url = ? AND id != ?",
+                                                               (url, snapshot_id))])
+            evicted = self.evict(conn, snapshot_id)
+        return snapshot_id, evicted
+
+    @staticmethod
+    def compressible(content_type):
+        # Images, media and web fonts are compressed already; zlib would
+        # spend most of an ingest on them for nothing.
+        return not content_type.startswith(('image/', 'video/', 'audio/', 'font/woff')) or 'svg' in content_type
+
+    def delete(self, conn, snapshot_ids):
+        for snapshot_id in snapshot_ids:
+            hashes = [(row[0],) for row in conn.execute(
+                "SELECT DISTINCT blob_hash FROM snapshot_parts WHERE snapshot_id = ?", (snapshot_id,))]
+            conn.execute("DELETE FROM snapshot_parts WHERE snapshot_id = ?", (snapshot_id,))
+            conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+            conn.executemany('''DELETE FROM snapshot_blobs WHERE hash = ? AND NOT EXISTS
+                                (SELECT 1 FROM snapshot_parts WHERE blob_hash = snapshot_blobs.hash)''', hashes)
+
+    def evict(self, conn, keep):
+        evicted = []
+        stored = conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM snapshot_blobs").fetchone()[0]
+        while stored > self.max_bytes:
+            row = conn.execute('''SELECT id, url FROM snapshots WHERE id != ?
+                                  ORDER BY last_accessed, id LIMIT 1''', (keep,)).fetchone()
+            if row is None:
+                break
+            self.delete(conn, [row[0]])
+            evicted.append(row)
+            stored = conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM snapshot_blobs").fetchone()[0]
+        return evicted
+
+    def ingest(self, conn, path, url, title):
+        try:
+            with open(path, 'rb') as source:
+                parts = self.parse(source.read())
+            snapshot_id, evicted = self.write(conn, url, title, parts)
+        except (OSError, ValueError, zlib.error, sqlite3.Error) as e:
+            self.snapshot_failed.emit(url, str(e))
+            return
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self.lock:
+            self.ingested += 1
+            self.evicted += len(evicted)
+        self.snapshot_saved.emit(url, snapshot_id)
+        if evicted:
+            self.snapshots_evicted.emit(evicted)
+
+    def run(self):
+        conn = connect_database(self.db_path)
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            with self.lock:
+                stopping = self.stopping
+                items, self.pending = self.pending, []
+                touched, self.touched = self.touched, {}
+            if touched:
+                try:
+                    with conn:
+                        conn.executemany("UPDATE snapshots SET last_accessed = ? WHERE id = ?",
+                                         [(accessed, snapshot_id) for snapshot_id, accessed in touched.items()])
+                except sqlite3.Error as e:
+                    print(f"Error saving snapshot access times: {e}")
+            for path, url, title in items:
+                self.ingest(conn, path, url, title)
+            if stopping:
+                break
+        conn.close()
+
+class SnapshotSchemeHandler(QWebEngineUrlSchemeHandler):
+    # homi-snapshot://s<id>/ is the saved page itself and
+    # homi-snapshot://s<id>/<scheme>/<rest of URL> one of its resources.
+    # Nothing is fetched: a resource the snapshot does not have is a 404.
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+
+    def requestStarted(self, job):
+        parts = urlsplit(job.requestUrl().toString(QUrl.FullyEncoded))
+        snapshot_id = SnapshotStore.snapshot_id(parts.hostname)
+        if snapshot_id is None:
+            job.fail(QWebEngineUrlRequestJob.UrlInvalid)
+            return
+        location = None
+        if parts.path not in ('', '/'):
+            scheme, _, rest = parts.path[1:].partition('/')
+            location = f"{scheme}:{rest}" if scheme == 'cid' else f"{scheme}://{rest}"
+            if parts.query:
+                location += f"?{parts.query}"
+        try:
+            result = self.store.read(snapshot_id, location)
+        except (sqlite3.Error, zlib.error) as e:
+            print(f"Error reading snapshot {snapshot_id}: {e}")
+            result = None
+        if result is None:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        content_type, body = result
+        buffer = QBuffer(job)
+        buffer.setData(body)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(content_type.encode(), buffer)
+
+def register_snapshot_scheme():
+    # Custom schemes have to be known before the QApplication exists.
+    scheme = QWebEngineUrlScheme(SNAPSHOT_SCHEME.encode())
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.LocalScheme
+                    | QWebEngineUrlScheme.ContentSecurityPolicyIgnored)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+class BookmarkStore(QObject):
+    bookmark_added = pyqtSignal(str, str)
+    bookmark_removed = pyqtSignal(str)
+    bookmarks_reloaded = pyqtSignal()
+
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path):
+        store = cls.instances.get(db_path)
+        if store is None:
+            store = cls(db_path)
+            cls.instances[db_path] = store
+        return store
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.bookmarks = {}
+        self.load()
+
+    def load(self):
+        self.bookmarks = {}
+        for title, url in self.conn.execute("SELECT title, url FROM bookmarks"):
+            self.bookmarks.setdefault(normalize_url(url), []).append((title, url))
+
+    def reload(self):
+        # Bulk changes made through another connection, such as an import.
+        self.load()
+        self.bookmarks_reloaded.emit()
+
+    def contains(self, url):
+        return normalize_url(url) in self.bookmarks
+
+    def all(self):
+        return [entries[0] for entries in self.bookmarks.values()]
+
+    def add(self, url, title=None):
+        key = normalize_url(url)
+        entries = self.bookmarks.get(key)
+        if entries:
+            url = entries[0][1]
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO bookmarks (title, url) VALUES (?, ?)",
+                              (title, url))
+        if entries:
+            self.bookmark_removed.emit(url)
+        self.bookmarks[key] = [(title, url)] + [entry for entry in entries or [] if entry[1] != url]
+        self.bookmark_added.emit(url, title or "")
+
+    def remove(self, url):
+        entries = self.bookmarks.pop(normalize_url(url), None)
+        if not entries:
+            return
+        with self.conn:
+            self.conn.executemany("DELETE FROM bookmarks WHERE url = ?",
+                                  [(stored_url,) for _, stored_url in entries])
+        self.bookmark_removed.emit(entries[0][1])
+
+    def toggle(self, url, title=None):
+        if self.contains(url):
+            self.remove(url)
+            return False
+        self.add(url, title)
+        return True
+
+class BookmarkModel(QAbstractTableModel):
+    HEADERS = ["Title", "URL", "Offline"]
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.favicons = FaviconStore.shared(store.db_path)
+        self.snapshots = SnapshotStore.shared(store.db_path)
+        self.rows = sorted(store.all(), key=self.sort_key)
+        self.keys = [self.sort_key(row) for row in self.rows]
+        store.bookmark_added.connect(self.on_bookmark_added)
+        store.bookmark_removed.connect(self.on_bookmark_removed)
+        store.bookmarks_reloaded.connect(self.on_bookmarks_reloaded)
+        self.snapshots.snapshot_saved.connect(self.on_snapshots_changed)
+        self.snapshots.snapshots_evicted.connect(self.on_snapshots_changed)
+
+    @staticmethod
+    def sort_key(row):
+        title, url = row
+        return ((title or "").lower(), url)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        title, url = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            if index.column() == 2:
+                saved_at = self.snapshots.saved_at(url)
+                return f"{datetime.fromtimestamp(saved_at):%Y-%m-%d %H:%M}" if saved_at else ""
+            return (title or "Untitled") if index.column() == 0 else url
+        if role == Qt.ToolTipRole:
+            return url
+        if role == Qt.DecorationRole and index.column() == 0:
+            return self.favicons.icon(url)
+        return None
+
+    def url_at(self, row):
+        return self.rows[row][1]
+
+    def on_bookmark_added(self, url, title):
+        row = (title or None, url)
+        key = self.sort_key(row)
+        position = bisect.bisect_left(self.keys, key)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.insert(position, row)
+        self.keys.insert(position, key)
+        self.endInsertRows()
+
+    def on_bookmark_removed(self, url):
+        for position, (_, row_url) in enumerate(self.rows):
+            if row_url == url:
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self.rows[position]
+                del self.keys[position]
+                self.endRemoveRows()
+                return
+
+    def on_bookmarks_reloaded(self):
+        self.beginResetModel()
+        self.rows = sorted(self.store.all(), key=self.sort_key)
+        self.keys = [self.sort_key(row) for row in self.rows]
+        self.endResetModel()
+
+    def on_snapshots_changed(self, *args):
+        if self.rows:
+            self.dataChanged.emit(self.index(0, 2), self.index(len(self.rows) - 1, 2))
+
+    def detach(self):
+        self.store.bookmark_added.disconnect(self.on_bookmark_added)
+        self.store.bookmark_removed.disconnect(self.on_bookmark_removed)
+        self.store.bookmarks_reloaded.disconnect(self.on_bookmarks_reloaded)
+        self.snapshots.snapshot_saved.disconnect(self.on_snapshots_changed)
+        self.snapshots.snapshots_evicted.disconnect(self.on_snapshots_changed)
+
 class BookmarkManager(QDialog):
-    def __init__(self, connection, parent=None):
+    def __init__(self, store, parent=None):
         super().__init__(parent)
-        self.conn = connection
+        self.store = store
         self.setWindowTitle("Bookmark Manager")
         self.resize(800, 500)
         
@@ -95,43 +1508,42 @@ class BookmarkManager(QDialog):
         
         layout.addLayout(input_layout)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["Title", "URL", "Actions"])
+        self.model = BookmarkModel(store, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(lambda index: self.open_bookmark(self.model.url_at(index.row())))
         layout.addWidget(self.table)
         
-        self.load_bookmarks()
+        buttons_layout = QHBoxLayout()
         
-        self.setLayout(layout)
+        delete_btn = QPushButton("Delete")
+        delete_btn.clicked.connect(self.delete_selected)
+        buttons_layout.addWidget(delete_btn)
         
-    def load_bookmarks(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT title, url FROM bookmarks ORDER BY title")
-        bookmarks = cursor.fetchall()
+        open_btn = QPushButton("Open")
+        open_btn.clicked.connect(self.open_selected)
+        buttons_layout.addWidget(open_btn)
         
-        self.table.setRowCount(len(bookmarks))
-        for row, (title, url) in enumerate(bookmarks):
-            title_item = QTableWidgetItem(title or "Untitled")
-            self.table.setItem(row, 0, title_item)
-            
-            url_item = QTableWidgetItem(url)
-            self.table.setItem(row, 1, url_item)
-            
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            
-            delete_btn = QPushButton("Delete")
-            delete_btn.clicked.connect(lambda _, u=url: self.delete_bookmark(u))
-            
-            open_btn = QPushButton("Open")
-            open_btn.clicked.connect(lambda _, u=url: self.open_bookmark(u))
-            
-            actions_layout.addWidget(delete_btn)
-            actions_layout.addWidget(open_btn)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            
-            self.table.setCellWidget(row, 2, actions_widget)
+        self.open_offline_btn = QPushButton("Open Offline Copy")
+        self.open_offline_btn.clicked.connect(self.open_offline_selected)
+        self.open_offline_btn.setEnabled(False)
+        buttons_layout.addWidget(self.open_offline_btn)
+        self.table.selectionModel().currentRowChanged.connect(self.update_offline_button)
+        self.model.dataChanged.connect(self.update_offline_button)
+        
+        layout.addLayout(buttons_layout)
+        
+        self.setLayout(layout)
+        self.finished.connect(self.model.detach)
+    
+    def selected_url(self):
+        index = self.table.currentIndex()
+        return self.model.url_at(index.row()) if index.isValid() else None
     
     def add_bookmark(self):
         url = self.url_input.text().strip()
@@ -141,146 +1553,3821 @@ class BookmarkManager(QDialog):
             QMessageBox.warning(self, "Error", "URL cannot be empty")
             return
 
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT OR REPLACE INTO bookmarks (title, url) VALUES (?, ?)", 
-                           (title, url))
-            self.conn.commit()
+        try:
+            self.store.add(url, title)
+
+            self.url_input.clear()
+            self.title_input.clear()
+
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", str(e))
+    
+    def delete_selected(self):
+        url = self.selected_url()
+        if url:
+            self.delete_bookmark(url)
+    
+    def delete_bookmark(self, url):
+        self.store.remove(url)
+    
+    def open_selected(self):
+        url = self.selected_url()
+        if url:
+            self.open_bookmark(url)
+    
+    def open_bookmark(self, url):
+        if self.parent():
+            self.parent().add_new_tab(url)
+        self.close()
+    
+    def update_offline_button(self, *args):
+        url = self.selected_url()
+        self.open_offline_btn.setEnabled(url is not None and self.model.snapshots.latest(url) is not None)
+    
+    def open_offline_selected(self):
+        url = self.selected_url()
+        snapshot_id = self.model.snapshots.latest(url) if url else None
+        if snapshot_id is not None:
+            self.open_bookmark(SnapshotStore.snapshot_url(snapshot_id))
+
+def clear_history_tables(conn, tables):
+    # The FTS indexes are external-content tables: they are emptied with
+    # 'delete-all' while their delete triggers are set aside, since the
+    # triggers would rewrite the index once for every deleted row.
+    triggers = conn.execute('''SELECT name, sql FROM sqlite_master
+                               WHERE type = 'trigger' AND name IN ('urls_fts_delete', 'page_text_fts_delete')''').fetchall()
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name, _ in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+            for table in tables:
+                conn.execute(f"DELETE FROM {table}")
+            if 'urls' in tables:
+                conn.execute("INSERT INTO urls_fts (urls_fts) VALUES ('delete-all')")
+            if 'page_text' in tables:
+                conn.execute("INSERT INTO page_text_fts (page_text_fts) VALUES ('delete-all')")
+            for _, sql in triggers:
+                conn.execute(sql)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = isolation_level
+
+HISTORY_TABLES = ('visits', 'urls', 'page_loads', 'page_text_urls', 'page_text')
+
+class HistoryPageLoader(QObject):
+    page_loaded = pyqtSignal(int, list)
+    history_cleared = pyqtSignal(bool)
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        self.conn = None
+
+    @pyqtSlot(int, object, int)
+    def load_page(self, generation, after, limit):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_path)
+        try:
+            if after is None:
+                rows = self.conn.execute("""
+                    SELECT v.id, u.title, u.url, v.visited_at
+                    FROM visits v JOIN urls u ON u.id = v.url_id
+                    ORDER BY v.visited_at DESC, v.id DESC
+                    LIMIT ?
+                """, (limit,)).fetchall()
+            else:
+                rows = self.conn.execute("""
+                    SELECT v.id, u.title, u.url, v.visited_at
+                    FROM visits v JOIN urls u ON u.id = v.url_id
+                    WHERE (v.visited_at, v.id) < (?, ?)
+                    ORDER BY v.visited_at DESC, v.id DESC
+                    LIMIT ?
+                """, (after[0], after[1], limit)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error loading history: {e}")
+            rows = []
+        self.page_loaded.emit(generation, rows)
+
+    @pyqtSlot()
+    def clear_history(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_path)
+        try:
+            clear_history_tables(self.conn, HISTORY_TABLES)
+        except sqlite3.Error as e:
+            print(f"Error clearing history: {e}")
+            self.history_cleared.emit(False)
+            return
+        self.history_cleared.emit(True)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+class HistoryModel(QAbstractTableModel):
+    request_page = pyqtSignal(int, object, int)
+    request_clear = pyqtSignal()
+
+    HEADERS = ["Title", "URL", "Visited At"]
+
+    def __init__(self, db_path, page_size=200, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self.favicons = FaviconStore.shared(db_path)
+        self.rows = []
+        self.exhausted = False
+        self.loading = False
+        self.generation = 0
+
+        self.loader_thread = QThread()
+        self.loader = HistoryPageLoader(db_path)
+        self.loader.moveToThread(self.loader_thread)
+        self.loader_thread.finished.connect(self.loader.close, Qt.DirectConnection)
+        self.request_page.connect(self.loader.load_page)
+        self.request_clear.connect(self.loader.clear_history)
+        self.loader.page_loaded.connect(self.on_page_loaded)
+        self.loader_thread.start()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        _, title, url, visited_at = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return title or "Untitled"
+            if column == 1:
+                return url
+            return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(visited_at))
+        if role == Qt.ToolTipRole:
+            return url
+        if role == Qt.DecorationRole and index.column() == 0:
+            # Asked for by the view only for rows it paints.
+            return self.favicons.icon(url)
+        return None
+
+    def url_at(self, row):
+        return self.rows[row][2]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted or self.loading:
+            return
+        self.loading = True
+        after = (self.rows[-1][3], self.rows[-1][0]) if self.rows else None
+        self.request_page.emit(self.generation, after, self.page_size)
+
+    def on_page_loaded(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.loading = False
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if rows:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.generation += 1
+        self.rows = []
+        self.exhausted = True
+        self.loading = False
+        self.endResetModel()
+
+    def clear_history(self):
+        # The wipe runs on the loader thread; history_cleared reports back.
+        self.clear()
+        self.request_clear.emit()
+
+    def shutdown(self):
+        self.generation += 1
+        self.loader_thread.quit()
+        self.loader_thread.wait()
+
+class HistoryViewer(QDialog):
+    def __init__(self, connection, db_path, parent=None):
+        super().__init__(parent)
+        self.conn = connection
+        self.setWindowTitle("Browsing History")
+        self.resize(800, 500)
+        
+        layout = QVBoxLayout()
+        
+        self.model = HistoryModel(db_path, parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(lambda index: self.open_history_item(self.model.url_at(index.row())))
+        layout.addWidget(self.table)
+        
+        buttons_layout = QHBoxLayout()
+        
+        open_btn = QPushButton("Open")
+        open_btn.clicked.connect(self.open_selected)
+        buttons_layout.addWidget(open_btn)
+        
+        self.clear_btn = QPushButton("Clear History")
+        self.clear_btn.clicked.connect(self.clear_history)
+        buttons_layout.addWidget(self.clear_btn)
+        
+        search_content_btn = QPushButton("Search Page Content")
+        search_content_btn.clicked.connect(self.search_content)
+        buttons_layout.addWidget(search_content_btn)
+        
+        layout.addLayout(buttons_layout)
+        
+        self.setLayout(layout)
+        self.finished.connect(self.model.shutdown)
+        self.model.loader.history_cleared.connect(self.on_history_cleared)
+        
+        self.model.fetchMore()
+    
+    def open_selected(self):
+        index = self.table.currentIndex()
+        if index.isValid():
+            self.open_history_item(self.model.url_at(index.row()))
+    
+    def open_history_item(self, url):
+        if self.parent():
+            self.parent().add_new_tab(url)
+        self.close()
+    
+    def search_content(self):
+        self.close()
+        if self.parent():
+            self.parent().view_content_search()
+    
+    def clear_history(self):
+        if self.parent():
+            self.parent().history_recorder.discard_pending()
+            self.parent().content_indexer.discard_pending()
+        self.clear_btn.setEnabled(False)
+        self.clear_btn.setText("Clearing...")
+        self.model.clear_history()
+    
+    def on_history_cleared(self, ok):
+        self.clear_btn.setEnabled(True)
+        self.clear_btn.setText("Clear History")
+        if not ok:
+            QMessageBox.critical(self, "Database Error", "Could not clear the history")
+            return
+        self.model.favicons.clear()
+        for window in WebBrowser.windows:
+            if window.omnibox is not None:
+                window.omnibox.refresh_history()
+
+class CustomWebPage(QWebEnginePage):
+    def createWindow(self, _type):
+        browser = getattr(self.view(), 'browser', None)
+        if browser is None:
+            return None
+        web_view = browser.add_new_tab("about:blank", private=self.profile().isOffTheRecord(),
+                                       background=_type == QWebEnginePage.WebBrowserBackgroundTab)
+        return web_view.page()
+
+def registrable_domain(host):
+    # Without a public suffix list, the last two labels are close enough to
+    # tell first-party from third-party requests.
+    return ".".join(host.rsplit(".", 2)[-2:])
+
+
+class FilterRule:
+    # pattern is either None (the host match is enough), a tuple of literal
+    # parts separated by '*', or a regular expression source.
+    __slots__ = ('source', 'pattern', 'types', 'third_party', 'include_domains', 'exclude_domains',
+                 'match_case', 'regex')
+
+    def __init__(self, source, pattern, types, third_party, include_domains, exclude_domains, match_case):
+        self.source = source
+        self.pattern = pattern
+        self.types = types
+        self.third_party = third_party
+        self.include_domains = include_domains
+        self.exclude_domains = exclude_domains
+        self.match_case = match_case
+        self.regex = None
+
+    def state(self):
+        # Plain JSON values, so the compiled cache holds data and nothing else.
+        return [self.source, list(self.pattern) if type(self.pattern) is tuple else self.pattern, self.types,
+                self.third_party, sorted(self.include_domains) if self.include_domains is not None else None,
+                sorted(self.exclude_domains) if self.exclude_domains is not None else None, self.match_case]
+
+    @classmethod
+    def from_state(cls, state):
+        source, pattern, types, third_party, include_domains, exclude_domains, match_case = state
+        if isinstance(pattern, list):
+            pattern = tuple(pattern)
+        elif pattern is not None and not isinstance(pattern, str):
+            raise ValueError(f"bad pattern in cached rule {source!r}")
+        if not isinstance(types, int) or third_party not in (None, True, False):
+            raise ValueError(f"bad options in cached rule {source!r}")
+        return cls(source, pattern, types, third_party,
+                   frozenset(include_domains) if include_domains is not None else None,
+                   frozenset(exclude_domains) if exclude_domains is not None else None, bool(match_case))
+
+    def applies(self, type_bit, third_party, first_party_host):
+        if not self.types & type_bit:
+            return False
+        if self.third_party is not None and self.third_party != third_party:
+            return False
+        if self.include_domains is not None or self.exclude_domains is not None:
+            labels = first_party_host.split(".")
+            suffixes = {".".join(labels[i:]) for i in range(len(labels))}
+            if self.exclude_domains is not None and suffixes & self.exclude_domains:
+                return False
+            if self.include_domains is not None and not suffixes & self.include_domains:
+                return False
+        return True
+
+    def matches(self, url, url_lower):
+        pattern = self.pattern
+        if pattern is None:
+            return True
+        target = url if self.match_case else url_lower
+        if type(pattern) is tuple:
+            position = 0
+            for part in pattern:
+                position = target.find(part, position)
+                if position < 0:
+                    return False
+                position += len(part)
+            return True
+        if self.regex is None:
+            self.regex = re.compile(pattern)
+        return self.regex.search(target) is not None
+
+
+class FilterRuleSet:
+    def __init__(self):
+        self.domains = {}
+        self.tokens = {}
+        self.generic = []
+
+    def add_domain_rule(self, host, rule):
+        self.domains.setdefault(host, []).append(rule)
+
+    def add_token_rule(self, tokens, rule):
+        if not tokens:
+            self.generic.append(rule)
+            return
+        # The rarest token keeps buckets short; ties go to the longest token.
+        token = min(tokens, key=lambda token: (len(self.tokens.get(token, ())), -len(token)))
+        self.tokens.setdefault(token, []).append(rule)
+
+    def find(self, url, url_lower, host_suffixes, url_tokens, type_bit, third_party, first_party_host):
+        for suffix in host_suffixes:
+            for rule in self.domains.get(suffix, ()):
+                if rule.applies(type_bit, third_party, first_party_host) and rule.matches(url, url_lower):
+                    return rule
+        for token in url_tokens:
+            for rule in self.tokens.get(token, ()):
+                if rule.applies(type_bit, third_party, first_party_host) and rule.matches(url, url_lower):
+                    return rule
+        for rule in self.generic:
+            if rule.applies(type_bit, third_party, first_party_host) and rule.matches(url, url_lower):
+                return rule
+        return None
+
+    def size(self):
+        return (sum(len(rules) for rules in self.domains.values())
+                + sum(len(rules) for rules in self.tokens.values()) + len(self.generic))
+
+    def state(self):
+        return {
+            'domains': {host: [rule.state() for rule in rules] for host, rules in self.domains.items()},
+            'tokens': {token: [rule.state() for rule in rules] for token, rules in self.tokens.items()},
+            'generic': [rule.state() for rule in self.generic],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        rule_set = cls()
+        rule_set.domains = {host: [FilterRule.from_state(rule) for rule in rules]
+                            for host, rules in state['domains'].items()}
+        rule_set.tokens = {token: [FilterRule.from_state(rule) for rule in rules]
+                           for token, rules in state['tokens'].items()}
+        rule_set.generic = [FilterRule.from_state(rule) for rule in state['generic']]
+        return rule_set
+
+
+class ContentFilter:
+    CACHE_VERSION = 2
+
+    TYPE_BITS = {
+        'document': 1 << 0,
+        'subdocument': 1 << 1,
+        'stylesheet': 1 << 2,
+        'script': 1 << 3,
+        'image': 1 << 4,
+        'font': 1 << 5,
+        'object': 1 << 6,
+        'media': 1 << 7,
+        'xmlhttprequest': 1 << 8,
+        'ping': 1 << 9,
+        'websocket': 1 << 10,
+        'other': 1 << 11,
+    }
+    TYPE_ALIASES = {'xhr': 'xmlhttprequest', 'css': 'stylesheet', 'frame': 'subdocument',
+                    'beacon': 'ping', 'doc': 'document', 'object-subrequest': 'object'}
+    ALL_TYPES = (1 << 12) - 1
+    DEFAULT_TYPES = ALL_TYPES & ~TYPE_BITS['document']
+    IGNORED_OPTIONS = {'important', 'all', 'popunder'}
+
+    URL_TOKEN = re.compile(r'[a-z0-9%]{2,}')
+    PATTERN_TOKEN = re.compile(r'[a-z0-9%]{2,}')
+    SEPARATOR = r'(?:[^\w.%-]|$)'
+    DOMAIN_ANCHOR = r'^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?'
+
+    instance = None
+
+    @classmethod
+    def shared(cls):
+        if cls.instance is None:
+            settings = QSettings("HomiBrowser", "HomiBrowser")
+            paths = settings.value("content_blocking/lists", None)
+            if not paths:
+                paths = sorted(os.path.join(FILTER_LIST_DIR, name) for name in os.listdir(FILTER_LIST_DIR)
+                               if name.endswith(".txt")) if os.path.isdir(FILTER_LIST_DIR) else []
+            elif isinstance(paths, str):
+                paths = [paths]
+            # The compiled rules are cached next to the rest of the profile's
+            # data rather than in whatever directory the browser started in.
+            cache_dir = QWebEngineProfile.defaultProfile().persistentStoragePath()
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"Error creating {cache_dir}: {e}")
+            cls.instance = cls(paths, os.path.join(cache_dir, CONTENT_FILTER_CACHE),
+                               enabled=settings.value("content_blocking/enabled", True, type=bool))
+            cls.instance.load_in_background()
+        return cls.instance
+
+    def __init__(self, list_paths, cache_path=None, enabled=True):
+        self.list_paths = list(list_paths)
+        self.cache_path = cache_path
+        self.enabled = enabled
+        self.compiled = None
+        self.load_stats = {}
+
+    @property
+    def ready(self):
+        return self.compiled is not None
+
+    def load_in_background(self):
+        if not self.enabled or not self.list_paths:
+            return
+        threading.Thread(target=self.load, name="ContentFilterLoader", daemon=True).start()
+
+    def cache_key(self):
+        key = [self.CACHE_VERSION]
+        for path in self.list_paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        return key
+
+    def load(self):
+        started = time.perf_counter()
+        key = self.cache_key()
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, encoding='utf-8') as cache:
+                    cached = json.load(cache)
+                if cached['key'] == key:
+                    self.compiled = (FilterRuleSet.from_state(cached['block']),
+                                     FilterRuleSet.from_state(cached['allow']))
+                    self.load_stats = dict(cached['stats'], source='cache',
+                                           seconds=time.perf_counter() - started)
+                    return
+            except Exception as e:
+                # A stale, truncated or foreign cache is only a miss; the
+                # lists are compiled again below.
+                print(f"Ignoring content filter cache: {e}")
+
+        block, allow, stats = self.compile_lists(self.list_paths)
+        self.compiled = (block, allow)
+        if self.cache_path:
+            try:
+                temporary_path = self.cache_path + ".tmp"
+                with open(temporary_path, 'w', encoding='utf-8') as cache:
+                    json.dump({'key': key, 'block': block.state(), 'allow': allow.state(), 'stats': stats},
+                              cache, separators=(',', ':'))
+                os.replace(temporary_path, self.cache_path)
+            except OSError as e:
+                print(f"Error saving content filter cache: {e}")
+        self.load_stats = dict(stats, source='lists', seconds=time.perf_counter() - started)
+
+    def compile_lists(self, paths):
+        block = FilterRuleSet()
+        allow = FilterRuleSet()
+        stats = {'rules': 0, 'skipped': 0}
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8', errors='replace') as filter_list:
+                    for line in filter_list:
+                        if self.add_rule(line.strip(), block, allow):
+                            stats['rules'] += 1
+                        else:
+                            stats['skipped'] += 1
+            except OSError as e:
+                print(f"Error reading filter list {path}: {e}")
+        return block, allow, stats
+
+    def add_rule(self, line, block, allow):
+        # Comments, headers and element-hiding rules do not affect requests.
+        if not line or line[0] in '![' or '##' in line or '#@#' in line or '#?#' in line or '#$#' in line:
+            return False
+
+        rule_set = block
+        if line.startswith('@@'):
+            rule_set = allow
+            line = line[2:]
+
+        options = ''
+        if '$' in line and not (line.startswith('/') and line.endswith('/')):
+            line, options = line.rsplit('$', 1)
+        parsed = self.parse_options(options)
+        if parsed is None or not line or (line.startswith('/') and line.endswith('/') and len(line) > 1):
+            # Unsupported options and raw regular expressions are skipped.
+            return False
+        types, third_party, include_domains, exclude_domains, match_case = parsed
+
+        if line.startswith('||'):
+            body = line[2:]
+            host_end = len(body)
+            for index, char in enumerate(body):
+                if char in '/^*|:?':
+                    host_end = index
+                    break
+            host = body[:host_end].lower()
+            rest = body[host_end:]
+            if host and '*' not in host:
+                pattern = None
+                if rest not in ('', '^', '^|', '|'):
+                    pattern = self.DOMAIN_ANCHOR + re.escape(host) + self.pattern_to_regex(
+                        rest if match_case else rest.lower())
+                rule_set.add_domain_rule(host, FilterRule(line, pattern, types, third_party, include_domains,
+                                                          exclude_domains, match_case))
+                return True
+
+        literal = line if match_case else line.lower()
+        if '^' in literal or '|' in literal:
+            pattern = self.pattern_to_regex(literal)
+        else:
+            pattern = tuple(part for part in literal.split('*') if part)
+        rule = FilterRule(line, pattern, types, third_party, include_domains, exclude_domains, match_case)
+        rule_set.add_token_rule(self.pattern_tokens(line), rule)
+        return True
+
+    def parse_options(self, options):
+        types_included = 0
+        types_excluded = 0
+        third_party = None
+        include_domains = None
+        exclude_domains = None
+        match_case = False
+        for option in filter(None, options.lower().split(',')):
+            negated = option.startswith('~')
+            name = option.lstrip('~')
+            name = self.TYPE_ALIASES.get(name, name)
+            if name in self.TYPE_BITS:
+                if negated:
+                    types_excluded |= self.TYPE_BITS[name]
+                else:
+                    types_included |= self.TYPE_BITS[name]
+            elif name in ('third-party', '3p'):
+                third_party = not negated
+            elif name in ('first-party', '1p'):
+                third_party = negated
+            elif name.startswith('domain='):
+                for domain in name[7:].split('|'):
+                    if domain.startswith('~'):
+                        exclude_domains = (exclude_domains or frozenset()) | {domain[1:]}
+                    elif domain:
+                        include_domains = (include_domains or frozenset()) | {domain}
+            elif name == 'match-case':
+                match_case = True
+            elif name not in self.IGNORED_OPTIONS:
+                return None
+        if types_included:
+            types = types_included
+        elif types_excluded:
+            types = self.ALL_TYPES & ~types_excluded
+        else:
+            types = self.DEFAULT_TYPES
+        return types, third_party, include_domains, exclude_domains, match_case
+
+    def pattern_to_regex(self, pattern):
+        start = end = ''
+        if pattern.startswith('||'):
+            start, pattern = self.DOMAIN_ANCHOR, pattern[2:]
+        elif pattern.startswith('|'):
+            start, pattern = '^', pattern[1:]
+        if pattern.endswith('|'):
+            end, pattern = '$', pattern[:-1]
+        parts = []
+        for char in pattern:
+            if char == '*':
+                parts.append('.*')
+            elif char == '^':
+                parts.append(self.SEPARATOR)
+            else:
+                parts.append(re.escape(char))
+        return start + ''.join(parts) + end
+
+    def pattern_tokens(self, pattern):
+        # Only tokens that are whole in every matching URL can be indexed:
+        # a run touching '*' or an unanchored end may be part of a longer one.
+        lowered = pattern.lower()
+        left_anchored = lowered.startswith('|')
+        right_anchored = lowered.endswith('|')
+        body = lowered.strip('|')
+        tokens = []
+        for match in self.PATTERN_TOKEN.finditer(body):
+            start, end = match.span()
+            before = body[start - 1] if start > 0 else None
+            after = body[end] if end < len(body) else None
+            if before == '*' or after == '*':
+                continue
+            if before is None and not left_anchored:
+                continue
+            if after is None and not right_anchored:
+                continue
+            tokens.append(match.group())
+        return tokens
+
+    def should_block(self, url, host, first_party_host, resource_type='other'):
+        compiled = self.compiled
+        if compiled is None or not self.enabled:
+            return False
+        block, allow = compiled
+        host = host.lower()
+        first_party_host = (first_party_host or host).lower()
+        labels = host.split(".")
+        host_suffixes = [".".join(labels[i:]) for i in range(max(len(labels) - 1, 1))]
+        url_lower = url.lower()
+        url_tokens = set(self.URL_TOKEN.findall(url_lower))
+        type_bit = self.TYPE_BITS.get(resource_type, self.TYPE_BITS['other'])
+        third_party = registrable_domain(host) != registrable_domain(first_party_host)
+
+        if block.find(url, url_lower, host_suffixes, url_tokens, type_bit, third_party, first_party_host) is None:
+            return False
+        return allow.find(url, url_lower, host_suffixes, url_tokens, type_bit, third_party,
+                          first_party_host) is None
+
+    def stats(self):
+        compiled = self.compiled
+        return dict(self.load_stats,
+                    block_rules=compiled[0].size() if compiled else 0,
+                    allow_rules=compiled[1].size() if compiled else 0)
+
+
+class PageRequestFilter(QWebEngineUrlRequestInterceptor):
+    RESOURCE_TYPES = {
+        QWebEngineUrlRequestInfo.ResourceTypeSubFrame: 'subdocument',
+        QWebEngineUrlRequestInfo.ResourceTypeStylesheet: 'stylesheet',
+        QWebEngineUrlRequestInfo.ResourceTypeScript: 'script',
+        QWebEngineUrlRequestInfo.ResourceTypeImage: 'image',
+        QWebEngineUrlRequestInfo.ResourceTypeFavicon: 'image',
+        QWebEngineUrlRequestInfo.ResourceTypeFontResource: 'font',
+        QWebEngineUrlRequestInfo.ResourceTypeObject: 'object',
+        QWebEngineUrlRequestInfo.ResourceTypePluginResource: 'object',
+        QWebEngineUrlRequestInfo.ResourceTypeMedia: 'media',
+        QWebEngineUrlRequestInfo.ResourceTypeXhr: 'xmlhttprequest',
+        QWebEngineUrlRequestInfo.ResourceTypePing: 'ping',
+        QWebEngineUrlRequestInfo.ResourceTypeCspReport: 'ping',
+    }
+
+    def __init__(self, content_filter, parent=None):
+        super().__init__(parent)
+        self.content_filter = content_filter
+        self.blocked = 0
+        self.blocked_total = 0
+
+    def interceptRequest(self, info):
+        resource_type = info.resourceType()
+        if resource_type == QWebEngineUrlRequestInfo.ResourceTypeMainFrame:
+            self.blocked = 0
+            return
+        url = info.requestUrl()
+        first_party = info.firstPartyUrl()
+        if first_party.scheme() == SNAPSHOT_SCHEME:
+            # An offline page never reaches the network: what it asks for
+            # is answered from its snapshot, or not at all.
+            snapshot_id = SnapshotStore.snapshot_id(first_party.host())
+            if url.scheme() in ('http', 'https', 'cid') and snapshot_id is not None:
+                location = url.adjusted(QUrl.RemoveFragment).toString(QUrl.FullyEncoded)
+                info.redirect(QUrl(SnapshotStore.snapshot_url(snapshot_id, location)))
+            elif url.scheme() in ('http', 'https', 'ws', 'wss'):
+                info.block(True)
+            return
+        if url.scheme() not in ('http', 'https', 'ws', 'wss'):
+            return
+        if self.content_filter.should_block(url.toString(), url.host(), first_party.host(),
+                                            self.RESOURCE_TYPES.get(resource_type, 'other')):
+            info.block(True)
+            self.blocked += 1
+            self.blocked_total += 1
+
+# Each profile bundles the Chromium switches the browser starts with, the
+# default page settings and the HTTP cache limits. Switches only take
+# effect when the QApplication is created, so a change applies on restart.
+RESOURCE_PROFILES = {
+    'low-memory': {
+        'description': "Fewest renderer processes, software rendering, small caches",
+        'switches': ['--process-per-site', '--renderer-process-limit=2', '--disable-gpu',
+                     '--disable-gpu-compositing', '--enable-low-end-device-mode'],
+        'attributes': {
+            QWebEngineSettings.WebGLEnabled: False,
+            QWebEngineSettings.Accelerated2dCanvasEnabled: False,
+            QWebEngineSettings.PluginsEnabled: False,
+            QWebEngineSettings.DnsPrefetchEnabled: False,
+            QWebEngineSettings.ScrollAnimatorEnabled: False,
+        },
+        'disk_cache_mb': 32,
+        'private_cache_mb': 8,
+    },
+    'balanced': {
+        'description': "Chromium's own process model and GPU settings",
+        'switches': [],
+        'attributes': {
+            QWebEngineSettings.WebGLEnabled: True,
+            QWebEngineSettings.Accelerated2dCanvasEnabled: True,
+            QWebEngineSettings.DnsPrefetchEnabled: False,
+            QWebEngineSettings.ScrollAnimatorEnabled: False,
+        },
+        'disk_cache_mb': 256,
+        'private_cache_mb': 32,
+    },
+    'performance': {
+        'description': "GPU rasterization, DNS prefetch and large caches",
+        'switches': ['--enable-gpu-rasterization', '--ignore-gpu-blocklist', '--enable-zero-copy'],
+        'attributes': {
+            QWebEngineSettings.WebGLEnabled: True,
+            QWebEngineSettings.Accelerated2dCanvasEnabled: True,
+            QWebEngineSettings.DnsPrefetchEnabled: True,
+            QWebEngineSettings.ScrollAnimatorEnabled: True,
+        },
+        'disk_cache_mb': 1024,
+        'private_cache_mb': 128,
+    },
+}
+DEFAULT_RESOURCE_PROFILE = 'balanced'
+
+def select_resource_profile(argv):
+    # --resource-profile=<name> wins over the saved choice. The profile's
+    # switches are added to the arguments the QApplication is created with.
+    name = QSettings("HomiBrowser", "HomiBrowser").value("performance/resource_profile", DEFAULT_RESOURCE_PROFILE)
+    rest = []
+    for arg in argv:
+        if arg.startswith('--resource-profile='):
+            name = arg.split('=', 1)[1]
+        else:
+            rest.append(arg)
+    if name not in RESOURCE_PROFILES:
+        print(f"Unknown resource profile {name!r}, using {DEFAULT_RESOURCE_PROFILE}")
+        name = DEFAULT_RESOURCE_PROFILE
+    ProfileManager.resource_profile = name
+    return rest[:1] + RESOURCE_PROFILES[name]['switches'] + rest[1:]
+
+class ProfileManager(QObject):
+    DISK_CACHE_MB = 256
+    PRIVATE_CACHE_MB = 32
+
+    instance = None
+    resource_profile = DEFAULT_RESOURCE_PROFILE
+
+    @classmethod
+    def shared(cls):
+        if cls.instance is None:
+            settings = QSettings("HomiBrowser", "HomiBrowser")
+            # Cache sizes set explicitly still win over the profile's.
+            profile = RESOURCE_PROFILES[cls.resource_profile]
+            cls.instance = cls(
+                disk_cache_mb=settings.value("profiles/disk_cache_mb", profile['disk_cache_mb'], type=int),
+                private_cache_mb=settings.value("profiles/private_cache_mb", profile['private_cache_mb'], type=int),
+                attributes=profile['attributes'],
+            )
+        return cls.instance
+
+    def __init__(self, disk_cache_mb=DISK_CACHE_MB, private_cache_mb=PRIVATE_CACHE_MB, attributes=None):
+        super().__init__()
+        self.disk_cache_mb = disk_cache_mb
+        self.private_cache_mb = private_cache_mb
+        self.attributes = attributes or {}
+        self.private = None
+        self.private_pages = 0
+        self.private_sessions = 0
+        self.content_filter = ContentFilter.shared()
+        self.scheme_handlers = {}
+        self.download_claims = []
+
+        self.persistent = QWebEngineProfile.defaultProfile()
+        self.persistent.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+        self.persistent.setHttpCacheMaximumSize(disk_cache_mb * 2**20)
+        self.persistent.downloadRequested.connect(self.route_download)
+        self.apply_attributes(self.persistent)
+
+    def profile(self, private=False):
+        if not private:
+            return self.persistent
+        if self.private is None:
+            # A profile without a storage name is off the record. All private
+            # tabs share it until the last one closes, which ends the session.
+            self.private = QWebEngineProfile(self)
+            self.private.setHttpCacheType(QWebEngineProfile.MemoryHttpCache)
+            self.private.setHttpCacheMaximumSize(self.private_cache_mb * 2**20)
+            self.private.downloadRequested.connect(self.route_download)
+            self.apply_attributes(self.private)
+            for scheme, handler in self.scheme_handlers.items():
+                self.private.installUrlSchemeHandler(scheme.encode(), handler)
+            self.private_sessions += 1
+        return self.private
+
+    def apply_attributes(self, profile):
+        # Profile settings are the defaults of every page in the profile,
+        # so each new tab starts from them.
+        settings = profile.settings()
+        for attribute, enabled in self.attributes.items():
+            settings.setAttribute(attribute, enabled)
+
+    def create_page(self, private=False, parent=None):
+        page = CustomWebPage(self.profile(private), parent)
+        # Filtering per page instead of per profile gives every tab its own
+        # block counter; the compiled rules are shared.
+        page.request_filter = PageRequestFilter(self.content_filter, page)
+        page.setUrlRequestInterceptor(page.request_filter)
+        if private:
+            self.private_pages += 1
+            page.destroyed.connect(self.release_private_page)
+        return page
+
+    def release_private_page(self):
+        self.private_pages -= 1
+        if self.private_pages == 0 and self.private is not None:
+            self.private.deleteLater()
+            self.private = None
+
+    def install_scheme_handler(self, scheme, handler):
+        # Handlers are per profile; private profiles created later get the
+        # same ones.
+        if scheme in self.scheme_handlers:
+            return
+        self.scheme_handlers[scheme] = handler
+        self.persistent.installUrlSchemeHandler(scheme.encode(), handler)
+        if self.private is not None:
+            self.private.installUrlSchemeHandler(scheme.encode(), handler)
+
+    def add_download_claim(self, claim):
+        # A claim sees each download first and returns True to keep it from
+        # the download manager.
+        if claim not in self.download_claims:
+            self.download_claims.append(claim)
+
+    def route_download(self, download):
+        if any(claim(download) for claim in self.download_claims):
+            return
+        page = download.page()
+        browser = getattr(page.view() if page is not None else None, 'browser', None)
+        if browser is None:
+            active = QApplication.activeWindow()
+            if isinstance(active, WebBrowser):
+                browser = active
+            elif WebBrowser.windows:
+                browser = WebBrowser.windows[0]
+        if browser is None:
+            download.cancel()
+            return
+        browser.handle_download(download)
+
+    def stats(self):
+        return {
+            'resource_profile': self.resource_profile,
+            'disk_cache_mb': self.disk_cache_mb,
+            'private_cache_mb': self.private_cache_mb,
+            'private_pages': self.private_pages,
+            'private_sessions': self.private_sessions,
+        }
+
+class DownloadJob:
+    def __init__(self, download, row_id, priority=0):
+        self.download = download
+        self.id = row_id
+        self.priority = priority
+        self.state = 'queued'
+        self.received = 0
+        self.total = download.totalBytes()
+        self.speed = 0.0
+        self.sampled_at = time.monotonic()
+        self.dirty = True
+
+    def file_name(self):
+        return self.download.downloadFileName()
+
+    def sample(self, now):
+        received = self.download.receivedBytes()
+        total = self.download.totalBytes()
+        elapsed = now - self.sampled_at
+        if elapsed > 0:
+            instant = (received - self.received) / elapsed
+            self.speed = instant if self.speed == 0 else 0.7 * self.speed + 0.3 * instant
+        self.sampled_at = now
+        if received != self.received or total != self.total:
+            self.received = received
+            self.total = total
+            self.dirty = True
+
+class DownloadScheduler(QObject):
+    job_added = pyqtSignal(object)
+    jobs_updated = pyqtSignal(list)
+
+    REFRESH_INTERVAL = 250
+    PERSIST_INTERVAL = 5.0
+    FINISHED_STATES = {
+        QWebEngineDownloadItem.DownloadCompleted: 'completed',
+        QWebEngineDownloadItem.DownloadCancelled: 'cancelled',
+        QWebEngineDownloadItem.DownloadInterrupted: 'interrupted',
+    }
+
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path, max_concurrent=3):
+        scheduler = cls.instances.get(db_path)
+        if scheduler is None:
+            scheduler = cls(db_path, max_concurrent)
+            cls.instances[db_path] = scheduler
+        return scheduler
+
+    def __init__(self, db_path, max_concurrent=3, download_dir=None):
+        super().__init__()
+        self.conn = connect_database(db_path)
+        self.max_concurrent = max_concurrent
+        self.download_dir = download_dir or os.path.expanduser("~/Downloads")
+        self.jobs = []
+        self.known_ids = set()
+        self.queue = []
+        self.queue_seq = 0
+        self.persisted_at = time.monotonic()
+        
+        # Whatever was still running when the last session ended cannot be
+        # picked up again by QtWebEngine; it is offered for retry instead.
+        with self.conn:
+            self.conn.execute('''UPDATE downloads SET state = 'interrupted'
+                                 WHERE state IN ('queued', 'active', 'paused')''')
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def past_downloads(self, limit=50):
+        return self.conn.execute('''SELECT id, url, path, state, received, total
+                                    FROM downloads
+                                    WHERE state IN ('completed', 'cancelled', 'interrupted')
+                                    ORDER BY created_at DESC LIMIT ?''', (limit,)).fetchall()
+
+    def active_count(self):
+        return sum(1 for job in self.jobs if job.state == 'active')
+
+    def handle_request(self, download, priority=0):
+        if download.id() in self.known_ids:
+            return None
+        self.known_ids.add(download.id())
+        
+        os.makedirs(self.download_dir, exist_ok=True)
+        download.setDownloadDirectory(self.download_dir)
+        download.accept()
+        
+        with self.conn:
+            cursor = self.conn.execute('''INSERT INTO downloads (url, path, state, total, priority, created_at)
+                                          VALUES (?, ?, 'queued', ?, ?, ?)''',
+                                       (download.url().toString(),
+                                        os.path.join(download.downloadDirectory(), download.downloadFileName()),
+                                        download.totalBytes(), priority, int(time.time())))
+        job = DownloadJob(download, cursor.lastrowid, priority)
+        download.finished.connect(lambda job=job: self.on_finished(job))
+        self.jobs.append(job)
+        
+        if self.active_count() < self.max_concurrent:
+            job.state = 'active'
+        else:
+            download.pause()
+            self.enqueue(job)
+        self.persist([job])
+        self.refresh_timer.start(self.REFRESH_INTERVAL)
+        self.job_added.emit(job)
+        return job
+
+    def enqueue(self, job):
+        job.state = 'queued'
+        self.queue_seq += 1
+        heapq.heappush(self.queue, (job.priority, self.queue_seq, job))
+
+    def dequeue(self, job):
+        self.queue = [entry for entry in self.queue if entry[2] is not job]
+        heapq.heapify(self.queue)
+
+    def start_next(self):
+        while self.queue and self.active_count() < self.max_concurrent:
+            _, _, job = heapq.heappop(self.queue)
+            if job.state != 'queued':
+                continue
+            job.state = 'active'
+            job.dirty = True
+            job.download.resume()
+            self.persist([job])
+        if self.active_count():
+            self.refresh_timer.start(self.REFRESH_INTERVAL)
+
+    def pause(self, job):
+        if job.state not in ('active', 'queued'):
+            return
+        if job.state == 'active':
+            job.download.pause()
+        else:
+            # Resuming queues the job again; an entry left here would start
+            # it from its old place.
+            self.dequeue(job)
+        job.state = 'paused'
+        job.dirty = True
+        self.persist([job])
+        self.start_next()
+
+    def resume(self, job):
+        if job.state != 'paused':
+            return
+        if self.active_count() < self.max_concurrent:
+            job.state = 'active'
+            job.download.resume()
+            self.refresh_timer.start(self.REFRESH_INTERVAL)
+        else:
+            self.enqueue(job)
+        job.dirty = True
+        self.persist([job])
+
+    def cancel(self, job):
+        if job.state not in self.FINISHED_STATES.values():
+            job.download.cancel()
+
+    def prioritize(self, job):
+        if job.state != 'queued':
+            return
+        job.priority = min((entry[0] for entry in self.queue), default=0) - 1
+        self.dequeue(job)
+        self.enqueue(job)
+        self.persist([job])
+
+    def on_finished(self, job):
+        job.sample(time.monotonic())
+        job.state = self.FINISHED_STATES.get(job.download.state(), 'interrupted')
+        job.speed = 0.0
+        job.dirty = True
+        self.persist([job], finished=True)
+        self.start_next()
+        self.refresh()
+
+    def persist(self, jobs, finished=False):
+        try:
+            with self.conn:
+                self.conn.executemany('''UPDATE downloads
+                                         SET state = ?, received = ?, total = ?, priority = ?,
+                                             finished_at = COALESCE(?, finished_at)
+                                         WHERE id = ?''',
+                                      [(job.state, job.received, job.total, job.priority,
+                                        int(time.time()) if finished else None, job.id)
+                                       for job in jobs])
+        except sqlite3.Error as e:
+            print(f"Error saving downloads: {e}")
+
+    def refresh(self):
+        # Progress is sampled at a fixed rate instead of repainting on every
+        # chunk QtWebEngine reports.
+        now = time.monotonic()
+        active = [job for job in self.jobs if job.state == 'active']
+        for job in active:
+            job.sample(now)
+        
+        if active and now - self.persisted_at >= self.PERSIST_INTERVAL:
+            self.persist(active)
+            self.persisted_at = now
+        
+        changed = [job for job in self.jobs if job.dirty]
+        for job in changed:
+            job.dirty = False
+        if changed:
+            self.jobs_updated.emit(changed)
+        if not active:
+            self.refresh_timer.stop()
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(count) < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+class DownloadItem(QWidget):
+    def __init__(self, job, scheduler):
+        super().__init__()
+        layout = QVBoxLayout(self)
+        
+        self.job = job
+        self.scheduler = scheduler
+        
+        filename_label = QLabel(job.file_name())
+        layout.addWidget(filename_label)
+        
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+        
+        controls_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        controls_layout.addWidget(self.status_label, 1)
+        
+        self.pause_btn = QPushButton("Pause")
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        controls_layout.addWidget(self.pause_btn)
+        
+        self.first_btn = QPushButton("Start Next")
+        self.first_btn.clicked.connect(lambda: self.scheduler.prioritize(self.job))
+        controls_layout.addWidget(self.first_btn)
+        
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(lambda: self.scheduler.cancel(self.job))
+        controls_layout.addWidget(self.cancel_btn)
+        
+        layout.addLayout(controls_layout)
+        self.refresh()
+    
+    def toggle_pause(self):
+        if self.job.state == 'paused':
+            self.scheduler.resume(self.job)
+        else:
+            self.scheduler.pause(self.job)
+    
+    def refresh(self):
+        job = self.job
+        if job.total > 0:
+            self.progress_bar.setValue(int((job.received / job.total) * 100))
+        elif job.state == 'completed':
+            self.progress_bar.setValue(100)
+        
+        status = f"{job.state.capitalize()} · {format_bytes(job.received)}"
+        if job.total > 0:
+            status += f" of {format_bytes(job.total)}"
+        if job.state == 'active':
+            status += f" · {format_bytes(job.speed)}/s"
+        self.status_label.setText(status)
+        
+        running = job.state in ('active', 'queued', 'paused')
+        self.pause_btn.setText("Resume" if job.state == 'paused' else "Pause")
+        self.pause_btn.setEnabled(running)
+        self.first_btn.setVisible(job.state == 'queued')
+        self.cancel_btn.setEnabled(running)
+
+class PastDownloadItem(QWidget):
+    def __init__(self, record, manager):
+        super().__init__()
+        layout = QHBoxLayout(self)
+        
+        _, url, path, state, received, total = record
+        self.url = url
+        
+        label = QLabel(f"{os.path.basename(path or url)} · {state.capitalize()} · {format_bytes(received or 0)}")
+        label.setToolTip(url)
+        layout.addWidget(label, 1)
+        
+        if state != 'completed':
+            retry_btn = QPushButton("Retry")
+            retry_btn.clicked.connect(lambda: manager.retry(self.url))
+            layout.addWidget(retry_btn)
+
+class DownloadManager(QDialog):
+    def __init__(self, scheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.setWindowTitle("Download Manager")
+        self.resize(500, 300)
+        
+        layout = QVBoxLayout(self)
+        
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        container = QWidget()
+        self.downloads_layout = QVBoxLayout(container)
+        self.downloads_layout.addStretch()
+        scroll_area.setWidget(container)
+        layout.addWidget(scroll_area)
+        
+        self.items = {}
+        for job in scheduler.jobs:
+            self.add_job(job)
+        for record in scheduler.past_downloads():
+            if not any(job.id == record[0] for job in scheduler.jobs):
+                self.downloads_layout.insertWidget(self.downloads_layout.count() - 1, PastDownloadItem(record, self))
+        
+        scheduler.job_added.connect(self.add_download)
+        scheduler.jobs_updated.connect(self.refresh_jobs)
+    
+    def add_job(self, job):
+        download_item = DownloadItem(job, self.scheduler)
+        self.items[job] = download_item
+        self.downloads_layout.insertWidget(0, download_item)
+    
+    def add_download(self, job):
+        self.add_job(job)
+        self.show()
+    
+    def refresh_jobs(self, jobs):
+        if not self.isVisible():
+            return
+        for job in jobs:
+            download_item = self.items.get(job)
+            if download_item is not None:
+                download_item.refresh()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        for download_item in self.items.values():
+            download_item.refresh()
+    
+    def retry(self, url):
+        browser = self.parent()
+        if browser is not None:
+            web_view = browser.tabs.currentWidget()
+            if isinstance(web_view, QWebEngineView):
+                web_view.page().download(QUrl(url))
+
+class HistoryRecorder:
+    def __init__(self, db_path, flush_interval=2.0, collapse_window=1.5, max_pending=5000):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.collapse_window = collapse_window
+        self.max_pending = max_pending
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = []
+        self.pending_by_source = {}
+        self.pending_titles = {}
+        self.recent_urls = {}
+        self.stopping = False
+
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+
+        self.thread = threading.Thread(target=self.run, name="HistoryRecorder", daemon=True)
+        self.thread.start()
+
+    def record(self, title, url, source=None):
+        now = time.monotonic()
+        with self.lock:
+            if self.stopping:
+                self.dropped += 1
+                return
+
+            # Redirect chains and pushState bursts from the same tab collapse
+            # into the last URL they settle on.
+            visit = self.pending_by_source.get(source) if source is not None else None
+            if visit is not None and now - visit['at'] < self.collapse_window:
+                self.recent_urls.pop(visit['url'], None)
+                visit.update(title=title, url=url, at=now, visited_at=time.time())
+                self.recent_urls[url] = (now, visit)
+                self.dropped += 1
+                return
+
+            recent = self.recent_urls.get(url)
+            if recent is not None and now - recent[0] < self.collapse_window:
+                if title and recent[1] is not None:
+                    recent[1]['title'] = title
+                self.dropped += 1
+                return
+
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return
+
+            visit = {'title': title, 'url': url, 'at': now, 'visited_at': time.time()}
+            self.pending.append(visit)
+            if source is not None:
+                self.pending_by_source[source] = visit
+            self.recent_urls[url] = (now, visit)
+            self.queued += 1
+
+    def record_title(self, url, title):
+        # Titles usually arrive after the URL; fold them into the queued visit
+        # when it has not been written yet.
+        with self.lock:
+            recent = self.recent_urls.get(url)
+            if recent is not None and recent[1] is not None:
+                recent[1]['title'] = title
+            else:
+                self.pending_titles[url] = title
+
+    def flush(self):
+        self.wake.set()
+
+    def discard_pending(self):
+        with self.lock:
+            self.dropped += len(self.pending)
+            self.pending = []
+            self.pending_by_source.clear()
+            self.pending_titles.clear()
+            self.recent_urls.clear()
+
+    def stop(self):
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+        self.wake.set()
+        self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queued': self.queued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'pending': len(self.pending),
+            }
+
+    def take_ready(self, force):
+        cutoff = time.monotonic() - self.collapse_window
+        with self.lock:
+            titles, self.pending_titles = self.pending_titles, {}
+            if force:
+                ready, self.pending = self.pending, []
+            else:
+                ready = [visit for visit in self.pending if visit['at'] <= cutoff]
+                self.pending = [visit for visit in self.pending if visit['at'] > cutoff]
+
+            for source, visit in list(self.pending_by_source.items()):
+                if force or visit['at'] <= cutoff:
+                    del self.pending_by_source[source]
+            for url, (at, visit) in list(self.recent_urls.items()):
+                if at <= cutoff:
+                    del self.recent_urls[url]
+                elif visit is not None and (force or visit['at'] <= cutoff):
+                    self.recent_urls[url] = (at, None)
+        return ready, titles
+
+    def write_visits(self, conn, visits, titles=None):
+        rows = [
+            (visit['title'], visit['url'], int(visit['visited_at']),
+             visit_frecency(visit['visited_at']))
+            for visit in visits
+        ]
+        try:
+            with conn:
+                conn.executemany('''INSERT INTO urls (title, url, visit_count, last_visit, frecency)
+                                    VALUES (?, ?, 1, ?, ?)
+                                    ON CONFLICT (url) DO UPDATE SET
+                                        title = COALESCE(NULLIF(excluded.title, ''), urls.title),
+                                        visit_count = urls.visit_count + 1,
+                                        last_visit = MAX(urls.last_visit, excluded.last_visit),
+                                        frecency = frecency_add(urls.frecency, excluded.frecency)''',
+                                 rows)
+                conn.executemany("INSERT INTO visits (url_id, visited_at) SELECT id, ? FROM urls WHERE url = ?",
+                                 [(row[2], row[1]) for row in rows])
+                if titles:
+                    conn.executemany("UPDATE urls SET title = ? WHERE url = ?",
+                                     [(title, url) for url, title in titles.items()])
+        except sqlite3.Error as e:
+            print(f"Error adding to history: {e}")
+            with self.lock:
+                self.dropped += len(rows)
+            return
+        with self.lock:
+            self.flushed += len(rows)
+
+    def run(self):
+        conn = connect_database(self.db_path)
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            stopping = self.stopping
+            visits, titles = self.take_ready(force=stopping)
+            if visits or titles:
+                self.write_visits(conn, visits, titles)
+            if stopping:
+                break
+        conn.close()
+
+class ContentIndexer:
+    # Page text is hashed and written on its own thread; the GUI thread only
+    # hands over the string the page returned. A page whose text has not
+    # changed since it was last indexed costs one lookup.
+    RANK_WINDOW = 1000
+
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path):
+        indexer = cls.instances.get(db_path)
+        if indexer is None:
+            settings = QSettings("HomiBrowser", "HomiBrowser")
+            indexer = cls(
+                db_path,
+                enabled=settings.value("history/index_content", False, type=bool),
+                max_pages=settings.value("history/content_index_pages", 10000, type=int),
+                max_mb=settings.value("history/content_index_mb", 200, type=int),
+                max_chars=settings.value("history/content_index_chars", 20000, type=int),
+            )
+            cls.instances[db_path] = indexer
+        return indexer
+
+    def __init__(self, db_path, enabled=True, max_pages=10000, max_mb=200, max_chars=20000,
+                 flush_interval=2.0, max_pending=100):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.max_pages = max_pages
+        self.max_bytes = max_mb * 2**20
+        self.max_chars = max_chars
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = {}
+        self.stopping = False
+
+        self.indexed = 0
+        self.unchanged = 0
+        self.evicted = 0
+        self.dropped = 0
+        self.write_seconds = 0.0
+
+        self.thread = threading.Thread(target=self.run, name="ContentIndexer", daemon=True)
+        self.thread.start()
+
+    def record(self, url, title, text):
+        if not isinstance(text, str):
+            return
+        with self.lock:
+            if not self.enabled or self.stopping or \
+                    (url not in self.pending and len(self.pending) >= self.max_pending):
+                self.dropped += 1
+                return
+            # Only the latest text of a URL is worth indexing.
+            self.pending[url] = (title, text)
+
+    def flush(self):
+        self.wake.set()
+
+    def discard_pending(self):
+        with self.lock:
+            self.dropped += len(self.pending)
+            self.pending = {}
+
+    def stop(self):
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+        self.wake.set()
+        self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'indexed': self.indexed,
+                'unchanged': self.unchanged,
+                'evicted': self.evicted,
+                'dropped': self.dropped,
+                'pending': len(self.pending),
+                'write_seconds': self.write_seconds,
+            }
+
+    @staticmethod
+    def match_query(text):
+        # Whole words only: a prefix of a few letters expands to thousands of
+        # terms in page text, and merging their lists takes seconds.
+        words = re.findall(r'\w+', text)
+        if not words:
+            return None
+        return " ".join(f'"{word}"' for word in words)
+
+    @classmethod
+    def search(cls, conn, text, limit=50):
+        query = cls.match_query(text)
+        if query is None:
+            return []
+        # bm25() is computed for every matching row, and a common word
+        # matches most of the index; only the newest RANK_WINDOW matches are
+        # ranked so such queries cost no more than rare ones.
+        oldest = conn.execute('''SELECT rowid FROM page_text_fts WHERE page_text_fts MATCH ?
+                                 ORDER BY rowid DESC LIMIT 1 OFFSET ?''', (query, cls.RANK_WINDOW - 1)).fetchone()
+        return conn.execute('''SELECT page_text.title,
+                                      (SELECT url FROM page_text_urls WHERE text_id = page_text.id
+                                       ORDER BY indexed_at DESC LIMIT 1),
+                                      snippet(page_text_fts, 1, '[', ']', '…', 16),
+                                      page_text.indexed_at
+                               FROM page_text_fts JOIN page_text ON page_text.id = page_text_fts.rowid
+                               WHERE page_text_fts MATCH ? AND page_text_fts.rowid >= ?
+                               ORDER BY bm25(page_text_fts, 4.0, 1.0)
+                               LIMIT ?''', (query, oldest[0] if oldest else 0, limit)).fetchall()
+
+    def write(self, conn, pages):
+        started = time.perf_counter()
+        now = int(time.time())
+        indexed = unchanged = evicted = 0
+        try:
+            with conn:
+                for url, (title, text) in pages.items():
+                    body = " ".join(text[:self.max_chars].split())
+                    if not body:
+                        continue
+                    digest = hashlib.sha1(body.encode()).hexdigest()
+                    current = conn.execute('''SELECT page_text.id, page_text.content_hash
+                                              FROM page_text_urls JOIN page_text ON page_text.id = page_text_urls.text_id
+                                              WHERE url = ?''', (url,)).fetchone()
+                    if current is not None and current[1] == digest:
+                        text_id = current[0]
+                        unchanged += 1
+                    else:
+                        # Mirrors and tracking-parameter variants share one copy.
+                        row = conn.execute("SELECT id FROM page_text WHERE content_hash = ?", (digest,)).fetchone()
+                        if row is not None:
+                            text_id = row[0]
+                            unchanged += 1
+                        else:
+                            text_id = conn.execute('''INSERT INTO page_text (content_hash, title, size, indexed_at, body)
+                                                      VALUES (?, ?, ?, ?, ?)''',
+                                                   (digest, title, len(body.encode()), now, body)).lastrowid
+                            indexed += 1
+                    conn.execute("UPDATE page_text SET indexed_at = ? WHERE id = ?", (now, text_id))
+                    conn.execute('''INSERT INTO page_text_urls (url, text_id, indexed_at) VALUES (?, ?, ?)
+                                    ON CONFLICT (url) DO UPDATE SET
+                                        text_id = excluded.text_id,
+                                        indexed_at = excluded.indexed_at''', (url, text_id, now))
+                    if current is not None and current[0] != text_id:
+                        conn.execute('''DELETE FROM page_text WHERE id = ?
+                                        AND NOT EXISTS (SELECT 1 FROM page_text_urls WHERE text_id = ?)''',
+                                     (current[0], current[0]))
+                evicted = self.enforce_limits(conn)
+        except sqlite3.Error as e:
+            print(f"Error indexing page content: {e}")
+            with self.lock:
+                self.dropped += len(pages)
+            return
+        with self.lock:
+            self.indexed += indexed
+            self.unchanged += unchanged
+            self.evicted += evicted
+            self.write_seconds += time.perf_counter() - started
+
+    def enforce_limits(self, conn):
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_text").fetchone()
+        if count <= self.max_pages and size <= self.max_bytes:
+            return 0
+        # The texts seen least recently go first.
+        text_ids = [(row[0],) for row in conn.execute('''
+            SELECT id FROM (SELECT id, ROW_NUMBER() OVER newest AS position, SUM(size) OVER newest AS total
+                            FROM page_text
+                            WINDOW newest AS (ORDER BY indexed_at DESC, id DESC))
+            WHERE position > ? OR total > ?''', (self.max_pages, self.max_bytes))]
+        conn.executemany("DELETE FROM page_text_urls WHERE text_id = ?", text_ids)
+        conn.executemany("DELETE FROM page_text WHERE id = ?", text_ids)
+        return len(text_ids)
+
+    def run(self):
+        conn = connect_database(self.db_path)
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            stopping = self.stopping
+            with self.lock:
+                pages, self.pending = self.pending, {}
+            if pages:
+                self.write(conn, pages)
+            if stopping:
+                break
+        conn.close()
+
+class ContentIndexMonitor(QObject):
+    # innerText forces a layout, so the text is read once the page has had
+    # time to settle instead of on the load path itself.
+    TEXT_SCRIPT = "(document.body ? document.body.innerText : '').slice(0, %d)"
+    DELAY = 2000
+
+    def __init__(self, indexer, parent=None):
+        super().__init__(parent)
+        self.indexer = indexer
+
+    def attach(self, web_view):
+        web_view.loadFinished.connect(lambda ok, view=web_view: self.on_load_finished(view, ok))
+
+    def on_load_finished(self, web_view, ok):
+        if ok and self.indexer.enabled:
+            url = web_view.url().toString()
+            QTimer.singleShot(self.DELAY, lambda: self.extract(web_view, url))
+
+    def extract(self, web_view, url):
+        if sip.isdeleted(web_view) or not self.indexer.enabled:
+            return
+        current = web_view.url()
+        page = web_view.page()
+        if current.toString() != url or current.scheme() not in ('http', 'https') or \
+                page.profile().isOffTheRecord():
+            return
+        title = web_view.title()
+        page.runJavaScript(self.TEXT_SCRIPT % self.indexer.max_chars, QWebEngineScript.ApplicationWorld,
+                           lambda text: self.indexer.record(url, title, text))
+
+class ContentSearchDialog(QDialog):
+    HEADERS = ["Title", "Match", "URL"]
+
+    def __init__(self, indexer, parent=None):
+        super().__init__(parent)
+        self.indexer = indexer
+        self.conn = connect_database(indexer.db_path)
+        self.setWindowTitle("Search Page Content")
+        self.resize(900, 500)
+
+        layout = QVBoxLayout()
+
+        self.index_checkbox = QCheckBox("Index the text of pages I visit")
+        self.index_checkbox.setChecked(indexer.enabled)
+        self.index_checkbox.toggled.connect(self.set_indexing)
+        layout.addWidget(self.index_checkbox)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search visited pages")
+        layout.addWidget(self.search_input)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
+        self.model = QStandardItemModel(0, len(self.HEADERS), self)
+        self.model.setHorizontalHeaderLabels(self.HEADERS)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.doubleClicked.connect(lambda index: self.open_result(index.row()))
+        layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        buttons_layout = QHBoxLayout()
+
+        open_btn = QPushButton("Open")
+        open_btn.clicked.connect(self.open_selected)
+        buttons_layout.addWidget(open_btn)
+
+        clear_btn = QPushButton("Clear Index")
+        clear_btn.clicked.connect(self.clear_index)
+        buttons_layout.addWidget(clear_btn)
+
+        layout.addLayout(buttons_layout)
+
+        self.setLayout(layout)
+        self.finished.connect(self.conn.close)
+        self.show_index_size()
+
+    def set_indexing(self, checked):
+        self.indexer.enabled = checked
+        QSettings("HomiBrowser", "HomiBrowser").setValue("history/index_content", checked)
+        if not checked:
+            self.indexer.discard_pending()
+
+    def show_index_size(self):
+        pages = self.conn.execute("SELECT COUNT(*) FROM page_text_urls").fetchone()[0]
+        self.status_label.setText(f"{pages:,} pages indexed")
+
+    def search(self):
+        self.model.removeRows(0, self.model.rowCount())
+        if not self.search_input.text().strip():
+            self.show_index_size()
+            return
+        started = time.perf_counter()
+        try:
+            rows = ContentIndexer.search(self.conn, self.search_input.text())
+        except sqlite3.Error as e:
+            self.status_label.setText(f"Search failed: {e}")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        for title, url, snippet, indexed_at in rows:
+            items = [QStandardItem(title or url), QStandardItem(snippet), QStandardItem(url)]
+            items[0].setData(url, Qt.UserRole)
+            items[0].setToolTip(f"Indexed {datetime.fromtimestamp(indexed_at):%Y-%m-%d %H:%M}")
+            self.model.appendRow(items)
+        self.status_label.setText(f"{len(rows)} results in {elapsed:.1f} ms")
+
+    def open_selected(self):
+        index = self.table.currentIndex()
+        if index.isValid():
+            self.open_result(index.row())
+
+    def open_result(self, row):
+        url = self.model.item(row, 0).data(Qt.UserRole)
+        if url and self.parent():
+            self.parent().add_new_tab(url)
+        self.close()
+
+    def clear_index(self):
+        self.indexer.discard_pending()
+        try:
+            clear_history_tables(self.conn, ('page_text_urls', 'page_text'))
+        except sqlite3.Error as e:
+            self.status_label.setText(f"Could not clear the index: {e}")
+            return
+        self.model.removeRows(0, self.model.rowCount())
+        self.show_index_size()
+
+IMPORTABLE_SCHEMES = ('http', 'https', 'ftp', 'file')
+IMPORTABLE_PREFIXES = tuple(scheme + ':' for scheme in IMPORTABLE_SCHEMES)
+CHROMIUM_EPOCH_OFFSET = 11644473600
+
+
+def open_source_database(path):
+    # Other browsers hold locks on their profile databases while running;
+    # immutable=1 reads the file as it is on disk without touching them.
+    uri = f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True)
+
+
+class NetscapeBookmarkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.href = None
+        self.title = []
+        self.bookmarks = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self.href = dict(attrs).get('href')
+            self.title = []
+
+    def handle_data(self, data):
+        if self.href is not None:
+            self.title.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self.href is not None:
+            self.bookmarks.append((self.href, "".join(self.title).strip()))
+            self.href = None
+
+class BrowserDataImporter:
+    FORMATS = {
+        'firefox': "Firefox places.sqlite",
+        'chromium-history': "Chromium History",
+        'chromium-bookmarks': "Chromium Bookmarks",
+        'netscape-html': "Bookmarks HTML",
+        'jsonl': "HomiBrowser JSONL",
+    }
+    BATCH_SIZE = 100000
+    READ_CHUNK = 65536
+    CACHE_KB = 65536
+
+    def __init__(self, db_path, batch_size=BATCH_SIZE, progress=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.progress = progress
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @staticmethod
+    def detect_format(path):
+        with open(path, 'rb') as source:
+            head = source.read(4096)
+        if head.startswith(b'SQLite format 3\x00'):
+            conn = open_source_database(path)
+            try:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            finally:
+                conn.close()
+            if 'moz_places' in tables:
+                return 'firefox'
+            if {'urls', 'visits'} <= tables:
+                return 'chromium-history'
+            raise ValueError("The database is not a Firefox or Chromium history file")
+        text = head.lstrip(b'\xef\xbb\xbf').lstrip()
+        if text.startswith(b'{'):
+            try:
+                record = json.loads(text.split(b'\n', 1)[0])
+            except ValueError:
+                return 'chromium-bookmarks'
+            return 'jsonl' if 'type' in record else 'chromium-bookmarks'
+        if b'netscape-bookmark-file' in text.lower() or b'<dl' in text.lower():
+            return 'netscape-html'
+        raise ValueError("Unrecognized browser data file")
+
+    def count_records(self, path, format):
+        queries = {
+            'firefox': ["SELECT COUNT(*) FROM moz_historyvisits WHERE visit_date IS NOT NULL",
+                        "SELECT COUNT(*) FROM moz_bookmarks WHERE type = 1"],
+            'chromium-history': ["SELECT COUNT(*) FROM visits WHERE visit_time IS NOT NULL"],
+        }.get(format)
+        if queries is None:
+            return 0
+        conn = open_source_database(path)
+        try:
+            return sum(conn.execute(sql).fetchone()[0] for sql in queries)
+        finally:
+            conn.close()
+
+    def read_firefox(self, path):
+        conn = open_source_database(path)
+        try:
+            for url, title, visit_date in conn.execute('''SELECT p.url, p.title, v.visit_date
+                                                          FROM moz_historyvisits v
+                                                          JOIN moz_places p ON p.id = v.place_id
+                                                          WHERE v.visit_date IS NOT NULL
+                                                          ORDER BY v.visit_date'''):
+                yield 'visit', url, title, visit_date // 1000000
+            for url, title in conn.execute('''SELECT p.url, b.title
+                                              FROM moz_bookmarks b JOIN moz_places p ON p.id = b.fk
+                                              WHERE b.type = 1'''):
+                yield 'bookmark', url, title, None
+        finally:
+            conn.close()
+
+    def read_chromium_history(self, path):
+        conn = open_source_database(path)
+        try:
+            for url, title, visit_time in conn.execute('''SELECT u.url, u.title, v.visit_time
+                                                          FROM visits v JOIN urls u ON u.id = v.url
+                                                          WHERE v.visit_time IS NOT NULL
+                                                          ORDER BY v.visit_time'''):
+                yield 'visit', url, title, visit_time // 1000000 - CHROMIUM_EPOCH_OFFSET
+        finally:
+            conn.close()
+
+    def read_chromium_bookmarks(self, path):
+        # The Bookmarks file is a single JSON document and has to be parsed
+        # whole; it is small next to the history database.
+        with open(path, encoding='utf-8') as source:
+            data = json.load(source)
+        stack = [node for node in reversed(list(data.get('roots', {}).values())) if isinstance(node, dict)]
+        while stack:
+            node = stack.pop()
+            if node.get('type') == 'url':
+                yield 'bookmark', node.get('url', ""), node.get('name'), None
+            stack.extend(reversed(node.get('children', [])))
+
+    def read_netscape_html(self, path):
+        parser = NetscapeBookmarkParser()
+        with open(path, encoding='utf-8', errors='replace') as source:
+            while True:
+                chunk = source.read(self.READ_CHUNK)
+                if chunk:
+                    parser.feed(chunk)
+                else:
+                    parser.close()
+                for url, title in parser.bookmarks:
+                    yield 'bookmark', url, title, None
+                parser.bookmarks = []
+                if not chunk:
+                    return
+
+    def read_jsonl(self, path):
+        with open(path, encoding='utf-8') as source:
+            for line in source:
+                try:
+                    record = json.loads(line)
+                    kind = record.get('type')
+                    if kind == 'visit':
+                        yield 'visit', str(record['url']), record.get('title'), int(record['visited_at'])
+                    elif kind == 'bookmark':
+                        yield 'bookmark', str(record['url']), record.get('title'), None
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    continue
+
+    def write_batch(self, conn, visits, bookmarks):
+        # Visits are staged in a temporary table and merged with set-based
+        # statements, so a batch costs a few statements instead of one
+        # upsert per visit.
+        with conn:
+            added_visits = added_bookmarks = 0
+            if visits:
+                conn.executemany("INSERT INTO import_visits (url, title, visited_at) VALUES (?, ?, ?)",
+                                 ((url, title, visited_at) for (url, visited_at), title in visits.items()))
+                oldest = min(visited_at for _, visited_at in visits)
+                newest = max(visited_at for _, visited_at in visits)
+                # Visits that are already stored (a repeated import) are
+                # dropped; the check is skipped when no stored visit falls in
+                # the batch's time range.
+                if conn.execute("SELECT 1 FROM visits WHERE visited_at BETWEEN ? AND ? LIMIT 1",
+                                (oldest, newest)).fetchone():
+                    conn.execute('''DELETE FROM import_visits
+                                    WHERE EXISTS (SELECT 1 FROM urls u JOIN visits v ON v.url_id = u.id
+                                                  WHERE u.url = import_visits.url
+                                                    AND v.visited_at = import_visits.visited_at)''')
+                added_visits = conn.execute("SELECT COUNT(*) FROM import_visits").fetchone()[0]
+                # The bare title column takes its value from the row that
+                # MAX() picked, i.e. the latest visit in the batch. Frecency
+                # is summed relative to the newest visit so exp() cannot
+                # overflow; this is frecency_sum without a Python call per row.
+                conn.execute('''INSERT INTO urls (url, title, visit_count, last_visit, frecency)
+                                SELECT url, title, COUNT(*), MAX(visited_at),
+                                       :reference * :rate + ln(SUM(exp((visited_at - :reference) * :rate)))
+                                FROM import_visits WHERE true GROUP BY url
+                                ON CONFLICT (url) DO UPDATE SET
+                                    title = CASE WHEN excluded.title != '' AND excluded.last_visit >= urls.last_visit
+                                                 THEN excluded.title ELSE COALESCE(urls.title, excluded.title) END,
+                                    visit_count = urls.visit_count + excluded.visit_count,
+                                    last_visit = MAX(urls.last_visit, excluded.last_visit),
+                                    frecency = frecency_add(urls.frecency, excluded.frecency)''',
+                             {'reference': newest, 'rate': FRECENCY_RATE})
+                conn.execute('''INSERT INTO visits (url_id, visited_at)
+                                SELECT u.id, i.visited_at FROM import_visits i JOIN urls u ON u.url = i.url
+                                ORDER BY i.rowid''')
+                conn.execute("DELETE FROM import_visits")
+            if bookmarks:
+                changes = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO bookmarks (title, url) VALUES (?, ?)", bookmarks)
+                added_bookmarks = conn.total_changes - changes
+        return added_visits, added_bookmarks
+
+    def run(self, path, format=None):
+        started = time.perf_counter()
+        format = format or self.detect_format(path)
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported import format: {format}")
+        total = self.count_records(path, format)
+        records = getattr(self, 'read_' + format.replace('-', '_'))(path)
+        result = {'format': format, 'read': 0, 'visits': 0, 'bookmarks': 0, 'skipped': 0, 'cancelled': False}
+
+        read = 0
+        conn = connect_database(self.db_path)
+        try:
+            try:
+                conn.execute("SELECT exp(0), ln(1)")
+            except sqlite3.OperationalError:
+                # SQLite builds without the math functions.
+                conn.create_function("exp", 1, math.exp, deterministic=True)
+                conn.create_function("ln", 1, math.log, deterministic=True)
+            conn.execute(f"PRAGMA cache_size = -{self.CACHE_KB}")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_visits (url TEXT, title TEXT, visited_at INTEGER)")
+            known_bookmarks = {normalize_url(row[0]) for row in conn.execute("SELECT url FROM bookmarks")}
+            # Keyed by (url, time) so a source that repeats a visit imports it once.
+            visits = {}
+            bookmarks = []
+            for kind, url, title, visited_at in records:
+                read += 1
+                if not url.startswith(IMPORTABLE_PREFIXES):
+                    scheme, separator, _ = url.partition(':')
+                    if not separator or scheme.lower() not in IMPORTABLE_SCHEMES:
+                        continue
+                if kind == 'visit':
+                    visits[url, visited_at] = title or ""
+                else:
+                    key = normalize_url(url)
+                    if key not in known_bookmarks:
+                        known_bookmarks.add(key)
+                        bookmarks.append((title or None, url))
+
+                if len(visits) + len(bookmarks) >= self.batch_size:
+                    added_visits, added_bookmarks = self.write_batch(conn, visits, bookmarks)
+                    result['visits'] += added_visits
+                    result['bookmarks'] += added_bookmarks
+                    visits = {}
+                    bookmarks = []
+                    if self.progress is not None:
+                        self.progress(read, total)
+                    if self.cancelled.is_set():
+                        # Batches that were already merged are kept.
+                        result['cancelled'] = True
+                        break
+            else:
+                added_visits, added_bookmarks = self.write_batch(conn, visits, bookmarks)
+                result['visits'] += added_visits
+                result['bookmarks'] += added_bookmarks
+                if self.progress is not None:
+                    self.progress(read, max(total, read))
+        finally:
+            result['read'] = read
+            records.close()
+            conn.execute("DROP TABLE IF EXISTS temp.import_visits")
+            conn.close()
+
+        # Unsupported schemes, duplicates and visits that were already
+        # imported all count as skipped.
+        result['skipped'] = result['read'] - result['visits'] - result['bookmarks']
+        result['seconds'] = time.perf_counter() - started
+        return result
+
+class BrowserDataExporter:
+    FORMATS = {
+        'jsonl': "History and bookmarks (JSONL)",
+        'netscape-html': "Bookmarks HTML",
+    }
+    BATCH_SIZE = 50000
+
+    def __init__(self, db_path, batch_size=BATCH_SIZE, progress=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.progress = progress
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def records(self, conn, format):
+        yield from (('bookmark', url, title, None)
+                    for url, title in conn.execute("SELECT url, title FROM bookmarks ORDER BY id"))
+        if format == 'jsonl':
+            yield from (('visit', url, title, visited_at)
+                        for url, title, visited_at in conn.execute('''SELECT u.url, u.title, v.visited_at
+                                                                       FROM visits v JOIN urls u ON u.id = v.url_id
+                                                                       ORDER BY v.visited_at, v.id'''))
+
+    def write_jsonl(self, output, kind, url, title, visited_at):
+        record = {'type': kind, 'url': url, 'title': title}
+        if visited_at is not None:
+            record['visited_at'] = visited_at
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def write_html(self, output, kind, url, title, visited_at):
+        output.write(f'    <DT><A HREF="{html.escape(url)}">{html.escape(title or "")}</A>\n')
+
+    def run(self, path, format=None):
+        started = time.perf_counter()
+        format = format or ('netscape-html' if path.lower().endswith(('.html', '.htm')) else 'jsonl')
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
+        result = {'format': format, 'written': 0, 'cancelled': False}
+
+        conn = sqlite3.connect(self.db_path)
+        partial_path = path + '.part'
+        try:
+            total = conn.execute("SELECT COUNT(*) FROM bookmarks").fetchone()[0]
+            if format == 'jsonl':
+                total += conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0]
+            write = self.write_jsonl if format == 'jsonl' else self.write_html
+            # Rows are written as the cursor yields them; nothing holds the
+            # whole history in memory.
+            with open(partial_path, 'w', encoding='utf-8') as output:
+                if format == 'netscape-html':
+                    output.write('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n'
+                                 '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+                                 '<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n')
+                for record in self.records(conn, format):
+                    write(output, *record)
+                    result['written'] += 1
+                    if result['written'] % self.batch_size == 0:
+                        if self.progress is not None:
+                            self.progress(result['written'], total)
+                        if self.cancelled.is_set():
+                            result['cancelled'] = True
+                            break
+                if format == 'netscape-html':
+                    output.write('</DL><p>\n')
+            if result['cancelled']:
+                os.remove(partial_path)
+            else:
+                os.replace(partial_path, path)
+                if self.progress is not None:
+                    self.progress(result['written'], max(total, result['written']))
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        finally:
+            conn.close()
+
+        result['seconds'] = time.perf_counter() - started
+        return result
+
+class BrowserDataWorker(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, job, path):
+        super().__init__()
+        self.job = job
+        self.path = path
+        job.progress = self.progress.emit
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = self.job.run(self.path)
+        except Exception as e:
+            # Anything that escapes the job has to reach the window, or the
+            # progress dialog would stay open with nothing running.
+            self.failed.emit(str(e) or type(e).__name__)
+            return
+        self.finished.emit(result)
+
+class SuggestionIndex:
+    HOT_SIZE = 25000
+    HOT_TTL = 60.0
+    TAIL_CANDIDATES = 500
+
+    def __init__(self, db_path):
+        self.conn = connect_database(db_path)
+        self.hot_entries = []
+        self.hot_starts = []
+        self.hot_text = ""
+        self.hot_loaded_at = None
+        self.hot_version = None
+
+    def refresh_hot(self):
+        entries = {}
+        for url, title, frecency in self.conn.execute(
+                "SELECT url, title, frecency FROM urls ORDER BY frecency DESC LIMIT ?",
+                (self.HOT_SIZE,)):
+            entries[url] = (frecency or 0.0, title)
+        
+        unvisited = visit_frecency(time.time())
+        for url, title, frecency in self.conn.execute("""
+                SELECT b.url, b.title, u.frecency
+                FROM bookmarks b LEFT JOIN urls u ON u.url = b.url"""):
+            score = (frecency if frecency is not None else unvisited) + BOOKMARK_FRECENCY_BONUS
+            entries[url] = (score, title or entries.get(url, (0, None))[1])
+        
+        ranked = sorted(entries.items(), key=lambda entry: entry[1][0], reverse=True)
+        self.hot_entries = [(url, title or "") for url, (_, title) in ranked]
+        
+        # All hot entries live in one newline-separated string so a keystroke
+        # is a handful of str.find calls instead of a Python loop per entry.
+        haystacks = [(url + " " + title).lower().replace("\n", " ") for url, title in self.hot_entries]
+        self.hot_starts = []
+        offset = 0
+        for haystack in haystacks:
+            self.hot_starts.append(offset)
+            offset += len(haystack) + 1
+        self.hot_text = "\n".join(haystacks)
+        self.hot_loaded_at = time.monotonic()
+        self.hot_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def hot_is_stale(self):
+        if self.hot_loaded_at is None:
+            return True
+        if time.monotonic() - self.hot_loaded_at < self.HOT_TTL:
+            return False
+        return self.conn.execute("PRAGMA data_version").fetchone()[0] != self.hot_version
+
+    def search_hot(self, words, limit):
+        longest = max(words, key=len)
+        text = self.hot_text
+        starts = self.hot_starts
+        results = []
+        position = 0
+        while len(results) < limit:
+            position = text.find(longest, position)
+            if position < 0:
+                break
+            entry = bisect.bisect_right(starts, position) - 1
+            end = starts[entry + 1] - 1 if entry + 1 < len(starts) else len(text)
+            if all(word in text[starts[entry]:end] for word in words):
+                results.append(self.hot_entries[entry])
+            position = end + 1
+        return results
+
+    def search_tail(self, words, limit, seen):
+        # The full-text index matches word prefixes; only a bounded number of
+        # candidates is ranked, since anything popular was already found in
+        # the hot set.
+        query = " AND ".join('"' + word.replace('"', '""') + '"*' for word in words)
+        rows = self.conn.execute("""
+            SELECT url, title, frecency
+            FROM urls
+            WHERE id IN (SELECT rowid FROM urls_fts WHERE urls_fts MATCH ? LIMIT ?)
+        """, (query, self.TAIL_CANDIDATES)).fetchall()
+        rows.sort(key=lambda row: row[2] or 0.0, reverse=True)
+        return [(url, title or "") for url, title, _ in rows if url not in seen][:limit]
+
+    def search(self, text, limit=8):
+        words = text.lower().split()
+        if not words:
+            return []
+        
+        if self.hot_is_stale():
+            self.refresh_hot()
+        
+        results = self.search_hot(words, limit)
+        if len(results) < limit:
+            seen = {url for url, _ in results}
+            try:
+                results += self.search_tail(words, limit - len(results), seen)
+            except sqlite3.OperationalError:
+                # Half-typed input can be an invalid FTS query; the hot set
+                # still answers it.
+                pass
+        return results
+
+    def close(self):
+        self.conn.close()
+
+class SearchEngineRegistry(QObject):
+    engines_changed = pyqtSignal()
+
+    instances = {}
+
+    @classmethod
+    def shared(cls, db_path):
+        registry = cls.instances.get(db_path)
+        if registry is None:
+            registry = cls(db_path)
+            cls.instances[db_path] = registry
+        return registry
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.conn = sqlite3.connect(db_path)
+        self.engines = []
+        self.load()
+
+    def load(self):
+        self.engines = [
+            {'id': row[0], 'name': row[1], 'keyword': row[2], 'url_template': row[3],
+             'suggest_template': row[4], 'is_default': bool(row[5])}
+            for row in self.conn.execute('''SELECT id, name, keyword, url_template, suggest_template, is_default
+                                            FROM search_engines ORDER BY position, id''')
+        ]
+
+    def default(self):
+        for engine in self.engines:
+            if engine['is_default']:
+                return engine
+        return self.engines[0] if self.engines else None
+
+    def by_keyword(self, keyword):
+        keyword = keyword.lower()
+        for engine in self.engines:
+            if engine['keyword'] and engine['keyword'].lower() == keyword:
+                return engine
+        return None
+
+    def resolve(self, text):
+        # "ddg foo" searches DuckDuckGo for foo; anything else goes to the default.
+        text = text.strip()
+        keyword, _, query = text.partition(' ')
+        engine = self.by_keyword(keyword) if query.strip() else None
+        if engine is not None:
+            return engine, query.strip(), True
+        return self.default(), text, False
+
+    @staticmethod
+    def expand(template, query):
+        return template.replace('{searchTerms}', quote_plus(query))
+
+    def search_url(self, engine, query):
+        return self.expand(engine['url_template'], query)
+
+    def input_to_url(self, text):
+        text = text.strip()
+        engine, query, keyword_used = self.resolve(text)
+        if not keyword_used:
+            if '://' in text or text.startswith(('about:', 'data:', 'file:')):
+                return text
+            if ' ' not in text and ('.' in text or text.startswith('localhost')):
+                return QUrl.fromUserInput(text).toString()
+        if engine is None:
+            return QUrl.fromUserInput(text).toString()
+        return self.search_url(engine, query)
+
+    def add(self, name, keyword, url_template, suggest_template=None):
+        if '{searchTerms}' not in url_template:
+            raise ValueError("The URL template must contain {searchTerms}")
+        with self.conn:
+            self.conn.execute('''INSERT INTO search_engines (name, keyword, url_template, suggest_template, position)
+                                 VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM search_engines))''',
+                              (name, keyword or None, url_template, suggest_template or None))
+        self.load()
+        self.engines_changed.emit()
+
+    def remove(self, engine_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM search_engines WHERE id = ?", (engine_id,))
+            self.conn.execute('''UPDATE search_engines SET is_default = 1
+                                 WHERE id = (SELECT id FROM search_engines ORDER BY position, id LIMIT 1)
+                                   AND NOT EXISTS (SELECT 1 FROM search_engines WHERE is_default = 1)''')
+        self.load()
+        self.engines_changed.emit()
+
+    def set_default(self, engine_id):
+        with self.conn:
+            self.conn.execute("UPDATE search_engines SET is_default = (id = ?)", (engine_id,))
+        self.load()
+        self.engines_changed.emit()
+
+class SearchEngineManager(QDialog):
+    HEADERS = ["Name", "Keyword", "Search URL", "Default"]
+
+    def __init__(self, registry, parent=None):
+        super().__init__(parent)
+        self.registry = registry
+        self.setWindowTitle("Search Engines")
+        self.resize(800, 400)
+
+        layout = QVBoxLayout()
+
+        input_layout = QHBoxLayout()
+        self.name_input = QLineEdit()
+        self.name_input.setPlaceholderText("Name")
+        self.keyword_input = QLineEdit()
+        self.keyword_input.setPlaceholderText("Keyword (Optional)")
+        self.template_input = QLineEdit()
+        self.template_input.setPlaceholderText("https://example.com/search?q={searchTerms}")
+
+        add_btn = QPushButton("Add Engine")
+        add_btn.clicked.connect(self.add_engine)
+
+        input_layout.addWidget(self.name_input)
+        input_layout.addWidget(self.keyword_input)
+        input_layout.addWidget(self.template_input)
+        input_layout.addWidget(add_btn)
+        layout.addLayout(input_layout)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+
+        default_btn = QPushButton("Make Default")
+        default_btn.clicked.connect(self.make_default)
+        buttons_layout.addWidget(default_btn)
+
+        remove_btn = QPushButton("Remove")
+        remove_btn.clicked.connect(self.remove_engine)
+        buttons_layout.addWidget(remove_btn)
+
+        layout.addLayout(buttons_layout)
+        self.setLayout(layout)
+
+        registry.engines_changed.connect(self.populate)
+        self.finished.connect(lambda: registry.engines_changed.disconnect(self.populate))
+        self.populate()
+
+    def populate(self):
+        self.table.setRowCount(len(self.registry.engines))
+        for row, engine in enumerate(self.registry.engines):
+            values = [engine['name'], engine['keyword'] or "", engine['url_template'],
+                      "★" if engine['is_default'] else ""]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, engine['id'])
+                self.table.setItem(row, column, item)
+
+    def selected_engine_id(self):
+        item = self.table.item(self.table.currentRow(), 0)
+        return item.data(Qt.UserRole) if item is not None else None
+
+    def add_engine(self):
+        name = self.name_input.text().strip()
+        template = self.template_input.text().strip()
+        if not name or not template:
+            QMessageBox.warning(self, "Error", "Name and search URL are required")
+            return
+        try:
+            self.registry.add(name, self.keyword_input.text().strip(), template)
+        except (ValueError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        self.name_input.clear()
+        self.keyword_input.clear()
+        self.template_input.clear()
+
+    def make_default(self):
+        engine_id = self.selected_engine_id()
+        if engine_id is not None:
+            self.registry.set_default(engine_id)
+
+    def remove_engine(self):
+        engine_id = self.selected_engine_id()
+        if engine_id is not None:
+            self.registry.remove(engine_id)
+
+class SearchSuggestionFetcher(QObject):
+    suggestions_ready = pyqtSignal(str, list)
+
+    DEBOUNCE_INTERVAL = 150
+    CACHE_SIZE = 256
+    CACHE_TTL = 600
+    MAX_SUGGESTIONS = 6
+
+    def __init__(self, registry, parent=None):
+        super().__init__(parent)
+        self.registry = registry
+        self.network = QNetworkAccessManager(self)
+        self.cache = OrderedDict()
+        self.pending_text = None
+        self.reply = None
+        self.requests_sent = 0
+        self.cache_hits = 0
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(self.DEBOUNCE_INTERVAL)
+        self.debounce_timer.timeout.connect(self.fetch)
+
+    def cache_key(self, text):
+        engine, query, _ = self.registry.resolve(text)
+        if engine is None or not engine['suggest_template'] or not query:
+            return None, None, None
+        return (engine['id'], query.lower()), engine, query
+
+    def request(self, text):
+        key, engine, query = self.cache_key(text)
+        if key is None:
+            self.cancel()
+            return
+        cached = self.cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.CACHE_TTL:
+            # Served from memory: no timer, no network.
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            self.cancel()
+            self.suggestions_ready.emit(text, cached[1])
+            return
+        self.pending_text = text
+        self.debounce_timer.start()
+
+    def cancel(self):
+        self.debounce_timer.stop()
+        self.pending_text = None
+        if self.reply is not None:
+            reply, self.reply = self.reply, None
+            reply.abort()
+
+    def fetch(self):
+        text, self.pending_text = self.pending_text, None
+        if text is None:
+            return
+        key, engine, query = self.cache_key(text)
+        if key is None:
+            return
+        if self.reply is not None:
+            reply, self.reply = self.reply, None
+            reply.abort()
+        request = QNetworkRequest(QUrl(self.registry.expand(engine['suggest_template'], query)))
+        request.setAttribute(QNetworkRequest.RedirectPolicyAttribute, QNetworkRequest.NoLessSafeRedirectPolicy)
+        self.reply = self.network.get(request)
+        self.requests_sent += 1
+        self.reply.finished.connect(lambda reply=self.reply: self.on_reply(reply, text, key))
+
+    def on_reply(self, reply, text, key):
+        reply.deleteLater()
+        if reply is not self.reply:
+            return
+        self.reply = None
+        if reply.error() != QNetworkReply.NoError:
+            return
+        try:
+            # OpenSearch suggestions: [query, [suggestion, ...], ...]
+            data = json.loads(bytes(reply.readAll()).decode('utf-8', errors='replace'))
+            suggestions = [str(item) for item in data[1]][:self.MAX_SUGGESTIONS]
+        except (ValueError, IndexError, TypeError):
+            return
+        self.cache[key] = (time.monotonic(), suggestions)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        self.suggestions_ready.emit(text, suggestions)
+
+class OmniboxWorker(QObject):
+    results_ready = pyqtSignal(int, list)
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        self.index = None
+        self.latest = 0
+
+    @pyqtSlot()
+    def warm_up(self):
+        try:
+            self.ensure_index().refresh_hot()
+        except sqlite3.Error as e:
+            print(f"Error loading suggestions: {e}")
+
+    def ensure_index(self):
+        if self.index is None:
+            self.index = SuggestionIndex(self.db_path)
+        return self.index
+
+    @pyqtSlot(int, str)
+    def search(self, seq, text):
+        if seq != self.latest:
+            return
+        self.ensure_index()
+        try:
+            results = self.index.search(text)
+        except sqlite3.Error as e:
+            print(f"Error querying suggestions: {e}")
+            results = []
+        if seq == self.latest:
+            self.results_ready.emit(seq, results)
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+class OmniboxCompleter(QObject):
+    query_requested = pyqtSignal(int, str)
+    refresh_requested = pyqtSignal()
+    url_activated = pyqtSignal(str)
+
+    def __init__(self, line_edit, db_path, registry=None, is_private=None, parent=None):
+        super().__init__(parent)
+        self.line_edit = line_edit
+        self.is_private = is_private
+        self.seq = 0
+        self.history_results = []
+        self.search_results = []
+        self.registry = registry
+        self.suggestions = None
+        if registry is not None:
+            self.suggestions = SearchSuggestionFetcher(registry, self)
+            self.suggestions.suggestions_ready.connect(self.on_suggestions)
+        
+        self.model = QStandardItemModel(self)
+        self.completer = QCompleter(self.model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setCompletionRole(Qt.UserRole)
+        self.completer.setWidget(line_edit)
+        self.completer.activated[str].connect(self.url_activated)
+        
+        self.worker_thread = QThread()
+        self.worker = OmniboxWorker(db_path)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.warm_up)
+        self.worker_thread.finished.connect(self.worker.close, Qt.DirectConnection)
+        self.query_requested.connect(self.worker.search)
+        self.refresh_requested.connect(self.worker.warm_up)
+        self.worker.results_ready.connect(self.on_results)
+        self.worker_thread.start()
+        
+        line_edit.textEdited.connect(self.on_text_edited)
+
+    def on_text_edited(self, text):
+        self.seq += 1
+        self.worker.latest = self.seq
+        self.search_results = []
+        if not text.strip():
+            if self.suggestions is not None:
+                self.suggestions.cancel()
+            self.completer.popup().hide()
+            return
+        self.query_requested.emit(self.seq, text)
+        if self.suggestions is None:
+            return
+        # What is typed in a private window never goes to the search engine.
+        if self.is_private is not None and self.is_private():
+            self.suggestions.cancel()
+            return
+        self.suggestions.request(text)
+
+    def refresh_history(self):
+        # Reloads the hot set now instead of when its TTL runs out, so
+        # cleared history stops being suggested at once.
+        self.history_results = []
+        self.refresh_requested.emit()
+
+    def on_results(self, seq, results):
+        if seq != self.seq:
+            return
+        self.history_results = results
+        self.show_results()
+
+    def on_suggestions(self, text, suggestions):
+        if text != self.line_edit.text():
+            return
+        engine, _, _ = self.registry.resolve(text)
+        self.search_results = [(suggestion, self.registry.search_url(engine, suggestion))
+                               for suggestion in suggestions]
+        self.show_results()
+
+    def show_results(self):
+        self.model.clear()
+        for url, title in self.history_results:
+            item = QStandardItem(f"{title} — {url}" if title else url)
+            item.setData(url, Qt.UserRole)
+            self.model.appendRow(item)
+        for suggestion, url in self.search_results:
+            item = QStandardItem(f"🔍 {suggestion}")
+            item.setData(url, Qt.UserRole)
+            self.model.appendRow(item)
+        if self.model.rowCount():
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def shutdown(self):
+        if self.suggestions is not None:
+            self.suggestions.cancel()
+        self.seq += 1
+        self.worker.latest = self.seq
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+
+class TabLifecycleManager(QObject):
+    memory_reclaimed = pyqtSignal(int)
+
+    POLICIES = ("lru", "idle", "rss")
+    HAS_LIFECYCLE_API = hasattr(QWebEnginePage, "setLifecycleState")
+
+    def __init__(self, tabs, policy="lru", max_live_tabs=8, idle_timeout=900,
+                 rss_budget=1536 * 1024 * 1024, freeze_after=120, check_interval=15000, parent=None):
+        super().__init__(parent)
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown tab discard policy: {policy}")
+        self.tabs = tabs
+        self.policy = policy
+        self.max_live_tabs = max_live_tabs
+        self.idle_timeout = idle_timeout
+        self.rss_budget = rss_budget
+        self.freeze_after = freeze_after
+        
+        self.last_active = {}
+        self.pinned = set()
+        self.frozen = set()
+        self.discarded = {}
+        self.reclaimed_bytes = 0
+        self.discard_count = 0
+        
+        tabs.currentChanged.connect(self.on_current_changed)
+        
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(check_interval)
+
+    def touch(self, view):
+        self.last_active[view] = time.monotonic()
+
+    def forget(self, view):
+        self.last_active.pop(view, None)
+        self.pinned.discard(view)
+        self.frozen.discard(view)
+        self.discarded.pop(view, None)
+
+    def set_pinned(self, view, pinned):
+        if pinned:
+            self.pinned.add(view)
+        else:
+            self.pinned.discard(view)
+
+    def is_discarded(self, view):
+        return view in self.discarded
+
+    def is_exempt(self, view):
+        return (view in self.pinned
+                or view is self.tabs.currentWidget()
+                or view.page().recentlyAudible())
+
+    def live_views(self):
+        views = []
+        for index in range(self.tabs.count()):
+            view = self.tabs.widget(index)
+            if isinstance(view, QWebEngineView) and view not in self.discarded:
+                views.append(view)
+        return views
+
+    def renderer_pid(self, view):
+        if hasattr(view.page(), "renderProcessPid"):
+            return view.page().renderProcessPid()
+        return 0
+
+    def total_rss(self, views):
+        pids = {os.getpid()}
+        pids.update(pid for pid in (self.renderer_pid(view) for view in views) if pid > 0)
+        return sum(read_process_memory(pid) or 0 for pid in pids)
+
+    def check(self):
+        now = time.monotonic()
+        views = self.live_views()
+        candidates = sorted(
+            (view for view in views if not self.is_exempt(view)),
+            key=lambda view: self.last_active.get(view, 0))
+        
+        for view in candidates:
+            if view not in self.frozen and now - self.last_active.get(view, 0) >= self.freeze_after:
+                self.freeze(view)
+        
+        if self.policy == "lru":
+            excess = len(views) - self.max_live_tabs
+            for view in candidates[:max(excess, 0)]:
+                self.discard(view)
+        elif self.policy == "idle":
+            for view in candidates:
+                if now - self.last_active.get(view, 0) >= self.idle_timeout:
+                    self.discard(view)
+        else:
+            total = self.total_rss(views)
+            while total > self.rss_budget and candidates:
+                view = candidates.pop(0)
+                pid = self.renderer_pid(view)
+                total -= (read_process_memory(pid) or 0) if pid > 0 else 0
+                self.discard(view)
+
+    def freeze(self, view):
+        if self.HAS_LIFECYCLE_API:
+            view.page().setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+        self.frozen.add(view)
+
+    def discard(self, view):
+        page = view.page()
+        scroll = page.scrollPosition()
+        state = {
+            'url': view.url(),
+            'title': view.title(),
+            'scroll': (scroll.x(), scroll.y()),
+        }
+        
+        pid = self.renderer_pid(view)
+        rss_before = read_process_memory(pid) if pid > 0 else None
+        
+        if self.HAS_LIFECYCLE_API:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        else:
+            state['history'] = serialize_history(page.history())
+            view.setUrl(QUrl("about:blank"))
+        
+        self.frozen.discard(view)
+        self.discarded[view] = state
+        self.discard_count += 1
+        
+        index = self.tabs.indexOf(view)
+        if index >= 0:
+            self.tabs.setTabToolTip(index, f"{state['title']} (hibernated)")
+        
+        if rss_before:
+            QTimer.singleShot(2000, lambda: self.account_reclaimed(pid, rss_before))
+
+    def account_reclaimed(self, pid, rss_before):
+        reclaimed = max(rss_before - (read_process_memory(pid) or 0), 0)
+        if reclaimed:
+            self.reclaimed_bytes += reclaimed
+            self.memory_reclaimed.emit(reclaimed)
+
+    def restore(self, view):
+        state = self.discarded.pop(view)
+        page = view.page()
+        
+        def restore_scroll(ok):
+            page.loadFinished.disconnect(restore_scroll)
+            x, y = state['scroll']
+            if x or y:
+                page.runJavaScript(f"window.scrollTo({x}, {y});")
+        
+        page.loadFinished.connect(restore_scroll)
+        if self.HAS_LIFECYCLE_API:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        else:
+            restore_history(page.history(), state['history'])
+        
+        index = self.tabs.indexOf(view)
+        if index >= 0:
+            self.tabs.setTabToolTip(index, state['title'])
+
+    def on_current_changed(self, index):
+        view = self.tabs.widget(index)
+        if not isinstance(view, QWebEngineView):
+            return
+        self.touch(view)
+        if view in self.discarded:
+            self.restore(view)
+        elif view in self.frozen:
+            self.frozen.discard(view)
+            if self.HAS_LIFECYCLE_API:
+                view.page().setLifecycleState(QWebEnginePage.LifecycleState.Active)
+
+    def stats(self):
+        return {
+            'live': len(self.live_views()),
+            'frozen': len(self.frozen),
+            'discarded': len(self.discarded),
+            'discards': self.discard_count,
+            'reclaimed_bytes': self.reclaimed_bytes,
+        }
+
+class RendererMonitor(QObject):
+    sampled = pyqtSignal(list)
+    alert = pyqtSignal(dict, str)
+    renderer_terminated = pyqtSignal(dict)
+
+    INTERVAL = 2000
+    PSS_EVERY = 5
+    MAX_TERMINATIONS = 50
+    TERMINATION_STATUS = {
+        QWebEnginePage.NormalTerminationStatus: "exited",
+        QWebEnginePage.AbnormalTerminationStatus: "exited abnormally",
+        QWebEnginePage.CrashedTerminationStatus: "crashed",
+        QWebEnginePage.KilledTerminationStatus: "killed",
+    }
+
+    instance = None
+
+    @classmethod
+    def shared(cls):
+        if cls.instance is None:
+            settings = QSettings("HomiBrowser", "HomiBrowser")
+            cls.instance = cls(
+                interval=settings.value("performance/task_sample_ms", cls.INTERVAL, type=int),
+                rss_alert_mb=settings.value("performance/renderer_rss_alert_mb", 0, type=int),
+                cpu_alert_percent=settings.value("performance/renderer_cpu_alert_percent", 0, type=int),
+                log_path=settings.value("performance/renderer_log", "") or None,
+            )
+        return cls.instance
+
+    def __init__(self, interval=INTERVAL, rss_alert_mb=0, cpu_alert_percent=0, log_path=None, parent=None):
+        super().__init__(parent)
+        self.rss_alert = rss_alert_mb * 2**20
+        self.cpu_alert = cpu_alert_percent
+        self.log_path = log_path
+        self.views = {}
+        self.views_by_pid = {}
+        self.terminations = deque(maxlen=self.MAX_TERMINATIONS)
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = None
+        self.samples = []
+        self.stopping = False
+
+        # Only the sampler thread touches these.
+        self.previous_cpu = {}
+        self.previous_pss = {}
+        self.alerting = set()
+        self.sample_count = 0
+        self.sample_seconds = 0.0
+
+        self.thread = threading.Thread(target=self.run, name="RendererMonitor", daemon=True)
+        self.thread.start()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.collect)
+        self.timer.start(interval)
+
+    def attach(self, web_view):
+        self.views[web_view] = None
+        web_view.renderProcessTerminated.connect(
+            lambda status, exit_code, view=web_view: self.on_terminated(view, status, exit_code))
+
+    def detach(self, web_view):
+        self.views.pop(web_view, None)
+
+    def collect(self):
+        # Renderer PIDs have to be read on the GUI thread; the /proc reads
+        # happen on the sampler thread.
+        targets = {os.getpid(): {'kind': 'browser', 'tabs': [], 'urls': []}}
+        views_by_pid = {}
+        for view in list(self.views):
+            if sip.isdeleted(view):
+                del self.views[view]
+                continue
+            page = view.page()
+            pid = page.renderProcessPid() if hasattr(page, "renderProcessPid") else 0
+            if pid <= 0:
+                continue
+            views_by_pid.setdefault(pid, []).append(view)
+            target = targets.setdefault(pid, {'kind': 'renderer', 'tabs': [], 'urls': []})
+            if page.profile().isOffTheRecord():
+                target['tabs'].append("Private tab")
+            else:
+                target['tabs'].append(view.title() or view.url().toString())
+                target['urls'].append(view.url().toString())
+        self.views_by_pid = views_by_pid
+        with self.lock:
+            self.pending = targets
+        self.wake.set()
+
+    def latest(self):
+        with self.lock:
+            return list(self.samples)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'processes': len(self.samples),
+                'samples': self.sample_count,
+                'mean_sample_ms': self.sample_seconds * 1000 / self.sample_count if self.sample_count else 0.0,
+                'terminations': len(self.terminations),
+            }
+
+    def reload(self, pid):
+        for view in self.views_by_pid.get(pid, []):
+            if not sip.isdeleted(view):
+                view.reload()
+
+    def kill(self, pid):
+        if pid not in self.views_by_pid or pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError as e:
+            print(f"Could not end renderer {pid}: {e}")
+            return False
+        return True
+
+    def on_terminated(self, view, status, exit_code):
+        pid = next((pid for pid, views in self.views_by_pid.items() if view in views), 0)
+        private = view.page().profile().isOffTheRecord()
+        event = {
+            'at': time.time(),
+            'pid': pid,
+            'title': "Private tab" if private else view.title(),
+            'url': "" if private else view.url().toString(),
+            'status': self.TERMINATION_STATUS.get(status, str(int(status))),
+            'exit_code': exit_code,
+        }
+        self.terminations.append(event)
+        self.renderer_terminated.emit(event)
+
+    def sample(self, targets):
+        now = time.monotonic()
+        read_pss = self.sample_count % self.PSS_EVERY == 0
+        samples = []
+        cpu = {}
+        pss = {}
+        for pid, target in targets.items():
+            stats = read_process_stats(pid, pss=read_pss)
+            if stats is None:
+                continue
+            cpu[pid] = (stats['cpu_seconds'], now)
+            previous = self.previous_cpu.get(pid)
+            cpu_percent = 0.0
+            if previous is not None and now > previous[1]:
+                cpu_percent = 100 * (stats['cpu_seconds'] - previous[0]) / (now - previous[1])
+            pss[pid] = stats['pss'] if read_pss else self.previous_pss.get(pid)
+            samples.append(dict(target, pid=pid, rss=stats['rss'], pss=pss[pid],
+                                cpu_seconds=stats['cpu_seconds'], cpu_percent=cpu_percent,
+                                sampled_at=time.time()))
+        self.previous_cpu = cpu
+        self.previous_pss = pss
+        return samples
+
+    def check_alerts(self, samples):
+        alerting = set()
+        for sample in samples:
+            reasons = []
+            if self.rss_alert and sample['rss'] > self.rss_alert:
+                reasons.append(f"memory {format_bytes(sample['rss'])}")
+            if self.cpu_alert and sample['cpu_percent'] > self.cpu_alert:
+                reasons.append(f"CPU {sample['cpu_percent']:.0f}%")
+            if not reasons:
+                continue
+            alerting.add(sample['pid'])
+            # Only the crossing is reported, not every sample above it.
+            if sample['pid'] not in self.alerting:
+                self.alert.emit(sample, ", ".join(reasons))
+        self.alerting = alerting
+
+    def write_log(self, samples):
+        try:
+            with open(self.log_path, 'a') as log:
+                for sample in samples:
+                    log.write(json.dumps(sample) + "\n")
+        except OSError as e:
+            print(f"Could not write renderer log: {e}")
+            self.log_path = None
+
+    def stop(self):
+        self.timer.stop()
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+        self.wake.set()
+        self.thread.join()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                stopping = self.stopping
+                targets, self.pending = self.pending, None
+            if stopping:
+                break
+            if targets is None:
+                continue
+            started = time.perf_counter()
+            samples = self.sample(targets)
+            self.sample_seconds += time.perf_counter() - started
+            self.sample_count += 1
+            with self.lock:
+                self.samples = samples
+            self.check_alerts(samples)
+            if self.log_path:
+                self.write_log(samples)
+            self.sampled.emit(samples)
+
+class TaskManagerDialog(QDialog):
+    HEADERS = ["Process", "PID", "Tabs", "Memory", "PSS", "CPU %", "CPU Time"]
+
+    def __init__(self, monitor, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.setWindowTitle("Task Manager")
+        self.resize(900, 500)
+
+        layout = QVBoxLayout()
+
+        self.model = QStandardItemModel(0, len(self.HEADERS), self)
+        self.model.setHorizontalHeaderLabels(self.HEADERS)
+        self.model.setSortRole(Qt.UserRole)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(3, Qt.DescendingOrder)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+
+        reload_btn = QPushButton("Reload")
+        reload_btn.clicked.connect(self.reload_selected)
+        buttons_layout.addWidget(reload_btn)
+
+        kill_btn = QPushButton("End Process")
+        kill_btn.clicked.connect(self.kill_selected)
+        buttons_layout.addWidget(kill_btn)
+
+        layout.addLayout(buttons_layout)
+
+        layout.addWidget(QLabel("Renderer exits"))
+        self.terminations = QStandardItemModel(0, 4, self)
+        self.terminations.setHorizontalHeaderLabels(["Time", "Tab", "Status", "Exit Code"])
+        terminations_table = QTableView()
+        terminations_table.setModel(self.terminations)
+        terminations_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        terminations_table.verticalHeader().setVisible(False)
+        terminations_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        terminations_table.setMaximumHeight(150)
+        layout.addWidget(terminations_table)
+
+        self.setLayout(layout)
+
+        for event in monitor.terminations:
+            self.add_termination(event)
+        monitor.sampled.connect(self.populate)
+        monitor.renderer_terminated.connect(self.add_termination)
+        self.finished.connect(self.detach)
+        self.populate(monitor.latest())
+        monitor.collect()
+
+    def detach(self):
+        self.monitor.sampled.disconnect(self.populate)
+        self.monitor.renderer_terminated.disconnect(self.add_termination)
+
+    def selected_pid(self):
+        index = self.table.currentIndex()
+        if not index.isValid():
+            return None
+        return self.model.item(index.row(), 1).data(Qt.UserRole)
+
+    def populate(self, samples):
+        selected = self.selected_pid()
+        header = self.table.horizontalHeader()
+        self.table.setSortingEnabled(False)
+        self.model.removeRows(0, self.model.rowCount())
+        for sample in samples:
+            cells = [
+                ("Browser" if sample['kind'] == 'browser' else "Renderer", sample['kind']),
+                (str(sample['pid']), sample['pid']),
+                (", ".join(sample['tabs']), ", ".join(sample['tabs']).lower()),
+                (format_bytes(sample['rss']), sample['rss']),
+                (format_bytes(sample['pss']) if sample['pss'] is not None else "", sample['pss'] or 0),
+                (f"{sample['cpu_percent']:.1f}", sample['cpu_percent']),
+                (f"{sample['cpu_seconds']:.1f} s", sample['cpu_seconds']),
+            ]
+            row = []
+            for text, value in cells:
+                item = QStandardItem(text)
+                item.setData(value, Qt.UserRole)
+                row.append(item)
+            row[2].setToolTip("\n".join(sample['urls']))
+            self.model.appendRow(row)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        for row in range(self.model.rowCount()):
+            if self.model.item(row, 1).data(Qt.UserRole) == selected:
+                self.table.selectRow(row)
+                break
+
+    def add_termination(self, event):
+        values = [time.strftime('%H:%M:%S', time.localtime(event['at'])), event['title'] or event['url'],
+                  event['status'], str(event['exit_code'])]
+        self.terminations.insertRow(0, [QStandardItem(value) for value in values])
+
+    def reload_selected(self):
+        pid = self.selected_pid()
+        if pid is not None:
+            self.monitor.reload(pid)
+
+    def kill_selected(self):
+        pid = self.selected_pid()
+        if pid is None or not self.monitor.kill(pid):
+            QMessageBox.information(self, "Task Manager", "Select a renderer process to end")
+
+class SingleInstance(QObject):
+    urls_received = pyqtSignal(list)
+
+    CONNECT_TIMEOUT = 500
+    REPLY_TIMEOUT = 2000
+
+    def __init__(self, db_path=DB_PATH, parent=None):
+        super().__init__(parent)
+        # One running browser per profile database and user.
+        digest = hashlib.sha1(os.path.abspath(db_path).encode()).hexdigest()[:12]
+        self.name = f"homiBrowser-{os.getuid() if hasattr(os, 'getuid') else 0}-{digest}"
+        self.server = None
+        self.buffers = {}
+        self.held = None
+
+    def hold(self):
+        # URLs forwarded before there is a window to open them in wait
+        # here until release().
+        self.held = []
+
+    def release(self):
+        held, self.held = self.held, None
+        if held:
+            self.urls_received.emit(held)
+
+    def forward(self, urls):
+        socket = QLocalSocket()
+        socket.connectToServer(self.name)
+        if not socket.waitForConnected(self.CONNECT_TIMEOUT):
+            return False
+        socket.write(json.dumps({'urls': urls}).encode() + b"\n")
+        socket.flush()
+        acknowledged = socket.waitForReadyRead(self.REPLY_TIMEOUT) and socket.readLine().trimmed() == b"ok"
+        socket.disconnectFromServer()
+        return acknowledged
+
+    def listen(self):
+        # With socket options set, QLocalServer renames its socket over an
+        # existing one instead of failing, so a running instance is probed
+        # for first.
+        probe = QLocalSocket()
+        probe.connectToServer(self.name)
+        if probe.waitForConnected(self.CONNECT_TIMEOUT):
+            probe.disconnectFromServer()
+            return False
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+        if self.server.listen(self.name):
+            return True
+        if self.server.serverError() != QAbstractSocket.AddressInUseError:
+            print(f"Single-instance server unavailable: {self.server.errorString()}")
+            return False
+        # Nothing answered on the socket file, so the previous instance
+        # crashed and left it behind.
+        QLocalServer.removeServer(self.name)
+        return self.server.listen(self.name)
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            self.buffers[connection] = b""
+            connection.readyRead.connect(lambda connection=connection: self.on_ready_read(connection))
+            connection.disconnected.connect(lambda connection=connection: self.on_disconnected(connection))
+
+    def on_ready_read(self, connection):
+        self.buffers[connection] += bytes(connection.readAll())
+        if b"\n" not in self.buffers[connection]:
+            return
+        line = self.buffers[connection].split(b"\n", 1)[0]
+        self.buffers[connection] = b""
+        try:
+            urls = [str(url) for url in json.loads(line).get('urls', [])]
+        except (ValueError, AttributeError):
+            connection.write(b"error\n")
+            return
+        connection.write(b"ok\n")
+        connection.flush()
+        if self.held is not None:
+            self.held.extend(urls)
+            return
+        self.urls_received.emit(urls)
+
+    def on_disconnected(self, connection):
+        self.buffers.pop(connection, None)
+        connection.deleteLater()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+def launch_urls(args):
+    # Paths are resolved here so that a forwarded launch opens files
+    # relative to the caller's working directory.
+    urls = []
+    for arg in args:
+        if arg.startswith('-'):
+            continue
+        if os.path.exists(arg):
+            urls.append(QUrl.fromLocalFile(os.path.abspath(arg)).toString())
+        else:
+            urls.append(QUrl.fromUserInput(arg).toString())
+    return urls
+
+class StartupProfiler:
+    def __init__(self, report_path=STARTUP_PROFILE_PATH):
+        self.report_path = report_path
+        self.marks = {'imports': (IMPORTS_FINISHED - STARTUP_STARTED) * 1000}
+        self.reported = False
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = (time.perf_counter() - STARTUP_STARTED) * 1000
+
+    def previous_run(self):
+        try:
+            with open(self.report_path) as report:
+                lines = [line for line in report if line.strip()]
+        except OSError:
+            return None
+        try:
+            return json.loads(lines[-1])['marks'] if lines else None
+        except (ValueError, KeyError):
+            return None
+
+    def write_report(self):
+        if self.reported:
+            return
+        self.reported = True
+        previous = self.previous_run()
+        record = {
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'marks': {name: round(ms, 2) for name, ms in self.marks.items()},
+        }
+        try:
+            with open(self.report_path, 'a') as report:
+                report.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Error writing startup profile: {e}")
+        
+        print("Startup profile (ms since interpreter reached homiBrowser):")
+        for name, ms in self.marks.items():
+            line = f"  {name:<20} {ms:9.1f}"
+            if previous and name in previous:
+                line += f"  ({ms - previous[name]:+.1f} vs previous run)"
+            print(line)
+
+class LoadTimingRecorder:
+    COLUMNS = ('url', 'domain', 'started_at', 'ok', 'wall_ms', 'first_progress_ms', 'ttfb_ms',
+               'dom_content_loaded_ms', 'load_event_ms', 'transfer_bytes', 'resource_count',
+               'resource_bytes')
+
+    def __init__(self, db_path, max_records=10000, flush_interval=2.0, max_pending=1000):
+        self.db_path = db_path
+        self.max_records = max_records
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = []
+        self.stopping = False
+        self.dropped = 0
+
+        self.thread = threading.Thread(target=self.run, name="LoadTimingRecorder", daemon=True)
+        self.thread.start()
+
+    def record(self, entry):
+        with self.lock:
+            if self.stopping or len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self.pending.append(tuple(entry.get(column) for column in self.COLUMNS))
+
+    def flush(self):
+        self.wake.set()
+
+    def stop(self):
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+        self.wake.set()
+        self.thread.join()
+
+    def write(self, conn, rows):
+        try:
+            with conn:
+                conn.executemany(f'''INSERT INTO page_loads ({", ".join(self.COLUMNS)})
+                                     VALUES ({", ".join("?" for _ in self.COLUMNS)})''', rows)
+                # Only the newest max_records loads are kept.
+                conn.execute('''DELETE FROM page_loads
+                                WHERE id <= (SELECT MAX(id) FROM page_loads) - ?''',
+                             (self.max_records,))
+        except sqlite3.Error as e:
+            print(f"Error saving load timings: {e}")
+
+    def run(self):
+        conn = connect_database(self.db_path)
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            stopping = self.stopping
+            with self.lock:
+                rows, self.pending = self.pending, []
+            if rows:
+                self.write(conn, rows)
+            if stopping:
+                break
+        conn.close()
+
+class LoadTimingMonitor(QObject):
+    TIMING_SCRIPT = """
+        (function () {
+            var nav = performance.getEntriesByType('navigation')[0];
+            if (!nav) {
+                return null;
+            }
+            var resources = performance.getEntriesByType('resource');
+            var resourceBytes = 0;
+            for (var i = 0; i < resources.length; i++) {
+                resourceBytes += resources[i].transferSize || 0;
+            }
+            return {
+                ttfb: nav.responseStart,
+                domContentLoaded: nav.domContentLoadedEventEnd,
+                loadEvent: nav.loadEventEnd || nav.loadEventStart,
+                transferSize: nav.transferSize,
+                resourceCount: resources.length,
+                resourceBytes: resourceBytes
+            };
+        })()
+    """
+
+    def __init__(self, recorder, parent=None):
+        super().__init__(parent)
+        self.recorder = recorder
+        self.loads = {}
+
+    def attach(self, web_view):
+        web_view.loadStarted.connect(lambda view=web_view: self.on_load_started(view))
+        web_view.loadProgress.connect(lambda progress, view=web_view: self.on_load_progress(view, progress))
+        web_view.loadFinished.connect(lambda ok, view=web_view: self.on_load_finished(view, ok))
+
+    def detach(self, web_view):
+        self.loads.pop(web_view, None)
+
+    def on_load_started(self, web_view):
+        self.loads[web_view] = {
+            'started': time.perf_counter(),
+            'started_at': int(time.time()),
+            'first_progress_ms': None,
+        }
+
+    def on_load_progress(self, web_view, progress):
+        load = self.loads.get(web_view)
+        if load is not None and load['first_progress_ms'] is None and progress > 0:
+            load['first_progress_ms'] = (time.perf_counter() - load['started']) * 1000
+
+    def on_load_finished(self, web_view, ok):
+        load = self.loads.pop(web_view, None)
+        if load is None:
+            return
+        url = web_view.url()
+        if url.scheme() not in ('http', 'https') or web_view.page().profile().isOffTheRecord():
+            return
+        entry = {
+            'url': url.toString(),
+            'domain': url.host().lower(),
+            'started_at': load['started_at'],
+            'ok': int(ok),
+            'wall_ms': (time.perf_counter() - load['started']) * 1000,
+            'first_progress_ms': load['first_progress_ms'],
+        }
+        if not ok:
+            self.recorder.record(entry)
+            return
+        web_view.page().runJavaScript(self.TIMING_SCRIPT, QWebEngineScript.ApplicationWorld,
+                                      lambda timing, entry=entry: self.on_timing(entry, timing))
+
+    def on_timing(self, entry, timing):
+        if isinstance(timing, dict):
+            entry.update(
+                ttfb_ms=timing.get('ttfb'),
+                dom_content_loaded_ms=timing.get('domContentLoaded'),
+                load_event_ms=timing.get('loadEvent'),
+                transfer_bytes=timing.get('transferSize'),
+                resource_count=timing.get('resourceCount'),
+                resource_bytes=timing.get('resourceBytes'),
+            )
+        self.recorder.record(entry)
+
+class LoadTimingDialog(QDialog):
+    HEADERS = ["Domain", "Loads", "Failed", "p50 load (ms)", "p95 load (ms)",
+               "p50 TTFB (ms)", "p95 TTFB (ms)"]
+
+    def __init__(self, db_path, recorder=None, parent=None):
+        super().__init__(parent)
+        self.conn = sqlite3.connect(db_path)
+        self.recorder = recorder
+        self.setWindowTitle("Page Load Times")
+        self.resize(800, 500)
+
+        layout = QVBoxLayout()
+
+        self.model = QStandardItemModel(0, len(self.HEADERS), self)
+        self.model.setHorizontalHeaderLabels(self.HEADERS)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        buttons_layout.addWidget(refresh_btn)
+
+        export_btn = QPushButton("Export")
+        export_btn.clicked.connect(self.export)
+        buttons_layout.addWidget(export_btn)
+
+        clear_btn = QPushButton("Clear")
+        clear_btn.clicked.connect(self.clear)
+        buttons_layout.addWidget(clear_btn)
+
+        layout.addLayout(buttons_layout)
+
+        self.setLayout(layout)
+        self.finished.connect(self.conn.close)
+
+        self.refresh()
+
+    def domain_stats(self):
+        stats = {}
+        for domain, ok, wall_ms, ttfb_ms in self.conn.execute(
+                "SELECT domain, ok, wall_ms, ttfb_ms FROM page_loads"):
+            entry = stats.setdefault(domain, {'loads': 0, 'failed': 0, 'wall': [], 'ttfb': []})
+            entry['loads'] += 1
+            if not ok:
+                entry['failed'] += 1
+                continue
+            entry['wall'].append(wall_ms)
+            if ttfb_ms is not None:
+                entry['ttfb'].append(ttfb_ms)
+        return stats
+
+    def refresh(self):
+        if self.recorder is not None:
+            self.recorder.flush()
+        self.table.setSortingEnabled(False)
+        self.model.removeRows(0, self.model.rowCount())
+        for domain, entry in self.domain_stats().items():
+            values = [domain, entry['loads'], entry['failed']]
+            for samples in (entry['wall'], entry['ttfb']):
+                values += [round(percentile(samples, 0.5)), round(percentile(samples, 0.95))] if samples else ["", ""]
+            row = []
+            for value in values:
+                item = QStandardItem()
+                item.setData(value, Qt.DisplayRole)
+                row.append(item)
+            self.model.appendRow(row)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(4, Qt.DescendingOrder)
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Load Times", "page_loads.csv",
+                                              "CSV files (*.csv);;JSON files (*.json)")
+        if not path:
+            return
+        columns = LoadTimingRecorder.COLUMNS
+        rows = self.conn.execute(f"SELECT {', '.join(columns)} FROM page_loads ORDER BY id")
+        try:
+            with open(path, 'w', newline='') as output:
+                if path.endswith('.json'):
+                    json.dump([dict(zip(columns, row)) for row in rows], output, indent=2)
+                else:
+                    writer = csv.writer(output)
+                    writer.writerow(columns)
+                    writer.writerows(rows)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Error", str(e))
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM page_loads")
+        self.refresh()
+
+def fuzzy_score(query_terms, text):
+    # Every term has to appear as a subsequence; contiguous runs, word starts
+    # and plain substring hits score higher.
+    total = 0
+    for term in query_terms:
+        found = text.find(term)
+        if found >= 0:
+            total += 10 * len(term) - found * 0.01
+            continue
+        position = -1
+        previous = -2
+        score = 0
+        for char in term:
+            position = text.find(char, position + 1)
+            if position < 0:
+                return None
+            if position == previous + 1:
+                score += 5
+            elif position == 0 or not text[position - 1].isalnum():
+                score += 3
+            else:
+                score -= 1
+            previous = position
+        total += score
+    return total
+
+
+class TabIndex:
+    THUMBNAIL_SIZE = (160, 100)
+    THUMBNAIL_LIMIT = 100
+
+    def __init__(self):
+        self.entries = {}
+        self.mru = OrderedDict()
+        self.thumbnails = OrderedDict()
+
+    def update(self, widget, url=None, title=None):
+        entry = self.entries.get(widget)
+        if entry is None:
+            entry = self.entries[widget] = {'url': "", 'title': "", 'text': ""}
+            self.mru[widget] = None
+            self.mru.move_to_end(widget, last=False)
+        if url is not None:
+            entry['url'] = url
+        if title is not None:
+            entry['title'] = title
+        entry['text'] = f"{entry['title']} {entry['url']}".lower()
+
+    def replace(self, old, new):
+        entry = self.entries.pop(old, None)
+        if entry is None:
+            return
+        self.entries[new] = entry
+        self.mru = OrderedDict((new if widget is old else widget, None) for widget in self.mru)
+        thumbnail = self.thumbnails.pop(old, None)
+        if thumbnail is not None:
+            self.thumbnails[new] = thumbnail
+
+    def remove(self, widget):
+        self.entries.pop(widget, None)
+        self.mru.pop(widget, None)
+        self.thumbnails.pop(widget, None)
+
+    def touch(self, widget):
+        if widget in self.mru:
+            self.mru.move_to_end(widget)
+
+    def recent(self):
+        return list(reversed(self.mru))
+
+    def search(self, query, limit=100):
+        terms = query.lower().split()
+        if not terms:
+            return self.recent()[:limit]
+        rank = {widget: position for position, widget in enumerate(reversed(self.mru))}
+        scored = []
+        for widget, entry in self.entries.items():
+            score = fuzzy_score(terms, entry['text'])
+            if score is not None:
+                scored.append((-score, rank.get(widget, 0), widget))
+        scored.sort(key=lambda item: item[:2])
+        return [widget for _, _, widget in scored[:limit]]
+
+    def set_thumbnail(self, widget, pixmap):
+        if widget not in self.entries or pixmap.isNull():
+            return
+        width, height = self.THUMBNAIL_SIZE
+        self.thumbnails[widget] = pixmap.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.thumbnails.move_to_end(widget)
+        while len(self.thumbnails) > self.THUMBNAIL_LIMIT:
+            self.thumbnails.popitem(last=False)
+
+    def thumbnail(self, widget):
+        return self.thumbnails.get(widget)
 
-            self.url_input.clear()
-            self.title_input.clear()
+class TabSwitcherModel(QAbstractListModel):
+    def __init__(self, tab_index, parent=None):
+        super().__init__(parent)
+        self.tab_index = tab_index
+        self.widgets = []
+        self.icons = {}
 
-            self.load_bookmarks()
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.widgets)
 
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", str(e))
-    
-    
-    def delete_bookmark(self, url):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM bookmarks WHERE url = ?", (url,))
-        self.conn.commit()
-        self.load_bookmarks()
-    
-    def open_bookmark(self, url):
-        if self.parent():
-            self.parent().add_new_tab(url)
-        self.close()
+    def data(self, model_index, role=Qt.DisplayRole):
+        if not model_index.isValid():
+            return None
+        widget = self.widgets[model_index.row()]
+        entry = self.tab_index.entries.get(widget)
+        if entry is None:
+            return None
+        if role == Qt.DisplayRole:
+            return f"{entry['title'] or 'Untitled'}\n{entry['url']}"
+        if role == Qt.ToolTipRole:
+            return entry['url']
+        if role == Qt.DecorationRole:
+            # Only thumbnails that already exist are shown; nothing here
+            # makes a background tab render.
+            thumbnail = self.tab_index.thumbnail(widget)
+            if thumbnail is None:
+                return None
+            icon = self.icons.get(widget)
+            if icon is None:
+                icon = self.icons[widget] = QIcon(thumbnail)
+            return icon
+        return None
 
-class HistoryViewer(QDialog):
-    def __init__(self, connection, parent=None):
+    def widget_at(self, row):
+        return self.widgets[row] if 0 <= row < len(self.widgets) else None
+
+    def set_query(self, query):
+        self.beginResetModel()
+        self.widgets = self.tab_index.search(query)
+        self.endResetModel()
+
+class TabSwitcher(QDialog):
+    tab_chosen = pyqtSignal(object)
+
+    def __init__(self, index, parent=None):
         super().__init__(parent)
-        self.conn = connection
-        self.setWindowTitle("Browsing History")
-        self.resize(800, 500)
-        
+        self.setWindowTitle("Switch to Tab")
+        self.resize(600, 500)
+
         layout = QVBoxLayout()
-        
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Title", "URL", "Visited At", "Actions"])
-        self.table.horizontalHeader().setStretchLastSection(True)
-        layout.addWidget(self.table)
-        
-        clear_btn = QPushButton("Clear History")
-        clear_btn.clicked.connect(self.clear_history)
-        layout.addWidget(clear_btn)
-        
-        self.load_history()
-        
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search open tabs")
+        self.search_input.textChanged.connect(self.on_text_changed)
+        self.search_input.returnPressed.connect(self.choose_current)
+        self.search_input.installEventFilter(self)
+        layout.addWidget(self.search_input)
+
+        self.model = TabSwitcherModel(index, self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setIconSize(QSize(*TabIndex.THUMBNAIL_SIZE))
+        self.list_view.activated.connect(lambda model_index: self.choose(model_index.row()))
+        layout.addWidget(self.list_view)
+
         self.setLayout(layout)
-    
-    def load_history(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT title, url, visited_at 
-            FROM history 
-            ORDER BY visited_at DESC
-        """)
-        history = cursor.fetchall()
-        
-        self.table.setRowCount(len(history))
-        for row, (title, url, visited_at) in enumerate(history):
-            title_item = QTableWidgetItem(title or "Untitled")
-            self.table.setItem(row, 0, title_item)
-            
-            url_item = QTableWidgetItem(url)
-            self.table.setItem(row, 1, url_item)
-            
-            visited_item = QTableWidgetItem(str(visited_at))
-            self.table.setItem(row, 2, visited_item)
-            
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            
-            open_btn = QPushButton("Open")
-            open_btn.clicked.connect(lambda _, u=url: self.open_history_item(u))
-            
-            actions_layout.addWidget(open_btn)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            
-            self.table.setCellWidget(row, 3, actions_widget)
-    
-    def open_history_item(self, url):
-        if self.parent():
-            self.parent().add_new_tab(url)
-        self.close()
-    
-    def clear_history(self):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM history")
-        self.conn.commit()
-        self.load_history()
+        self.on_text_changed("")
 
-class CustomWebPage(QWebEnginePage):
-    def createWindow(self, _type):
-        return self.view().browser.create_new_tab()
+    def on_text_changed(self, text):
+        self.model.set_query(text)
+        if self.model.rowCount():
+            self.list_view.setCurrentIndex(self.model.index(0))
 
-class DownloadItem(QWidget):
-    def __init__(self, download):
-        super().__init__()
-        layout = QVBoxLayout(self)
-        
-        self.download = download
-        
-        filename_label = QLabel(download.suggestedFileName())
-        layout.addWidget(filename_label)
-        
-        self.progress_bar = QProgressBar()
-        layout.addWidget(self.progress_bar)
-        
-        download.downloadProgress.connect(self.update_progress)
-        download.finished.connect(self.download_finished)
-        
-    def update_progress(self, received, total):
-        if total > 0:
-            self.progress_bar.setValue(int((received / total) * 100))
-    
-    def download_finished(self):
-        self.progress_bar.setValue(100)
+    def eventFilter(self, source, event):
+        # Up/Down move through the results without leaving the search box.
+        if source is self.search_input and event.type() == QEvent.KeyPress and \
+                event.key() in (Qt.Key_Up, Qt.Key_Down):
+            row = self.list_view.currentIndex().row() + (1 if event.key() == Qt.Key_Down else -1)
+            if 0 <= row < self.model.rowCount():
+                self.list_view.setCurrentIndex(self.model.index(row))
+            return True
+        return super().eventFilter(source, event)
+
+    def choose_current(self):
+        self.choose(self.list_view.currentIndex().row())
+
+    def choose(self, row):
+        widget = self.model.widget_at(row)
+        if widget is not None:
+            self.tab_chosen.emit(widget)
+        self.accept()
+
+class TabEventDispatcher(QObject):
+    url_changed = pyqtSignal(object, QUrl)
+    title_changed = pyqtSignal(object, str)
+
+    FRAME_INTERVAL = 16
 
-class DownloadManager(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Download Manager")
-        self.resize(500, 300)
+        self.pending = {}
+        self.received = 0
+        self.delivered = 0
         
-        layout = QVBoxLayout(self)
-        self.downloads_layout = QVBoxLayout()
-        layout.addLayout(self.downloads_layout)
-    
-    def add_download(self, download):
-        download_item = DownloadItem(download)
-        self.downloads_layout.addWidget(download_item)
-        self.show()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.FRAME_INTERVAL)
+        self.timer.timeout.connect(self.flush)
+
+    def attach(self, web_view):
+        web_view.urlChanged.connect(lambda url, view=web_view: self.queue(view, 'url', url))
+        web_view.titleChanged.connect(lambda title, view=web_view: self.queue(view, 'title', title))
+
+    def detach(self, web_view):
+        self.pending.pop(web_view, None)
+
+    def queue(self, web_view, kind, value):
+        # Every tab's events are tagged with the tab that sent them and only
+        # the latest value per tab survives until the next frame.
+        self.received += 1
+        self.pending.setdefault(web_view, {})[kind] = value
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        for web_view, changes in pending.items():
+            if 'url' in changes:
+                self.delivered += 1
+                self.url_changed.emit(web_view, changes['url'])
+            if 'title' in changes:
+                self.delivered += 1
+                self.title_changed.emit(web_view, changes['title'])
+
+def session_owner_running(window):
+    # Session keys are "<pid>-<n>", so a browser started with --new-instance
+    # keeps its windows while another process restores the rest. Rows saved
+    # before the keys carried a pid are plain numbers and always restorable.
+    pid, sep, _ = str(window).partition('-')
+    if not sep or not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
 
 class WebBrowser(QMainWindow):
-    def __init__(self):
+    windows = []
+    next_session_id = 0
+
+    def __init__(self, db_path=DB_PATH, restore_session=False, session_tabs=None, profiler=None):
         super().__init__()
         self.setWindowTitle("HomiBrowser")
         self.resize(1200, 800)
         
+        self.profiler = profiler
+        self.first_paint_done = False
+        
+        self.db_path = db_path
         self.init_database()
+        self.mark_startup('database_open')
+        self.history_recorder = HistoryRecorder(self.db_path)
+        self.profiles = ProfileManager.shared()
+        self.search_engines = SearchEngineRegistry.shared(self.db_path)
+        self.bookmark_store = BookmarkStore.shared(self.db_path)
+        self.bookmark_store.bookmark_added.connect(self.update_bookmark_button)
+        self.bookmark_store.bookmark_removed.connect(self.update_bookmark_button)
+        self.bookmark_store.bookmarks_reloaded.connect(self.update_bookmark_button)
+        self.favicons = FaviconStore.shared(self.db_path)
+        self.snapshots = SnapshotStore.shared(self.db_path)
+        self.profiles.install_scheme_handler(SNAPSHOT_SCHEME, self.snapshots.scheme_handler)
+        self.profiles.add_download_claim(self.snapshots.claim)
+        self.snapshots.snapshot_saved.connect(self.on_snapshot_saved)
+        self.snapshots.snapshot_failed.connect(self.on_snapshot_failed)
         
         main_layout = QVBoxLayout()
         
@@ -303,16 +5390,20 @@ class WebBrowser(QMainWindow):
         new_tab_btn.clicked.connect(self.add_new_tab)
         nav_toolbar.addWidget(new_tab_btn)
         
-        self.search_engine_combo = QComboBox()
-        search_engines = ["Google", "Bing", "DuckDuckGo"]
-        self.search_engine_combo.addItems(search_engines)
-        nav_toolbar.addWidget(QLabel("Search:"))
-        nav_toolbar.addWidget(self.search_engine_combo)
+        self.search_engine_btn = QPushButton()
+        self.search_engine_btn.clicked.connect(self.view_search_engines)
+        nav_toolbar.addWidget(self.search_engine_btn)
         
         self.url_bar = QLineEdit()
         self.url_bar.returnPressed.connect(self.navigate_to_url)
         nav_toolbar.addWidget(self.url_bar)
         
+        self.search_engines.engines_changed.connect(self.update_search_engine_button)
+        self.update_search_engine_button()
+        
+        self.suggestion_pending = False
+        self.omnibox = None
+        
         self.bookmark_btn = QPushButton("☆")
         self.bookmark_btn.clicked.connect(self.toggle_bookmark)
         nav_toolbar.addWidget(self.bookmark_btn)
@@ -333,6 +5424,36 @@ class WebBrowser(QMainWindow):
         download_btn.clicked.connect(self.show_download_manager)
         nav_toolbar.addWidget(download_btn)
         
+        load_times_btn = QPushButton("Load Times")
+        load_times_btn.clicked.connect(self.view_load_times)
+        nav_toolbar.addWidget(load_times_btn)
+        
+        task_manager_btn = QPushButton("Task Manager")
+        task_manager_btn.clicked.connect(self.view_task_manager)
+        nav_toolbar.addWidget(task_manager_btn)
+        
+        data_menu = QMenu(self)
+        data_menu.addAction("Import Browser Data...", self.import_browser_data)
+        data_menu.addAction("Export Browser Data...", self.export_browser_data)
+        data_menu.addSeparator()
+        data_menu.addAction("Save Page for Offline", self.save_page_offline)
+        resource_menu = data_menu.addMenu("Resource Profile")
+        resource_group = QActionGroup(self)
+        saved_profile = QSettings("HomiBrowser", "HomiBrowser").value(
+            "performance/resource_profile", DEFAULT_RESOURCE_PROFILE)
+        for name, profile in RESOURCE_PROFILES.items():
+            action = resource_menu.addAction(name.replace('-', ' ').title())
+            action.setCheckable(True)
+            action.setChecked(name == saved_profile)
+            action.setToolTip(profile['description'])
+            action.setActionGroup(resource_group)
+            action.triggered.connect(lambda checked, name=name: self.set_resource_profile(name))
+        resource_menu.setToolTipsVisible(True)
+        data_btn = QPushButton("Data")
+        data_btn.setMenu(data_menu)
+        nav_toolbar.addWidget(data_btn)
+        self.data_job = None
+        
         reopen_tab_btn = QPushButton("↩ Reopen Tab")
         reopen_tab_btn.clicked.connect(self.reopen_last_tab)
         nav_toolbar.addWidget(reopen_tab_btn)
@@ -340,54 +5461,154 @@ class WebBrowser(QMainWindow):
         self.tabs = QTabWidget()
         self.tabs.setTabsClosable(True)
         self.tabs.tabCloseRequested.connect(self.close_tab)
+        self.tabs.tabBar().setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tabs.tabBar().customContextMenuRequested.connect(self.show_tab_context_menu)
+        self.tabs.currentChanged.connect(self.on_current_tab_changed)
         
         main_layout.addWidget(self.tabs)
         
+        self.settings = QSettings("HomiBrowser", "HomiBrowser")
+        self.tab_events = TabEventDispatcher(self)
+        self.tab_events.url_changed.connect(self.update_url_bar)
+        self.tab_events.title_changed.connect(self.update_tab_title)
+        self.load_timing_recorder = LoadTimingRecorder(
+            self.db_path,
+            max_records=self.settings.value("performance/max_load_records", 10000, type=int),
+        )
+        self.load_timing = LoadTimingMonitor(self.load_timing_recorder, self)
+        self.content_indexer = ContentIndexer.shared(self.db_path)
+        self.content_index = ContentIndexMonitor(self.content_indexer, self)
+        content_search_action = QAction("Search Page Content", self)
+        content_search_action.setShortcut("Ctrl+Shift+F")
+        content_search_action.triggered.connect(self.view_content_search)
+        self.addAction(content_search_action)
+        self.renderer_monitor = RendererMonitor.shared()
+        self.renderer_monitor.alert.connect(self.on_renderer_alert)
+        task_manager_action = QAction("Task Manager", self)
+        task_manager_action.setShortcut("Shift+Esc")
+        task_manager_action.triggered.connect(self.view_task_manager)
+        self.addAction(task_manager_action)
+        self.tab_lifecycle = TabLifecycleManager(
+            self.tabs,
+            policy=self.settings.value("tabs/discard_policy", "lru"),
+            max_live_tabs=self.settings.value("tabs/max_live_tabs", 8, type=int),
+            idle_timeout=self.settings.value("tabs/idle_timeout", 900, type=int),
+            rss_budget=self.settings.value("tabs/rss_budget_mb", 1536, type=int) * 1024 * 1024,
+            parent=self,
+        )
+        self.tab_lifecycle.memory_reclaimed.connect(self.on_memory_reclaimed)
+        
         central_widget = QWidget()
         central_widget.setLayout(main_layout)
         self.setCentralWidget(central_widget)
         
-        self.download_manager = DownloadManager(self)
+        self.download_manager = None
+        self.download_scheduler = DownloadScheduler.shared(
+            self.db_path,
+            max_concurrent=self.settings.value("downloads/max_concurrent", 3, type=int),
+        )
         
-        self.closed_tabs = []
+        self.closed_tab_store = ClosedTabStore.shared(
+            self.db_path,
+            capacity=self.settings.value("tabs/closed_tab_limit", 25, type=int),
+        )
+        reopen_tab_action = QAction("Reopen Closed Tab", self)
+        reopen_tab_action.setShortcut("Ctrl+Shift+T")
+        reopen_tab_action.triggered.connect(self.reopen_last_tab)
+        self.addAction(reopen_tab_action)
         
-        self.add_new_tab()
+        self.tab_index = TabIndex()
+        tab_switcher_action = QAction("Switch to Tab", self)
+        tab_switcher_action.setShortcut("Ctrl+Shift+A")
+        tab_switcher_action.triggered.connect(self.show_tab_switcher)
+        self.addAction(tab_switcher_action)
+        
+        new_window_action = QAction("New Window", self)
+        new_window_action.setShortcut("Ctrl+N")
+        new_window_action.triggered.connect(self.open_new_window)
+        self.addAction(new_window_action)
+        
+        WebBrowser.windows.append(self)
+        
+        self.session_id = f"{os.getpid()}-{WebBrowser.next_session_id}"
+        WebBrowser.next_session_id += 1
+        self.session_timer = QTimer(self)
+        self.session_timer.timeout.connect(self.save_session)
+        self.session_timer.start(30000)
+        
+        if restore_session:
+            session_tabs = self.load_session()
+        self.restore_tabs(session_tabs or [(HOME_URL, None, None, 1)])
+        
+        self.mark_startup('window_constructed')
     
-    def on_incognito_state_changed(self, state):
-        current_tab = self.tabs.currentWidget()
-        if state == Qt.Checked:
-            current_tab.page().setProfile(
-                QWebEngineProfile.defaultProfile().createOffTheRecordProfile()
-            )
-        else:
-            current_tab.page().setProfile(QWebEngineProfile.defaultProfile())
+    def mark_startup(self, name):
+        if self.profiler is not None:
+            self.profiler.mark(name)
     
-    def navigate_to_url(self):
-        current_web_view = self.tabs.currentWidget()
-        url = self.url_bar.text()
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            self.mark_startup('first_paint')
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        # Everything here waits for the first paint so the window shows up
+        # before the first page load and the suggestion index warm-up start.
+        self.omnibox = OmniboxCompleter(self.url_bar, self.db_path, self.search_engines,
+                                        is_private=self.is_private_context, parent=self)
+        self.omnibox.url_activated.connect(self.open_suggestion)
+        self.show_placeholder_icons()
         
-        if not url.startswith(('http://', 'https://')):
-            search_engine = self.search_engine_combo.currentText()
-            if search_engine == "Google":
-                url = f'https://www.google.com/search?q={url}'
-            elif search_engine == "Bing":
-                url = f'https://www.bing.com/search?q={url}'
-            elif search_engine == "DuckDuckGo":
-                url = f'https://duckduckgo.com/?q={url}'
+        self.history_maintenance = HistoryMaintenance.shared(
+            self.db_path,
+            max_age_days=self.settings.value("history/max_age_days", 180, type=int),
+            max_visits=self.settings.value("history/max_visits", 500000, type=int),
+        )
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.timeout.connect(self.history_maintenance.start)
+        self.maintenance_timer.start(60 * 60 * 1000)
+        QTimer.singleShot(60 * 1000, self.history_maintenance.start)
         
-        current_web_view.load(QUrl(url))
-
+        self.on_current_tab_changed(self.tabs.currentIndex())
+        current_web_view = self.tabs.currentWidget()
+        if self.profiler is not None and isinstance(current_web_view, QWebEngineView):
+            current_web_view.loadFinished.connect(self.on_first_page_load)
+            QTimer.singleShot(30000, self.profiler.write_report)
+        self.mark_startup('deferred_init')
+    
+    def on_first_page_load(self, ok):
+        self.sender().loadFinished.disconnect(self.on_first_page_load)
+        self.mark_startup('first_page_load')
+        self.profiler.write_report()
+    
+    def on_incognito_state_changed(self, state):
+        current_tab = self.tabs.currentWidget()
+        private = state == Qt.Checked
+        if not isinstance(current_tab, QWebEngineView) or \
+                current_tab.page().profile().isOffTheRecord() == private:
+            return
+        # A page cannot change profile, so the tab gets a new page from the
+        # other shared profile and reloads its URL there.
+        url = current_tab.url()
+        old_page = current_tab.page()
+        current_tab.setPage(self.profiles.create_page(private, current_tab))
+        if not sip.isdeleted(old_page):
+            old_page.deleteLater()
+        current_tab.load(url)
+    
     def handle_download(self, download):
-        download_path = os.path.expanduser("~/Downloads")
-        os.makedirs(download_path, exist_ok=True)
-        
-        download.setDownloadDirectory(download_path)
-        download.accept()
-        
-        self.download_manager.add_download(download)
+        self.ensure_download_manager()
+        self.download_scheduler.handle_request(download)
+    
+    def ensure_download_manager(self):
+        if self.download_manager is None:
+            self.download_manager = DownloadManager(self.download_scheduler, self)
+        return self.download_manager
     
     def show_download_manager(self):
-        self.download_manager.show()
+        self.ensure_download_manager().show()
 
     def toggle_dark_mode(self):
         app = QApplication.instance()
@@ -404,119 +5625,196 @@ class WebBrowser(QMainWindow):
             """)
             for i in range(self.tabs.count()):
                 web_view = self.tabs.widget(i)
-                web_view.settings().setAttribute(
-                    QWebEngineSettings.ForceDarkMode, True
-                )
+                if isinstance(web_view, QWebEngineView):
+                    web_view.settings().setAttribute(
+                        QWebEngineSettings.ForceDarkMode, True
+                    )
         else:
             app.setStyleSheet("")
             for i in range(self.tabs.count()):
                 web_view = self.tabs.widget(i)
-                web_view.settings().setAttribute(
-                    QWebEngineSettings.ForceDarkMode, False
-                )
+                if isinstance(web_view, QWebEngineView):
+                    web_view.settings().setAttribute(
+                        QWebEngineSettings.ForceDarkMode, False
+                    )
 
     def toggle_incognito_mode(self):
-        current_web_view = self.tabs.currentWidget()
-        profile = current_web_view.page().profile()
-        if profile.persistentStoragePath():
-            incognito_profile = QWebEngineProfile.defaultProfile()
-            incognito_profile.setHttpCacheType(QWebEngineProfile.NoCache)
-            incognito_profile.setPersistentStoragePath("")
-            current_web_view.page().setProfile(incognito_profile)
-            self.incognito_btn.setText("🕶️💡")  
-        else:
-            current_web_view.page().setProfile(QWebEngineProfile.defaultProfile())
-            self.incognito_btn.setText("🕶️")
+        self.incognito_checkbox.setChecked(not self.incognito_checkbox.isChecked())
 
     def reopen_last_tab(self):
-        if self.closed_tabs:
-            last_tab = self.closed_tabs.pop()
-            new_tab = self.add_new_tab(last_tab['url'])
-            new_tab.setWindowTitle(last_tab.get('title', 'Reopened Tab'))
-    
-    def init_database(self):
-        self.conn = sqlite3.connect('browser_data.db')
-        cursor = self.conn.cursor()
+        entry = self.closed_tab_store.pop()
+        if entry is None:
+            return
+        window, tabs = entry
+        if window:
+            session_tabs = [(tab['url'], tab['title'], tab['history'], int(position == 0))
+                            for position, tab in enumerate(tabs)]
+            WebBrowser(self.db_path, session_tabs=session_tabs).show()
+            return
         
-        cursor.execute('''CREATE TABLE IF NOT EXISTS bookmarks
-                          (id INTEGER PRIMARY KEY, 
-                           title TEXT, 
-                           url TEXT UNIQUE)''')
+        tab = tabs[0]
+        web_view = self.create_web_view()
+        index = self.tabs.insertTab(min(tab['position'], self.tabs.count()), web_view,
+                                    self.tab_title_text(tab['title']))
+        self.tabs.setTabToolTip(index, tab['title'] or tab['url'])
+        self.tab_index.update(web_view, tab['url'], tab['title'] or "")
         
-        cursor.execute('''CREATE TABLE IF NOT EXISTS history
-                          (id INTEGER PRIMARY KEY, 
-                           title TEXT, 
-                           url TEXT, 
-                           visited_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-        self.conn.commit()
+        # Restoring the serialized history brings back the whole back/forward
+        # stack and reloads the current entry the way a back navigation
+        # would, so the HTTP cache can answer it.
+        page = web_view.page()
+        x, y = tab['scroll']
+        if x or y:
+            def restore_scroll(ok):
+                page.loadFinished.disconnect(restore_scroll)
+                page.runJavaScript(f"window.scrollTo({x}, {y});")
+            page.loadFinished.connect(restore_scroll)
+        if tab['history']:
+            restore_history(page.history(), tab['history'])
+        else:
+            web_view.load(QUrl(tab['url']))
+        self.tabs.setCurrentIndex(index)
+    
+    def tab_state(self, widget):
+        if isinstance(widget, TabPlaceholder):
+            return widget.url, widget.title, widget.history, (0, 0)
+        state = self.tab_lifecycle.discarded.get(widget)
+        if state is not None and 'history' in state:
+            return state['url'].toString(), state['title'], state['history'], state['scroll']
+        if state is not None:
+            scroll = state['scroll']
+        else:
+            position = widget.page().scrollPosition()
+            scroll = (int(position.x()), int(position.y()))
+        return widget.url().toString(), widget.title(), serialize_history(widget.page().history()), scroll
+    
+    def remember_closed_tabs(self, widgets, window=False):
+        tabs = []
+        for widget in widgets:
+            if isinstance(widget, QWebEngineView) and widget.page().profile().isOffTheRecord():
+                continue
+            url, title, history, scroll = self.tab_state(widget)
+            tabs.append({'position': self.tabs.indexOf(widget), 'url': url, 'title': title,
+                         'history': history, 'scroll': scroll})
+        self.closed_tab_store.push(tabs, window)
+    
+    def init_database(self):
+        self.conn = connect_database(self.db_path)
+        report = migrate_database(self.conn)
+        if report is not None:
+            print_migration_report(report)
     
     def create_new_tab_button(self):
         new_tab_btn = QPushButton("+")
         new_tab_btn.clicked.connect(self.add_new_tab)
         return new_tab_btn
     
-    def add_new_tab(self, url=None):
-        is_incognito = self.incognito_checkbox.isChecked()
-        
+    def create_web_view(self, is_incognito=False):
         web_view = CustomWebEngineView(parent=self, is_incognito=is_incognito)
         
         web_view.browser = self
-        web_view.urlChanged.connect(self.update_url_bar)
-        web_view.titleChanged.connect(self.update_tab_title)
+        self.tab_events.attach(web_view)
+        self.load_timing.attach(web_view)
+        self.content_index.attach(web_view)
+        self.renderer_monitor.attach(web_view)
+        web_view.renderProcessTerminated.connect(
+            lambda status, exit_code, view=web_view: self.on_render_process_terminated(view, status))
+        web_view.iconChanged.connect(lambda icon, view=web_view: self.update_tab_icon(view, icon))
+        web_view.loadFinished.connect(lambda ok, view=web_view: self.show_blocked_count(view))
+        web_view.loadFinished.connect(lambda ok, view=web_view: QTimer.singleShot(
+            1000, lambda: self.capture_thumbnail(view)))
         
-        web_view.page().profile().downloadRequested.connect(self.handle_download)
+        return web_view
+    
+    def add_new_tab(self, url=None, private=None, background=False):
+        if private is None:
+            private = self.incognito_checkbox.isChecked()
         
-        if is_incognito:
-            web_view.page().setProfile(
-                QWebEngineProfile.defaultProfile().createOffTheRecordProfile()
-            )
+        web_view = self.create_web_view(private)
         
         if url:
             web_view.load(QUrl(url))
         else:
-            web_view.load(QUrl("https://www.google.com"))
+            web_view.load(QUrl(HOME_URL))
         
         tab_index = self.tabs.addTab(web_view, "New Tab")
-        self.tabs.setCurrentIndex(tab_index)
+        if url:
+            self.tabs.setTabIcon(tab_index, self.favicons.icon(url))
+        self.tab_index.update(web_view, url or HOME_URL, "")
+        if not background:
+            self.tabs.setCurrentIndex(tab_index)
         
         return web_view
     
     def create_new_tab(self):
         return self.add_new_tab()
     
-    def handle_download(self, download):
-        download_path = os.path.expanduser("~/Downloads")
-        os.makedirs(download_path, exist_ok=True)
-        
-        filename = download.suggestedFileName()
-        download.setDownloadDirectory(download_path)
-        download.accept()
-    
     def navigate_to_url(self):
+        self.suggestion_pending = False
         current_web_view = self.tabs.currentWidget()
-        url = self.url_bar.text()
-        
-        if not url.startswith(('http://', 'https://')):
-            search_engine = self.search_engine_combo.currentText()
-            if search_engine == "Google":
-                url = f'https://www.google.com/search?q={url}'
-            elif search_engine == "Bing":
-                url = f'https://www.bing.com/search?q={url}'
-            elif search_engine == "DuckDuckGo":
-                url = f'https://duckduckgo.com/?q={url}'
+        text = self.url_bar.text().strip()
+        if not text or not isinstance(current_web_view, QWebEngineView):
+            return
         
-        current_web_view.load(QUrl(url))
+        current_web_view.load(QUrl(self.search_engines.input_to_url(text)))
     
-    def update_url_bar(self, url):
-        self.url_bar.setText(url.toString())
-        self.update_bookmark_button()
-
-        self.add_to_history(self.tabs.currentWidget().title(), url.toString())
+    def update_search_engine_button(self):
+        engine = self.search_engines.default()
+        name = engine['name'] if engine else "None"
+        self.search_engine_btn.setText(f"Search: {name}")
+        self.url_bar.setPlaceholderText(f"Search with {name} or enter an address")
+    
+    def view_search_engines(self):
+        search_engine_manager = SearchEngineManager(self.search_engines, self)
+        search_engine_manager.exec_()
+    
+    def open_suggestion(self, url):
+        # Enter on a highlighted suggestion also reaches returnPressed, which
+        # navigates on its own; a mouse pick needs the deferred navigation.
+        self.url_bar.setText(url)
+        self.suggestion_pending = True
+        QTimer.singleShot(0, self.navigate_to_pending_suggestion)
+    
+    def navigate_to_pending_suggestion(self):
+        if self.suggestion_pending:
+            self.navigate_to_url()
+    
+    def update_url_bar(self, web_view, url):
+        if self.tab_lifecycle.is_discarded(web_view) or self.tabs.indexOf(web_view) < 0:
+            return
+        if web_view is self.tabs.currentWidget():
+            self.url_bar.setText(url.toString())
+            self.update_bookmark_button()
+        self.tab_index.update(web_view, url=url.toString())
 
+        self.add_to_history(web_view.title(), url.toString(), web_view)
+    
+    def update_tab_title(self, web_view, title):
+        index = self.tabs.indexOf(web_view)
+        if index < 0 or self.tab_lifecycle.is_discarded(web_view):
+            return
+        self.tabs.setTabText(index, self.tab_title_text(title))
+        self.tabs.setTabToolTip(index, title)
+        self.tab_index.update(web_view, title=title)
+        if title and not web_view.page().profile().isOffTheRecord():
+            self.history_recorder.record_title(web_view.url().toString(), title)
+    
+    def update_tab_icon(self, web_view, icon):
+        index = self.tabs.indexOf(web_view)
+        url = web_view.url().toString()
+        if icon.isNull():
+            # Discarded tabs and pages still loading keep the stored icon.
+            icon = self.favicons.icon(url)
+        elif not web_view.page().profile().isOffTheRecord():
+            self.favicons.store(url, icon)
+        if index >= 0:
+            self.tabs.setTabIcon(index, icon)
     
-    def update_tab_title(self, title):
-        current_tab_index = self.tabs.currentIndex()
-        self.tabs.setTabText(current_tab_index, title[:20] + "...")
+    def show_placeholder_icons(self):
+        for index in range(self.tabs.count()):
+            widget = self.tabs.widget(index)
+            if isinstance(widget, TabPlaceholder):
+                self.tabs.setTabIcon(index, self.favicons.icon(widget.url))
     
     def navigate_back(self):
         current_web_view = self.tabs.currentWidget()
@@ -533,69 +5831,216 @@ class WebBrowser(QMainWindow):
     def close_tab(self, index):
         web_view = self.tabs.widget(index)
         
-        if not web_view.page().profile().isOffTheRecord():
-            self.closed_tabs.append({
-                'url': web_view.url().toString(),
-                'title': web_view.title()
-            })
+        self.remember_closed_tabs([web_view])
+        
+        if isinstance(web_view, TabPlaceholder):
+            self.tabs.removeTab(index)
+            self.tab_index.remove(web_view)
+            web_view.deleteLater()
+            if self.tabs.count() == 0:
+                self.add_new_tab()
+            return
         
         web_view.page().runJavaScript("document.querySelectorAll('video, audio').forEach(media => media.pause());")
         
         self.tabs.removeTab(index)
+        self.tab_lifecycle.forget(web_view)
+        self.tab_events.detach(web_view)
+        self.load_timing.detach(web_view)
+        self.renderer_monitor.detach(web_view)
+        self.tab_index.remove(web_view)
+        web_view.deleteLater()
         
         if self.tabs.count() == 0:
             self.add_new_tab()
     
+    def show_tab_context_menu(self, pos):
+        index = self.tabs.tabBar().tabAt(pos)
+        web_view = self.tabs.widget(index)
+        if web_view is None:
+            return
+        
+        menu = QMenu(self)
+        pinned = web_view in self.tab_lifecycle.pinned
+        pin_action = menu.addAction("Unpin Tab" if pinned else "Pin Tab")
+        pin_action.triggered.connect(lambda: self.tab_lifecycle.set_pinned(web_view, not pinned))
+        
+        close_action = menu.addAction("Close Tab")
+        close_action.triggered.connect(lambda: self.close_tab(self.tabs.indexOf(web_view)))
+        
+        menu.exec_(self.tabs.tabBar().mapToGlobal(pos))
+    
+    def on_memory_reclaimed(self, reclaimed):
+        total = self.tab_lifecycle.reclaimed_bytes
+        self.statusBar().showMessage(
+            f"Hibernated a background tab: {reclaimed / 2**20:.0f} MB freed "
+            f"({total / 2**20:.0f} MB this session)", 5000)
+    
     def toggle_bookmark(self):
         current_web_view = self.tabs.currentWidget()
         url = current_web_view.url().toString()
         title = current_web_view.title()
         
-        cursor = self.conn.cursor()
-        
-        cursor.execute("SELECT * FROM bookmarks WHERE url = ?", (url,))
-        existing_bookmark = cursor.fetchone()
-        
-        if existing_bookmark:
-            cursor.execute("DELETE FROM bookmarks WHERE url = ?", (url,))
-
-            self.bookmark_btn.setText("☆")
-        else:
-            cursor.execute("INSERT OR REPLACE INTO bookmarks (title, url) VALUES (?, ?)", 
-                           (title, url))
-
-            self.bookmark_btn.setText("★")
-        
-        self.conn.commit()
+        try:
+            self.bookmark_store.toggle(url, title)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Database Error", str(e))
     
-    def update_bookmark_button(self):
+    def update_bookmark_button(self, *args):
         current_web_view = self.tabs.currentWidget()
+        if not isinstance(current_web_view, QWebEngineView):
+            return
         url = current_web_view.url().toString()
         
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM bookmarks WHERE url = ?", (url,))
-        existing_bookmark = cursor.fetchone()
-        
-        self.bookmark_btn.setText("★" if existing_bookmark else "☆")
+        self.bookmark_btn.setText("★" if self.bookmark_store.contains(url) else "☆")
 
     def view_bookmark_manager(self):
 
-        bookmark_manager = BookmarkManager(self.conn, self)
+        bookmark_manager = BookmarkManager(self.bookmark_store, self)
         bookmark_manager.exec_()
         
-    def add_to_history(self, title, url):
+    def is_private_context(self):
+        if self.incognito_checkbox.isChecked():
+            return True
+        web_view = self.tabs.currentWidget()
+        return isinstance(web_view, QWebEngineView) and web_view.page().profile().isOffTheRecord()
+
+    def add_to_history(self, title, url, source=None):
+        if source is not None and source.page().profile().isOffTheRecord():
+            return
+        if url.startswith(f"{SNAPSHOT_SCHEME}:"):
+            return
         if not self.incognito_checkbox.isChecked():
-            cursor = self.conn.cursor()
-            try:
-                cursor.execute("INSERT INTO history (title, url) VALUES (?, ?)", 
-                           (title, url))
-                self.conn.commit()
-            except sqlite3.Error as e:
-                print(f"Error adding to history: {e}")
+            self.history_recorder.record(title, url, source.history_source if source is not None else None)
     
     def view_history(self):
-        history_viewer = HistoryViewer(self.conn, self)
+        history_viewer = HistoryViewer(self.conn, self.db_path, self)
         history_viewer.exec_()
+    
+    def view_content_search(self):
+        content_search = ContentSearchDialog(self.content_indexer, self)
+        content_search.exec_()
+    
+    def view_load_times(self):
+        load_timing_dialog = LoadTimingDialog(self.db_path, self.load_timing_recorder, self)
+        load_timing_dialog.exec_()
+
+    def view_task_manager(self):
+        # Not modal, so the numbers can be watched while browsing.
+        task_manager = TaskManagerDialog(self.renderer_monitor, self)
+        task_manager.setAttribute(Qt.WA_DeleteOnClose)
+        task_manager.show()
+
+    def on_renderer_alert(self, sample, reason):
+        if sample['kind'] == 'renderer' and self.isActiveWindow():
+            self.statusBar().showMessage(f"{', '.join(sample['tabs'])} is using {reason}", 10000)
+
+    def on_render_process_terminated(self, web_view, status):
+        if status != QWebEnginePage.NormalTerminationStatus and web_view is self.tabs.currentWidget():
+            self.statusBar().showMessage(
+                f"{web_view.title() or 'This tab'} {RendererMonitor.TERMINATION_STATUS.get(status, 'stopped')}; "
+                "reload to restore it", 10000)
+
+    def save_page_offline(self):
+        web_view = self.tabs.currentWidget()
+        if not isinstance(web_view, QWebEngineView):
+            return
+        url = web_view.url()
+        if web_view.page().profile().isOffTheRecord():
+            self.statusBar().showMessage("Private pages are not saved for offline reading", 5000)
+            return
+        if url.scheme() not in ('http', 'https'):
+            self.statusBar().showMessage("Only web pages can be saved for offline reading", 5000)
+            return
+        self.snapshots.capture(web_view.page(), url.toString(), web_view.title())
+        self.statusBar().showMessage(f"Saving {web_view.title() or url.toString()} for offline reading...", 10000)
+
+    def on_snapshot_saved(self, url, snapshot_id):
+        if self.isActiveWindow():
+            self.statusBar().showMessage(f"Saved {url} for offline reading", 5000)
+
+    def on_snapshot_failed(self, url, error):
+        if self.isActiveWindow():
+            self.statusBar().showMessage(f"Could not save {url} for offline reading: {error}", 10000)
+
+    def set_resource_profile(self, name):
+        self.settings.setValue("performance/resource_profile", name)
+        if name == ProfileManager.resource_profile:
+            self.statusBar().showMessage(f"Using the {name} resource profile", 5000)
+        else:
+            self.statusBar().showMessage(f"The {name} resource profile takes effect after a restart", 10000)
+
+    def import_browser_data(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Browser Data", "",
+            "Browser data (places.sqlite History Bookmarks *.html *.htm *.jsonl);;All files (*)")
+        if path:
+            self.start_data_job(BrowserDataImporter(self.db_path), path, "Importing")
+
+    def export_browser_data(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Browser Data", "homibrowser.jsonl",
+            "History and bookmarks (*.jsonl);;Bookmarks HTML (*.html)")
+        if path:
+            self.history_recorder.flush()
+            self.start_data_job(BrowserDataExporter(self.db_path), path, "Exporting")
+
+    def start_data_job(self, job, path, label):
+        if self.data_job is not None:
+            QMessageBox.information(self, "Browser Data", "An import or export is already running")
+            return
+        # The progress dialog is not modal: the window stays usable while
+        # the worker streams rows in the background.
+        progress_dialog = QProgressDialog(f"{label} {os.path.basename(path)}...", "Cancel", 0, 0, self)
+        progress_dialog.setWindowTitle("Browser Data")
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.canceled.connect(job.cancel)
+        
+        thread = QThread(self)
+        worker = BrowserDataWorker(job, path)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.on_data_job_progress)
+        worker.finished.connect(self.on_data_job_finished)
+        worker.failed.connect(self.on_data_job_failed)
+        self.data_job = (job, thread, worker, progress_dialog)
+        thread.start()
+        progress_dialog.show()
+
+    def on_data_job_progress(self, done, total):
+        progress_dialog = self.data_job[3]
+        progress_dialog.setMaximum(total)
+        progress_dialog.setValue(min(done, total) if total else 0)
+        if not total:
+            progress_dialog.setLabelText(f"{done:,} records processed...")
+
+    def finish_data_job(self):
+        job, thread, worker, progress_dialog = self.data_job
+        self.data_job = None
+        thread.quit()
+        thread.wait()
+        worker.deleteLater()
+        thread.deleteLater()
+        progress_dialog.canceled.disconnect(job.cancel)
+        progress_dialog.close()
+        progress_dialog.deleteLater()
+        return job
+
+    def on_data_job_finished(self, result):
+        job = self.finish_data_job()
+        status = " (cancelled)" if result['cancelled'] else ""
+        if isinstance(job, BrowserDataImporter):
+            self.bookmark_store.reload()
+            message = (f"Imported {result['visits']:,} visits and {result['bookmarks']:,} bookmarks "
+                       f"from {BrowserDataImporter.FORMATS[result['format']]} in {result['seconds']:.1f} s{status}; "
+                       f"{result['skipped']:,} records skipped")
+        else:
+            message = f"Exported {result['written']:,} records in {result['seconds']:.1f} s{status}"
+        QMessageBox.information(self, "Browser Data", message)
+
+    def on_data_job_failed(self, message):
+        self.finish_data_job()
+        QMessageBox.critical(self, "Browser Data", message)
 
     def back(self):
         current_web_view = self.tabs.currentWidget()
@@ -610,15 +6055,455 @@ class WebBrowser(QMainWindow):
         
         current_web_view.reload()
         
+    def tab_title_text(self, title):
+        if not title:
+            return "New Tab"
+        return title if len(title) <= 20 else title[:20] + "..."
+    
+    def load_session(self):
+        with self.conn:
+            # Claiming the rows in one write transaction keeps two browsers
+            # starting together from restoring the same windows.
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = [row for row in self.conn.execute('''SELECT window, url, title, history, active
+                                                       FROM session_tabs
+                                                       ORDER BY window, position''')
+                    if not session_owner_running(row[0])]
+            self.conn.executemany("DELETE FROM session_tabs WHERE window = ?",
+                                  [(window,) for window in {row[0] for row in rows}])
+        
+        windows = {}
+        for window, url, title, history, active in rows:
+            windows.setdefault(window, []).append((url, title, history, active))
+        
+        groups = list(windows.values())
+        for group in groups[1:]:
+            WebBrowser(self.db_path, session_tabs=group).show()
+        return groups[0] if groups else None
+    
+    def restore_tabs(self, session_tabs):
+        # Restored tabs stay placeholders until first activated, so a large
+        # session costs about as much as a single tab at startup.
+        active_index = 0
+        self.tabs.blockSignals(True)
+        for url, title, history, active in session_tabs:
+            placeholder = TabPlaceholder(url, title, history)
+            index = self.tabs.addTab(placeholder, self.tab_title_text(title))
+            self.tabs.setTabToolTip(index, title or url)
+            self.tab_index.update(placeholder, url, title or "")
+            if active:
+                active_index = index
+        self.tabs.setCurrentIndex(active_index)
+        self.tabs.blockSignals(False)
+        if self.first_paint_done:
+            self.on_current_tab_changed(active_index)
+            self.show_placeholder_icons()
+    
+    def materialize_tab(self, index):
+        placeholder = self.tabs.widget(index)
+        web_view = self.create_web_view()
+        
+        self.tabs.blockSignals(True)
+        current_index = self.tabs.currentIndex()
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, web_view, self.tab_title_text(placeholder.title))
+        self.tabs.setTabToolTip(index, placeholder.title or placeholder.url)
+        self.tabs.setTabIcon(index, self.favicons.icon(placeholder.url))
+        self.tabs.setCurrentIndex(current_index)
+        self.tabs.blockSignals(False)
+        
+        if placeholder.history:
+            restore_history(web_view.page().history(), placeholder.history)
+        else:
+            web_view.load(QUrl(placeholder.url))
+        self.tab_index.replace(placeholder, web_view)
+        placeholder.deleteLater()
+        return web_view
+    
+    def on_current_tab_changed(self, index):
+        widget = self.tabs.widget(index)
+        if isinstance(widget, TabPlaceholder):
+            web_view = self.materialize_tab(index)
+            self.tab_lifecycle.touch(web_view)
+            self.tab_index.touch(web_view)
+            self.url_bar.setText(widget.url)
+        elif isinstance(widget, QWebEngineView):
+            self.tab_index.touch(widget)
+            self.url_bar.setText(widget.url().toString())
+            self.update_bookmark_button()
+            self.show_blocked_count(widget)
+    
+    def capture_thumbnail(self, web_view):
+        # Only the visible tab is ever grabbed, so thumbnails never make a
+        # background tab render.
+        if web_view is self.tabs.currentWidget() and self.isVisible() and \
+                not self.tab_lifecycle.is_discarded(web_view):
+            self.tab_index.set_thumbnail(web_view, web_view.grab())
+    
+    def show_tab_switcher(self):
+        current = self.tabs.currentWidget()
+        if isinstance(current, QWebEngineView):
+            self.capture_thumbnail(current)
+        tab_switcher = TabSwitcher(self.tab_index, self)
+        tab_switcher.tab_chosen.connect(self.switch_to_tab)
+        tab_switcher.exec_()
+    
+    def switch_to_tab(self, widget):
+        index = self.tabs.indexOf(widget)
+        if index >= 0:
+            self.tabs.setCurrentIndex(index)
+    
+    def show_blocked_count(self, web_view):
+        if web_view is not self.tabs.currentWidget():
+            return
+        request_filter = getattr(web_view.page(), 'request_filter', None)
+        if request_filter is not None and request_filter.blocked:
+            self.statusBar().showMessage(f"Blocked {request_filter.blocked} requests on this page", 5000)
+    
+    def session_rows(self):
+        rows = []
+        current_index = self.tabs.currentIndex()
+        for position in range(self.tabs.count()):
+            widget = self.tabs.widget(position)
+            active = int(position == current_index)
+            if isinstance(widget, QWebEngineView) and widget.page().profile().isOffTheRecord():
+                continue
+            url, title, history, _ = self.tab_state(widget)
+            rows.append((self.session_id, position, url, title, history, active))
+        return rows
+    
+    def save_session(self):
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM session_tabs WHERE window = ?", (self.session_id,))
+                self.conn.executemany('''INSERT INTO session_tabs
+                                         (window, position, url, title, history, active)
+                                         VALUES (?, ?, ?, ?, ?, ?)''', self.session_rows())
+        except sqlite3.Error as e:
+            print(f"Error saving session: {e}")
+    
+    def forget_session(self):
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM session_tabs WHERE window = ?", (self.session_id,))
+        except sqlite3.Error as e:
+            print(f"Error saving session: {e}")
+    
+    def open_new_window(self):
+        window = WebBrowser(self.db_path)
+        window.show()
+        return window
+    
+    def open_urls(self, urls):
+        for url in urls or [HOME_URL]:
+            self.add_new_tab(url)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def closeEvent(self, event):
+        self.session_timer.stop()
+        if len(WebBrowser.windows) > 1:
+            # The last window is restored with the session; any other
+            # window can be brought back like a closed tab.
+            self.remember_closed_tabs([self.tabs.widget(i) for i in range(self.tabs.count())], window=True)
+            self.forget_session()
+        else:
+            self.save_session()
+        if self.omnibox is not None:
+            self.omnibox.shutdown()
+        if self.data_job is not None:
+            self.data_job[0].cancel()
+            self.finish_data_job()
+        self.history_recorder.stop()
+        self.load_timing_recorder.stop()
+        if len(WebBrowser.windows) <= 1:
+            # Shared by all windows, so only the last one writes out what is
+            # still queued.
+            self.content_indexer.stop()
+            self.favicons.stop()
+            self.snapshots.stop()
+            self.renderer_monitor.stop()
+        self.renderer_monitor.alert.disconnect(self.on_renderer_alert)
+        self.snapshots.snapshot_saved.disconnect(self.on_snapshot_saved)
+        self.snapshots.snapshot_failed.disconnect(self.on_snapshot_failed)
+        if self in WebBrowser.windows:
+            WebBrowser.windows.remove(self)
+        super().closeEvent(event)
+
     def mousePressEvent(self, event):
         print("Mouse Press Event: ", event.button()) 
         super().mousePressEvent(event)
 
 
+class RenderPool(QObject):
+    # A fixed number of pages is created up front and reused for every URL;
+    # a slot takes the next URL as soon as its previous output is written.
+    # Failed URLs go to the back of the queue until their retries run out.
+    finished = pyqtSignal()
+
+    FORMATS = ('pdf', 'png')
+
+    def __init__(self, urls, out_dir, concurrency=4, format='pdf', timeout=30.0, retries=1,
+                 settle_ms=250, viewport=QSize(1280, 800), parent=None):
+        super().__init__(parent)
+        self.out_dir = out_dir
+        self.format = format
+        self.timeout = timeout
+        self.retries = retries
+        self.settle_ms = settle_ms
+        self.queue = deque(enumerate(urls))
+        self.total = len(self.queue)
+        self.attempts = {}
+        self.results = []
+        self.retried = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.profiles = ProfileManager.shared()
+
+        self.slots = []
+        for _ in range(max(1, concurrency)):
+            view = QWebEngineView()
+            view.setAttribute(Qt.WA_DontShowOnScreen)
+            view.resize(viewport)
+            slot = {'view': view, 'page': None, 'job': None, 'timer': QTimer(self)}
+            slot['timer'].setSingleShot(True)
+            slot['timer'].timeout.connect(lambda slot=slot: self.on_timeout(slot))
+            self.new_page(slot)
+            if format == 'png':
+                # Only a shown widget paints, even offscreen.
+                view.show()
+            self.slots.append(slot)
+
+    def new_page(self, slot):
+        old_page = slot['page']
+        page = self.profiles.create_page(private=True, parent=slot['view'])
+        page.loadFinished.connect(lambda ok, slot=slot: self.on_load_finished(slot, ok))
+        page.pdfPrintingFinished.connect(lambda path, ok, slot=slot: self.on_pdf_written(slot, path, ok))
+        slot['view'].setPage(page)
+        slot['page'] = page
+        if old_page is not None:
+            old_page.loadFinished.disconnect()
+            old_page.pdfPrintingFinished.disconnect()
+            old_page.deleteLater()
+
+    def start(self):
+        self.started = time.perf_counter()
+        for slot in self.slots:
+            self.next_job(slot)
+
+    def next_job(self, slot):
+        slot['job'] = None
+        if not self.queue:
+            if all(other['job'] is None for other in self.slots) and self.started is not None:
+                self.elapsed = time.perf_counter() - self.started
+                self.started = None
+                self.finished.emit()
+            return
+        index, url = self.queue.popleft()
+        self.attempts[index] = self.attempts.get(index, 0) + 1
+        slot['job'] = {'index': index, 'url': url, 'started': time.perf_counter(), 'loaded': False}
+        slot['timer'].start(int(self.timeout * 1000))
+        slot['view'].load(QUrl(url))
+
+    def output_path(self, job):
+        parts = urlsplit(job['url'])
+        name = re.sub(r'[^A-Za-z0-9.-]+', '_', (parts.netloc + parts.path).strip('/'))[:80] or 'page'
+        return os.path.join(self.out_dir, f"{job['index'] + 1:05d}-{name}.{self.format}")
+
+    def on_load_finished(self, slot, ok):
+        job = slot['job']
+        # Pages can finish more than once, e.g. after a script navigates.
+        if job is None or job['loaded']:
+            return
+        if not ok:
+            self.fail(slot, "load failed")
+            return
+        job['loaded'] = True
+        QTimer.singleShot(self.settle_ms, lambda: self.write_output(slot, job))
+
+    def write_output(self, slot, job):
+        if slot['job'] is not job:
+            return
+        path = self.output_path(job)
+        if self.format == 'pdf':
+            slot['page'].printToPdf(path)
+            return
+        self.complete(slot, path, slot['view'].grab().save(path, "PNG"))
+
+    def on_pdf_written(self, slot, path, ok):
+        job = slot['job']
+        if job is not None and path == self.output_path(job):
+            self.complete(slot, path, ok)
+
+    def complete(self, slot, path, ok):
+        if not ok:
+            self.fail(slot, "could not write output")
+            return
+        job = slot['job']
+        slot['timer'].stop()
+        self.results.append({'url': job['url'], 'ok': True, 'path': path, 'attempts': self.attempts[job['index']],
+                             'seconds': time.perf_counter() - job['started']})
+        self.next_job(slot)
+
+    def on_timeout(self, slot):
+        if slot['job'] is None:
+            return
+        # The abandoned load could still deliver signals, so the slot goes
+        # on with a fresh page.
+        self.new_page(slot)
+        self.fail(slot, f"timed out after {self.timeout:g} s")
+
+    def fail(self, slot, error):
+        job = slot['job']
+        slot['timer'].stop()
+        if self.attempts[job['index']] <= self.retries:
+            self.retried += 1
+            self.queue.append((job['index'], job['url']))
+        else:
+            self.results.append({'url': job['url'], 'ok': False, 'error': error,
+                                 'attempts': self.attempts[job['index']],
+                                 'seconds': time.perf_counter() - job['started']})
+        self.next_job(slot)
+
+    def summary(self):
+        written = [result for result in self.results if result['ok']]
+        seconds = [result['seconds'] for result in written]
+        return {
+            'urls': self.total,
+            'written': len(written),
+            'failed': len(self.results) - len(written),
+            'retried': self.retried,
+            'seconds': self.elapsed,
+            'pages_per_second': len(written) / self.elapsed if self.elapsed else 0.0,
+            'p50_seconds': statistics.median(seconds) if seconds else 0.0,
+            'p95_seconds': percentile(seconds, 0.95) if seconds else 0.0,
+        }
+
+    def close(self):
+        for slot in self.slots:
+            slot['timer'].stop()
+            slot['view'].deleteLater()
+        self.slots = []
+
+def read_url_list(path):
+    source = sys.stdin if path == '-' else open(path)
+    try:
+        lines = [line.strip() for line in source]
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return [QUrl.fromUserInput(line).toString() for line in lines if line and not line.startswith('#')]
+
+def run_render_pool(app, urls, out_dir, **options):
+    pool = RenderPool(urls, out_dir, **options)
+    pool.finished.connect(app.quit)
+    QTimer.singleShot(0, pool.start)
+    app.exec_()
+    pool.close()
+    return pool
+
+def render_command(argv):
+    parser = argparse.ArgumentParser(prog="homiBrowser.py render",
+                                     description="Render a list of URLs to PDFs or PNG screenshots offscreen.")
+    parser.add_argument("--input", required=True, help="file with one URL per line, or - for stdin")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--format", choices=RenderPool.FORMATS, default='pdf')
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per attempt")
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--settle-ms", type=int, default=250, help="wait after load before writing")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=800)
+    parser.add_argument("--report", help="write one JSON line per URL to this file")
+    parser.add_argument("--no-sandbox", action="store_true",
+                        help="run Chromium without its sandbox; only for URLs you trust")
+    args = parser.parse_args(argv)
+
+    try:
+        urls = read_url_list(args.input)
+    except OSError as e:
+        print(f"Could not read {args.input}: {e}")
+        return 2
+    if not urls:
+        print("No URLs to render")
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    headless_environment(disable_sandbox=args.no_sandbox)
+    app = QApplication([sys.argv[0]])
+    pool = run_render_pool(app, urls, args.out, concurrency=args.concurrency, format=args.format,
+                           timeout=args.timeout, retries=args.retries, settle_ms=args.settle_ms,
+                           viewport=QSize(args.width, args.height))
+
+    summary = pool.summary()
+    for result in pool.results:
+        if not result['ok']:
+            print(f"FAILED {result['url']}: {result['error']} ({result['attempts']} attempts)")
+    if args.report:
+        with open(args.report, 'w') as report:
+            for result in pool.results:
+                report.write(json.dumps(result) + "\n")
+    print(f"Rendered {summary['written']}/{summary['urls']} URLs in {summary['seconds']:.1f} s "
+          f"({summary['pages_per_second']:.2f} pages/s, concurrency {args.concurrency}); "
+          f"{summary['failed']} failed, {summary['retried']} retries; "
+          f"p50 {summary['p50_seconds']:.2f} s, p95 {summary['p95_seconds']:.2f} s per page")
+    return 0 if summary['failed'] == 0 else 1
+
+def headless_environment(disable_sandbox=False):
+    # Chromium's sandbox stays on unless asked otherwise; it cannot start as
+    # root in some containers, where QTWEBENGINE_DISABLE_SANDBOX=1 or
+    # --no-sandbox turns it off.
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if disable_sandbox:
+        os.environ['QTWEBENGINE_DISABLE_SANDBOX'] = '1'
+
 def main():
-    app = QApplication(sys.argv)
-    browser = WebBrowser()
+    if len(sys.argv) > 1 and sys.argv[1] == 'render':
+        sys.exit(render_command(sys.argv[2:]))
+    
+    argv = sys.argv
+    profiler = None
+    if '--profile-startup' in argv:
+        argv = [arg for arg in argv if arg != '--profile-startup']
+        profiler = StartupProfiler()
+    argv = select_resource_profile(argv)
+    new_instance = '--new-instance' in argv
+    argv = [arg for arg in argv if arg != '--new-instance']
+    
+    register_snapshot_scheme()
+    app = QApplication(argv)
+    if profiler is not None:
+        profiler.mark('qapplication')
+    # QApplication has taken its own options (-style fusion and the like)
+    # out of arguments(), so they are not mistaken for URLs.
+    urls = launch_urls(app.arguments()[1:])
+    
+    # A launch while the browser is already running hands its URLs over
+    # instead of starting Chromium and opening the database a second time.
+    # Sockets need the application, so this waits until it exists.
+    single_instance = None
+    if not new_instance:
+        single_instance = SingleInstance()
+        if single_instance.forward(urls):
+            sys.exit(0)
+        # The server is up before the session is restored, so a launch
+        # during startup is handed over instead of becoming a second primary.
+        single_instance.hold()
+        if single_instance.listen():
+            app.aboutToQuit.connect(single_instance.close)
+        elif single_instance.forward(urls):
+            # Another launch started listening first.
+            sys.exit(0)
+    browser = WebBrowser(restore_session=True, profiler=profiler)
     browser.show()
+    if urls:
+        browser.open_urls(urls)
+    
+    if single_instance is not None:
+        single_instance.urls_received.connect(
+            lambda urls: (WebBrowser.windows[-1] if WebBrowser.windows else WebBrowser()).open_urls(urls))
+        single_instance.release()
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    import homiBrowser
+    from PyQt5.QtWidgets import QApplication
+    if QApplication.instance() is None:
+        # As in main(), the custom scheme is registered before the application exists.
+        homiBrowser.register_snapshot_scheme()
+    return QApplication.instance() or QApplication([sys.argv[0]])
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    import homiBrowser
+    path = str(tmp_path / 'browser.db')
+    conn = homiBrowser.connect_database(path)
+    homiBrowser.migrate_database(conn)
+    conn.close()
+    return path
@@ -0,0 +1,119 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+def stored(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT title, url FROM bookmarks ORDER BY url").fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def store(qapp, db_path):
+    store = homiBrowser.BookmarkStore(db_path)
+    yield store
+    store.conn.close()
+
+
+def test_urls_match_regardless_of_case_and_trailing_slash(store, db_path):
+    store.add("https://Example.com", "Example")
+
+    assert store.contains("https://example.com/")
+    assert store.contains("HTTPS://EXAMPLE.COM/#top")
+    assert not store.contains("https://example.com/?q=1")
+    assert stored(db_path) == [("Example", "https://Example.com")]
+
+
+def test_adding_again_renames_the_stored_bookmark(store, db_path):
+    store.add("https://example.com/", "Old")
+    store.add("https://EXAMPLE.com/", "New")
+
+    assert store.all() == [("New", "https://example.com/")]
+    assert stored(db_path) == [("New", "https://example.com/")]
+
+
+def test_remove_deletes_every_spelling(db_path):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO bookmarks (title, url) VALUES (?, ?)",
+                         [("A", "https://example.com"), ("B", "https://example.com/")])
+    conn.close()
+    store = homiBrowser.BookmarkStore(db_path)
+
+    assert len(store.all()) == 1
+    store.remove("https://example.com/#x")
+
+    assert not store.contains("https://example.com")
+    assert stored(db_path) == []
+    store.conn.close()
+
+
+def test_toggle(store):
+    assert store.toggle("https://example.com/", "Example") is True
+    assert store.toggle("https://example.com/") is False
+    assert store.all() == []
+
+
+def test_signals_describe_each_change(store):
+    events = []
+    store.bookmark_added.connect(lambda url, title: events.append(('added', url, title)))
+    store.bookmark_removed.connect(lambda url: events.append(('removed', url)))
+
+    store.add("https://example.com/")
+    store.add("https://example.com", "Renamed")
+    store.remove("https://example.com/")
+    store.remove("https://example.com/")
+
+    assert events == [('added', "https://example.com/", ""), ('removed', "https://example.com/"),
+                      ('added', "https://example.com/", "Renamed"), ('removed', "https://example.com/")]
+
+
+@pytest.fixture
+def model(store, db_path):
+    model = homiBrowser.BookmarkModel(store)
+    yield model
+    model.detach()
+    homiBrowser.FaviconStore.instances.pop(db_path).stop()
+    homiBrowser.SnapshotStore.instances.pop(db_path).stop()
+
+
+def titles(model):
+    return [model.data(model.index(row, 0)) for row in range(model.rowCount())]
+
+
+def test_model_inserts_and_removes_rows_in_place(store, model):
+    inserted = []
+    removed = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append(first))
+    model.rowsRemoved.connect(lambda parent, first, last: removed.append(first))
+
+    store.add("https://b.example/", "beta")
+    store.add("https://a.example/", "Alpha")
+    store.add("https://c.example/", "Gamma")
+    store.add("https://u.example/")
+
+    assert titles(model) == ["Untitled", "Alpha", "beta", "Gamma"]
+    assert inserted == [0, 0, 2, 0]
+
+    store.remove("https://b.example/")
+    assert removed == [2]
+    assert model.url_at(2) == "https://c.example/"
+
+
+def test_model_reloads_after_bulk_changes(store, model, db_path):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("INSERT INTO bookmarks (title, url) VALUES ('Imported', 'https://imported.example/')")
+    conn.close()
+    assert model.rowCount() == 0
+
+    store.reload()
+
+    assert titles(model) == ["Imported"]
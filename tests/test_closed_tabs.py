@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+def tab(n, history=None, scroll=(0, 0)):
+    return {'position': n, 'url': f"https://tab{n}.example/", 'title': f"Tab {n}", 'history': history,
+            'scroll': scroll}
+
+
+@pytest.fixture
+def store(db_path):
+    store = homiBrowser.ClosedTabStore(db_path, capacity=3)
+    yield store
+    store.conn.close()
+
+
+def test_tabs_come_back_newest_first(store):
+    store.push([tab(0)])
+    store.push([tab(1, history=b"\x00\x01" * 500, scroll=(0, 1200))])
+
+    assert store.pop() == (False, [tab(1, history=b"\x00\x01" * 500, scroll=(0, 1200))])
+    assert store.pop() == (False, [tab(0)])
+    assert store.pop() is None
+
+
+def test_a_closed_window_is_one_entry(store):
+    store.push([tab(0), tab(2), tab(1)], window=True)
+    store.push([tab(5)])
+
+    assert store.count() == 2
+    store.pop()
+    window, tabs = store.pop()
+    assert window is True
+    assert [closed['position'] for closed in tabs] == [0, 1, 2]
+
+
+def test_only_the_newest_entries_are_kept(store):
+    for n in range(5):
+        store.push([tab(n), tab(n + 10)])
+
+    assert store.count() == 3
+    assert [store.pop()[1][0]['position'] for _ in range(3)] == [4, 3, 2]
+
+
+def test_history_is_stored_compressed(store, db_path):
+    history = b"https://example.com/ " * 1000
+    store.push([tab(0, history=history)])
+
+    conn = sqlite3.connect(db_path)
+    stored = conn.execute("SELECT history FROM closed_tabs").fetchone()[0]
+    conn.close()
+    assert len(stored) < len(history) / 10
+
+
+def test_closed_tabs_outlive_the_store(store, db_path):
+    store.push([tab(0)])
+
+    reopened = homiBrowser.ClosedTabStore(db_path)
+    assert reopened.pop() == (False, [tab(0)])
+    reopened.conn.close()
+
+
+def test_nothing_is_pushed_for_no_tabs(store):
+    store.push([])
+
+    assert store.count() == 0
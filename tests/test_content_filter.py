@@ -0,0 +1,145 @@
+import json
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+RULES = """! Title: test list
+[Adblock Plus 2.0]
+||ads.example^
+||tracker.example/pixel.gif
+/banner/*/ad.
+|https://cdn.example/ads.js|
+@@||ads.example/allowed^
+||thirdparty.example^$third-party
+||scripts.example^$script
+||social.example^$domain=news.example|~sports.news.example
+example.com##.sidebar-ad
+/^regex-rule$/
+||unknown.example^$rewrite=abp-resource:blank-js
+"""
+
+
+@pytest.fixture
+def content_filter(tmp_path):
+    filter_list = tmp_path / 'list.txt'
+    filter_list.write_text(RULES)
+    content_filter = homiBrowser.ContentFilter([str(filter_list)], str(tmp_path / 'cache.pickle'))
+    content_filter.load()
+    return content_filter
+
+
+def blocks(content_filter, url, first_party='page.example', resource_type='script'):
+    host = url.split('/')[2]
+    return content_filter.should_block(url, host, first_party, resource_type)
+
+
+def test_rules_are_counted_and_unsupported_lines_skipped(content_filter):
+    assert content_filter.load_stats['source'] == 'lists'
+    assert content_filter.load_stats['rules'] == 8
+    assert content_filter.stats()['allow_rules'] == 1
+
+
+def test_domain_anchor_covers_subdomains(content_filter):
+    assert blocks(content_filter, "https://ads.example/a.js")
+    assert blocks(content_filter, "https://eu.ads.example/a.js")
+    assert not blocks(content_filter, "https://badads.example/a.js")
+
+
+def test_domain_anchor_with_path(content_filter):
+    assert blocks(content_filter, "https://tracker.example/pixel.gif?id=1", resource_type='image')
+    assert not blocks(content_filter, "https://tracker.example/logo.gif", resource_type='image')
+
+
+def test_wildcards_and_start_end_anchors(content_filter):
+    assert blocks(content_filter, "https://cdn.example/banner/top/ad.png", resource_type='image')
+    assert blocks(content_filter, "https://cdn.example/ads.js")
+    assert not blocks(content_filter, "https://cdn.example/ads.js?v=2")
+
+
+def test_exception_rules_win(content_filter):
+    assert not blocks(content_filter, "https://ads.example/allowed/x.js")
+
+
+def test_third_party_option(content_filter):
+    assert blocks(content_filter, "https://thirdparty.example/w.js")
+    assert not blocks(content_filter, "https://thirdparty.example/w.js", first_party='www.thirdparty.example')
+
+
+def test_type_option(content_filter):
+    assert blocks(content_filter, "https://scripts.example/app.js", resource_type='script')
+    assert not blocks(content_filter, "https://scripts.example/logo.png", resource_type='image')
+
+
+def test_top_level_documents_are_not_blocked_by_default(content_filter):
+    assert not blocks(content_filter, "https://ads.example/", resource_type='document')
+
+
+def test_domain_option(content_filter):
+    assert blocks(content_filter, "https://social.example/like.js", first_party='news.example')
+    assert blocks(content_filter, "https://social.example/like.js", first_party='www.news.example')
+    assert not blocks(content_filter, "https://social.example/like.js", first_party='sports.news.example')
+    assert not blocks(content_filter, "https://social.example/like.js", first_party='blog.example')
+
+
+def test_disabled_or_unloaded_filter_blocks_nothing(content_filter):
+    content_filter.enabled = False
+    assert not blocks(content_filter, "https://ads.example/a.js")
+    assert not blocks(homiBrowser.ContentFilter([]), "https://ads.example/a.js")
+
+
+def test_compiled_rules_are_cached_until_a_list_changes(tmp_path, content_filter):
+    cached = homiBrowser.ContentFilter(content_filter.list_paths, content_filter.cache_path)
+    cached.load()
+    assert cached.load_stats['source'] == 'cache'
+    assert blocks(cached, "https://ads.example/a.js")
+    assert not blocks(cached, "https://ads.example/allowed/x.js")
+
+    (tmp_path / 'list.txt').write_text(RULES + "||more.example^\n")
+    reloaded = homiBrowser.ContentFilter(content_filter.list_paths, content_filter.cache_path)
+    reloaded.load()
+    assert reloaded.load_stats['source'] == 'lists'
+    assert blocks(reloaded, "https://more.example/a.js")
+
+
+def test_cache_holds_plain_data(content_filter):
+    with open(content_filter.cache_path, encoding='utf-8') as cache:
+        cached = json.load(cache)
+
+    assert cached['key'] == content_filter.cache_key()
+    assert cached['stats']['rules'] == 8
+    assert ["||ads.example^", None, content_filter.DEFAULT_TYPES, None, None, None, False] in \
+        cached['block']['domains']['ads.example']
+
+
+@pytest.mark.parametrize('damage', [
+    b"",
+    b'{"key": [2, ["/x", 1',
+    b"not json at all",
+    b'{"key": null}',
+    b"\x80\x04\x95\x00\x00\x00\x00\x00\x00\x00\x00N.",
+])
+def test_damaged_cache_is_a_miss(content_filter, damage):
+    with open(content_filter.cache_path, 'wb') as cache:
+        cache.write(damage)
+
+    reloaded = homiBrowser.ContentFilter(content_filter.list_paths, content_filter.cache_path)
+    reloaded.load()
+
+    assert reloaded.load_stats['source'] == 'lists'
+    assert blocks(reloaded, "https://ads.example/a.js")
+
+
+def test_cache_with_bad_rules_is_a_miss(content_filter):
+    with open(content_filter.cache_path, encoding='utf-8') as cache:
+        cached = json.load(cache)
+    cached['block']['generic'] = [["x", {"not": "a pattern"}, 1, None, None, None, False]]
+    with open(content_filter.cache_path, 'w', encoding='utf-8') as cache:
+        json.dump(cached, cache)
+
+    reloaded = homiBrowser.ContentFilter(content_filter.list_paths, content_filter.cache_path)
+    reloaded.load()
+
+    assert reloaded.load_stats['source'] == 'lists'
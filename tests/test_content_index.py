@@ -0,0 +1,127 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+def index(db_path, pages, **options):
+    indexer = homiBrowser.ContentIndexer(db_path, flush_interval=60, **options)
+    for url, title, text in pages:
+        indexer.record(url, title, text)
+    indexer.stop()
+    return indexer
+
+
+def search(db_path, text, limit=50):
+    conn = sqlite3.connect(db_path)
+    try:
+        return homiBrowser.ContentIndexer.search(conn, text, limit)
+    finally:
+        conn.close()
+
+
+def count(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+PAGES = [
+    ("https://a.example/", "Sourdough basics", "Feed the starter twice a day and bake when it doubles."),
+    ("https://b.example/", "Bread hydration", "Hydration is the ratio of water to flour in sourdough bread."),
+    ("https://c.example/", "Cast iron care", "Season the pan with a thin layer of oil."),
+]
+
+
+def test_pages_are_found_by_their_words(db_path):
+    index(db_path, PAGES)
+
+    results = search(db_path, "sourdough")
+    assert [url for _, url, _, _ in results] == ["https://a.example/", "https://b.example/"]
+    assert search(db_path, "water flour")[0][2] == "Hydration is the ratio of [water] to [flour] in sourdough bread."
+    assert search(db_path, "pan oil")[0][0] == "Cast iron care"
+    assert search(db_path, "sour") == []
+
+
+@pytest.mark.parametrize('text', ["", "  ", "!!!", '"'])
+def test_queries_without_words_match_nothing(db_path, text):
+    index(db_path, PAGES)
+
+    assert search(db_path, text) == []
+
+
+def test_quotes_and_operators_are_matched_as_words(db_path):
+    index(db_path, [("https://a.example/", "Query", 'Use NOT and OR "carefully" near(x)')])
+
+    assert len(search(db_path, 'NOT "carefully')) == 1
+    assert search(db_path, "AND NEAR") != []
+
+
+def test_identical_text_is_stored_once(db_path):
+    indexer = index(db_path, [
+        ("https://a.example/?utm_source=x", "A", "Same   text\nhere"),
+        ("https://a.example/", "A", "Same text here"),
+    ])
+
+    assert count(db_path, 'page_text') == 1
+    assert count(db_path, 'page_text_urls') == 2
+    assert indexer.stats()['indexed'] == 1
+
+
+def test_changed_text_replaces_the_old_copy(db_path):
+    index(db_path, [("https://a.example/", "A", "first version")])
+    index(db_path, [("https://a.example/", "A", "second version")])
+
+    assert search(db_path, "first") == []
+    assert len(search(db_path, "second")) == 1
+    assert count(db_path, 'page_text') == 1
+
+
+def test_unchanged_text_is_not_rewritten(db_path):
+    index(db_path, [("https://a.example/", "A", "same text")])
+    indexer = index(db_path, [("https://a.example/", "A", "same text")])
+
+    assert (indexer.stats()['indexed'], indexer.stats()['unchanged']) == (0, 1)
+
+
+def test_oldest_pages_are_evicted_past_the_limit(db_path):
+    index(db_path, PAGES[:1])
+    indexer = index(db_path, PAGES[1:], max_pages=2)
+
+    assert indexer.stats()['evicted'] == 1
+    assert [url for _, url, _, _ in search(db_path, "sourdough")] == ["https://b.example/"]
+    assert count(db_path, 'page_text_urls') == 2
+
+
+def test_text_is_cut_at_max_chars(db_path):
+    index(db_path, [("https://a.example/", "A", "kept " * 10 + "dropped")], max_chars=50)
+
+    assert search(db_path, "dropped") == []
+    assert len(search(db_path, "kept")) == 1
+
+
+def test_disabled_or_stopped_indexer_records_nothing(db_path):
+    disabled = index(db_path, PAGES, enabled=False)
+    assert disabled.stats()['dropped'] == 3
+    disabled.record("https://late.example/", "Late", "text")
+
+    assert count(db_path, 'page_text') == 0
+    assert disabled.stats()['dropped'] == 4
+
+
+def test_queue_keeps_the_latest_text_per_url(db_path):
+    indexer = homiBrowser.ContentIndexer(db_path, flush_interval=60, max_pending=1)
+    indexer.record("https://a.example/", "A", "old")
+    indexer.record("https://a.example/", "A", "new")
+    indexer.record("https://b.example/", "B", "other")
+    indexer.record("https://a.example/", "A", None)
+    indexer.stop()
+
+    assert indexer.stats()['dropped'] == 1
+    assert search(db_path, "old") == []
+    assert len(search(db_path, "new")) == 1
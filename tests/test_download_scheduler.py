@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QObject, QUrl, pyqtSignal  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+BODY = b"0123456789" * 1000
+
+
+class FileServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FileRequestHandler)
+        self.lock = threading.Lock()
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requested.append(self.path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            # Long enough for every download the scheduler lets run to overlap.
+            time.sleep(0.1)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeDownload(QObject):
+    # Stands in for QWebEngineDownloadItem: the transfer is a plain HTTP GET
+    # that starts once the download is accepted and not paused.
+    finished = pyqtSignal()
+
+    next_id = 0
+
+    def __init__(self, url, resumed):
+        super().__init__()
+        FakeDownload.next_id += 1
+        self._id = FakeDownload.next_id
+        self._url = url
+        self.directory = None
+        self.accepted = False
+        self.paused = False
+        self.thread = None
+        self.received = 0
+        self.reported = False
+        self.resumed = resumed
+
+    def id(self):
+        return self._id
+
+    def url(self):
+        return QUrl(self._url)
+
+    def setDownloadDirectory(self, directory):
+        self.directory = directory
+
+    def downloadDirectory(self):
+        return self.directory
+
+    def downloadFileName(self):
+        return self._url.rsplit('/', 1)[1]
+
+    def totalBytes(self):
+        return len(BODY)
+
+    def receivedBytes(self):
+        return self.received
+
+    def state(self):
+        return homiBrowser.QWebEngineDownloadItem.DownloadCompleted
+
+    def accept(self):
+        self.accepted = True
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        self.resumed.append(self.downloadFileName())
+
+    def cancel(self):
+        pass
+
+    def fetch(self):
+        with urllib.request.urlopen(self._url) as response:
+            data = response.read()
+        with open(os.path.join(self.directory, self.downloadFileName()), 'wb') as output:
+            output.write(data)
+        self.received = len(data)
+
+    def tick(self):
+        if self.accepted and not self.paused and self.thread is None:
+            self.thread = threading.Thread(target=self.fetch)
+            self.thread.start()
+        if self.thread is not None and not self.thread.is_alive() and not self.reported:
+            self.reported = True
+            self.finished.emit()
+
+
+def run_until(qapp, downloads, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "downloads did not finish"
+        for download in downloads:
+            download.tick()
+        qapp.processEvents()
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def scheduler(qapp, db_path, tmp_path):
+    scheduler = homiBrowser.DownloadScheduler(db_path, max_concurrent=2, download_dir=str(tmp_path / 'downloads'))
+    yield scheduler
+    scheduler.refresh_timer.stop()
+    scheduler.conn.close()
+
+
+def start(scheduler, server, names):
+    host, port = server.server_address
+    # Queued downloads start when the scheduler resumes them.
+    resumed = []
+    downloads = [FakeDownload(f"http://{host}:{port}/{name}", resumed) for name in names]
+    jobs = [scheduler.handle_request(download) for download in downloads]
+    return downloads, jobs, resumed
+
+
+def test_no_more_than_the_limit_run_at_once(qapp, scheduler, server, db_path, tmp_path):
+    names = [f"file{i}.bin" for i in range(5)]
+    downloads, jobs, _ = start(scheduler, server, names)
+
+    assert [job.state for job in jobs] == ['active', 'active', 'queued', 'queued', 'queued']
+    run_until(qapp, downloads, lambda: all(job.state == 'completed' for job in jobs))
+
+    assert server.max_in_flight == 2
+    assert sorted(server.requested) == sorted("/" + name for name in names)
+    for name in names:
+        assert (tmp_path / 'downloads' / name).read_bytes() == BODY
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT state, received FROM downloads ORDER BY id").fetchall() == \
+            [('completed', len(BODY))] * 5
+    finally:
+        conn.close()
+
+
+def test_queued_downloads_start_in_order_and_prioritized_ones_first(qapp, scheduler, server):
+    downloads, jobs, resumed = start(scheduler, server, ["a", "b", "c", "d", "e"])
+    scheduler.prioritize(jobs[4])
+
+    run_until(qapp, downloads, lambda: all(job.state == 'completed' for job in jobs))
+
+    assert sorted(server.requested[:2]) == ["/a", "/b"]
+    assert resumed == ["e", "c", "d"]
+
+
+def test_paused_download_gives_its_slot_to_the_next_in_queue(qapp, scheduler, server):
+    downloads, jobs, resumed = start(scheduler, server, ["a", "b", "c"])
+    scheduler.pause(jobs[0])
+
+    assert [job.state for job in jobs] == ['paused', 'active', 'active']
+    run_until(qapp, downloads, lambda: jobs[1].state == jobs[2].state == 'completed')
+    assert server.requested.count("/a") == 0
+    assert resumed == ["c"]
+
+    scheduler.resume(jobs[0])
+    run_until(qapp, downloads, lambda: jobs[0].state == 'completed')
+    assert server.requested[-1] == "/a"
+    assert server.max_in_flight == 2
+
+
+def test_the_same_download_is_only_taken_once(qapp, scheduler, server):
+    downloads, jobs, _ = start(scheduler, server, ["a"])
+
+    assert scheduler.handle_request(downloads[0]) is None
+    assert scheduler.jobs == jobs
@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtGui import QColor, QIcon, QPixmap  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+def solid_icon(color):
+    pixmap = QPixmap(16, 16)
+    pixmap.fill(QColor(color))
+    return QIcon(pixmap)
+
+
+def color_of(icon):
+    return icon.pixmap(16, 16).toImage().pixelColor(8, 8).name()
+
+
+@pytest.fixture
+def make_store(qapp, db_path):
+    stores = []
+
+    def make_store(**options):
+        store = homiBrowser.FaviconStore(db_path, flush_interval=60, **options)
+        stores.append(store)
+        return store
+
+    yield make_store
+    for store in stores:
+        store.stop()
+
+
+def stored(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return (conn.execute("SELECT COUNT(*) FROM favicons").fetchone()[0],
+                conn.execute("SELECT page_url FROM favicon_pages ORDER BY page_url").fetchall())
+    finally:
+        conn.close()
+
+
+def test_icons_are_served_before_and_after_they_are_written(make_store):
+    store = make_store()
+    store.store("https://example.com/a", solid_icon('#ff0000'))
+    assert color_of(store.icon("https://example.com/a")) == '#ff0000'
+    store.stop()
+
+    reopened = make_store()
+    assert color_of(reopened.icon("https://example.com/a")) == '#ff0000'
+    assert reopened.icon("https://other.example/").isNull()
+
+
+def test_pages_fall_back_to_their_hosts_icon(make_store):
+    store = make_store()
+    assert store.icon("https://example.com/never-seen").isNull()
+
+    store.store("https://example.com/a", solid_icon('#00ff00'))
+
+    # The remembered miss is forgotten once the host has an icon.
+    assert color_of(store.icon("https://example.com/never-seen")) == '#00ff00'
+    assert store.icon("https://elsewhere.example/").isNull()
+
+
+def test_each_image_is_stored_and_decoded_once(make_store, db_path):
+    store = make_store()
+    for n in range(5):
+        store.store(f"https://example.com/{n}", solid_icon('#0000ff'))
+    store.stop()
+    assert stored(db_path)[0] == 1
+
+    reopened = make_store()
+    for n in range(5):
+        reopened.icon(f"https://example.com/{n}")
+        reopened.icon(f"https://example.com/{n}")
+    stats = reopened.stats()
+    assert (stats['decoded'], stats['hits'], stats['queries']) == (1, 9, 5)
+
+
+def test_old_pages_and_unused_images_are_trimmed(make_store, db_path):
+    store = make_store(max_pages=2)
+    store.store("https://a.example/", solid_icon('#111111'))
+    store.stop()
+    store = make_store(max_pages=2)
+    store.store("https://b.example/", solid_icon('#222222'))
+    store.store("https://c.example/", solid_icon('#333333'))
+    store.stop()
+
+    count, pages = stored(db_path)
+    assert len(pages) == 2
+    assert count == 2
+
+
+def test_decoded_icons_are_bounded(make_store):
+    store = make_store(capacity=2)
+    for n, color in enumerate(['#010101', '#020202', '#030303']):
+        store.store(f"https://{n}.example/", solid_icon(color))
+
+    assert store.stats()['icons'] == 2
+
+
+def test_clear_forgets_everything(make_store, db_path):
+    store = make_store()
+    store.store("https://example.com/", solid_icon('#ff0000'))
+    store.stop()
+    store = make_store()
+    assert not store.icon("https://example.com/").isNull()
+    store.store("https://example.com/pending", solid_icon('#00ff00'))
+
+    store.clear()
+
+    assert store.icon("https://example.com/").isNull()
+    store.stop()
+    assert stored(db_path) == (0, [])
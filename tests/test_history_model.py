@@ -0,0 +1,111 @@
+import sqlite3
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+@pytest.fixture
+def history_db(db_path):
+    # Ten visits over three URLs; pairs of visits share a timestamp, which
+    # paging has to break on the visit id.
+    conn = homiBrowser.connect_database(db_path)
+    with conn:
+        conn.executemany("INSERT INTO urls (id, url, title) VALUES (?, ?, ?)", [
+            (1, "https://a.example/", "Alpha"), (2, "https://b.example/", "Beta"), (3, "https://c.example/", None),
+        ])
+        conn.executemany("INSERT INTO visits (url_id, visited_at) VALUES (?, ?)",
+                         [(i % 3 + 1, 1700000000 + i // 2) for i in range(10)])
+    conn.close()
+    return db_path
+
+
+def visit_ids(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT id FROM visits ORDER BY visited_at DESC, id DESC")]
+    finally:
+        conn.close()
+
+
+def test_loader_pages_run_newest_first_without_gaps(history_db):
+    loader = homiBrowser.HistoryPageLoader(history_db)
+    pages = []
+    loader.page_loaded.connect(lambda generation, rows: pages.append(rows))
+    after = None
+    while not pages or len(pages[-1]) == 3:
+        loader.load_page(0, after, 3)
+        if pages[-1]:
+            after = (pages[-1][-1][3], pages[-1][-1][0])
+    loader.close()
+
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert [row[0] for page in pages for row in page] == visit_ids(history_db)
+
+
+def wait_for(qapp, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        qapp.processEvents()
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def model(qapp, history_db):
+    model = homiBrowser.HistoryModel(history_db, page_size=4)
+    yield model
+    model.shutdown()
+    homiBrowser.FaviconStore.instances.pop(history_db).stop()
+
+
+def test_model_fetches_a_page_at_a_time(qapp, model):
+    assert model.rowCount() == 0 and model.canFetchMore()
+
+    model.fetchMore()
+    model.fetchMore()
+    wait_for(qapp, lambda: not model.loading)
+    assert model.rowCount() == 4
+
+    while model.canFetchMore():
+        model.fetchMore()
+        wait_for(qapp, lambda: not model.loading)
+
+    assert model.rowCount() == 10
+    assert model.url_at(0) == "https://a.example/"
+    assert model.data(model.index(1, 0)) == "Untitled"
+    assert model.data(model.index(2, 0)) == "Beta"
+
+
+def test_pages_requested_before_a_clear_are_dropped(qapp, model):
+    model.fetchMore()
+    model.clear()
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+
+    assert model.rowCount() == 0
+    assert not model.canFetchMore()
+
+
+def test_clearing_history_keeps_the_full_text_index_working(history_db):
+    conn = homiBrowser.connect_database(history_db)
+    homiBrowser.clear_history_tables(conn, homiBrowser.HISTORY_TABLES)
+
+    assert conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM urls_fts WHERE urls_fts MATCH 'alpha'").fetchone()[0] == 0
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert {'urls_fts_delete', 'page_text_fts_delete'} <= triggers
+
+    with conn:
+        conn.execute("INSERT INTO urls (url, title) VALUES ('https://d.example/', 'Delta')")
+        conn.execute("DELETE FROM urls WHERE url = 'https://d.example/'")
+        conn.execute("INSERT INTO urls (url, title) VALUES ('https://e.example/', 'Epsilon')")
+    assert conn.execute("SELECT rowid FROM urls_fts WHERE urls_fts MATCH 'delta'").fetchall() == []
+    assert len(conn.execute("SELECT rowid FROM urls_fts WHERE urls_fts MATCH 'epsilon'").fetchall()) == 1
+    conn.execute("INSERT INTO urls_fts (urls_fts) VALUES ('integrity-check')")
+    conn.close()
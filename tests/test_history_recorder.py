@@ -0,0 +1,109 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+def history(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        urls = conn.execute("SELECT url, title, visit_count FROM urls ORDER BY id").fetchall()
+        visits = conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0]
+        return urls, visits
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def recorder(db_path):
+    # Nothing is written before stop(), so every test sees the whole batch.
+    recorder = homiBrowser.HistoryRecorder(db_path, flush_interval=60, collapse_window=60)
+    yield recorder
+    recorder.stop()
+
+
+def test_visits_are_written_in_one_batch_on_stop(recorder, db_path):
+    recorder.record("A", "https://a.example/", source=1)
+    recorder.record("B", "https://b.example/", source=2)
+    assert recorder.stats()['pending'] == 2
+    assert history(db_path) == ([], 0)
+
+    recorder.stop()
+
+    assert history(db_path) == ([("https://a.example/", "A", 1), ("https://b.example/", "B", 1)], 2)
+    assert recorder.stats() == {'queued': 2, 'flushed': 2, 'dropped': 0, 'pending': 0}
+
+
+def test_redirects_in_a_tab_collapse_into_the_last_url(recorder, db_path):
+    recorder.record("", "http://example.com/", source=1)
+    recorder.record("", "https://example.com/", source=1)
+    recorder.record("Example", "https://www.example.com/", source=1)
+    recorder.stop()
+
+    assert history(db_path) == ([("https://www.example.com/", "Example", 1)], 1)
+
+
+def test_a_new_tab_does_not_collapse_into_a_closed_one(recorder, db_path):
+    # Views get a fresh history_source each, where id() can repeat once the
+    # first view is gone.
+    recorder.record("First", "https://first.example/", source=7)
+    recorder.record("Second", "https://second.example/", source=8)
+    recorder.stop()
+
+    assert [url for url, _, _ in history(db_path)[0]] == ["https://first.example/", "https://second.example/"]
+
+
+def test_repeated_url_counts_once_and_takes_the_late_title(recorder, db_path):
+    recorder.record("", "https://example.com/", source=1)
+    recorder.record("", "https://example.com/", source=2)
+    recorder.record_title("https://example.com/", "Example Domain")
+    recorder.stop()
+
+    assert history(db_path) == ([("https://example.com/", "Example Domain", 1)], 1)
+
+
+def test_discarded_visits_are_never_written(recorder, db_path):
+    recorder.record("A", "https://a.example/", source=1)
+    recorder.discard_pending()
+    recorder.stop()
+
+    assert history(db_path) == ([], 0)
+    assert recorder.stats()['dropped'] == 1
+
+
+def test_full_queue_and_late_visits_are_dropped(db_path):
+    recorder = homiBrowser.HistoryRecorder(db_path, flush_interval=60, collapse_window=60, max_pending=1)
+    recorder.record("A", "https://a.example/")
+    recorder.record("B", "https://b.example/")
+    recorder.stop()
+    recorder.record("C", "https://c.example/")
+
+    assert history(db_path)[1] == 1
+    assert recorder.stats()['dropped'] == 2
+
+
+def test_separate_recorders_add_to_the_visit_count(db_path):
+    for _ in range(2):
+        recorder = homiBrowser.HistoryRecorder(db_path, flush_interval=60)
+        recorder.record("A", "https://a.example/")
+        recorder.stop()
+
+    assert history(db_path) == ([("https://a.example/", "A", 2)], 2)
+
+
+class FakeProfiles:
+    def create_page(self, private, parent):
+        return homiBrowser.QWebEnginePage(parent)
+
+
+def test_every_view_gets_its_own_history_source(qapp, monkeypatch):
+    monkeypatch.setattr(homiBrowser.ProfileManager, 'shared', classmethod(lambda cls: FakeProfiles()))
+    first = homiBrowser.CustomWebEngineView()
+    source = first.history_source
+    first.deleteLater()
+    del first
+
+    assert homiBrowser.CustomWebEngineView().history_source > source
@@ -0,0 +1,154 @@
+import json
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+def stored(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        visits = conn.execute('''SELECT u.url, u.title, v.visited_at FROM visits v JOIN urls u ON u.id = v.url_id
+                                 ORDER BY v.visited_at''').fetchall()
+        bookmarks = conn.execute("SELECT url, title FROM bookmarks ORDER BY id").fetchall()
+        return visits, bookmarks
+    finally:
+        conn.close()
+
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as output:
+        for record in records:
+            output.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def firefox_places(tmp_path):
+    path = str(tmp_path / 'places.sqlite')
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript('''
+            CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT, title TEXT);
+            CREATE TABLE moz_historyvisits (id INTEGER PRIMARY KEY, place_id INTEGER, visit_date INTEGER);
+            CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER, title TEXT);
+            INSERT INTO moz_places VALUES (1, 'https://example.com/', 'Example'),
+                                          (2, 'https://python.org/', 'Python'),
+                                          (3, 'place:sort=8', NULL);
+            INSERT INTO moz_historyvisits VALUES (1, 1, 1700000000000000), (2, 2, NULL),
+                                                 (3, 2, 1700000100000000), (4, 3, 1700000200000000);
+            INSERT INTO moz_bookmarks VALUES (1, 1, 2, 'Python home'), (2, 2, NULL, 'Folder');
+        ''')
+    conn.close()
+    return path
+
+
+def test_firefox_visits_without_a_date_are_skipped(db_path, firefox_places):
+    importer = homiBrowser.BrowserDataImporter(db_path)
+
+    assert importer.detect_format(firefox_places) == 'firefox'
+    result = importer.run(firefox_places)
+
+    visits, bookmarks = stored(db_path)
+    assert visits == [("https://example.com/", "Example", 1700000000), ("https://python.org/", "Python", 1700000100)]
+    assert bookmarks == [("https://python.org/", "Python home")]
+    assert (result['read'], result['visits'], result['bookmarks'], result['skipped']) == (4, 2, 1, 1)
+
+
+def test_chromium_visits_without_a_time_are_skipped(db_path, tmp_path):
+    path = str(tmp_path / 'History')
+    conn = sqlite3.connect(path)
+    visit_time = (1700000000 + homiBrowser.CHROMIUM_EPOCH_OFFSET) * 1000000
+    with conn:
+        conn.executescript(f'''
+            CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT);
+            CREATE TABLE visits (id INTEGER PRIMARY KEY, url INTEGER, visit_time INTEGER);
+            INSERT INTO urls VALUES (1, 'https://example.com/', 'Example');
+            INSERT INTO visits VALUES (1, 1, {visit_time}), (2, 1, NULL);
+        ''')
+    conn.close()
+
+    result = homiBrowser.BrowserDataImporter(db_path).run(path)
+
+    assert result['format'] == 'chromium-history'
+    assert stored(db_path)[0] == [("https://example.com/", "Example", 1700000000)]
+
+
+def test_only_known_schemes_are_imported(db_path, tmp_path):
+    path = str(tmp_path / 'data.jsonl')
+    write_jsonl(path, [{'type': 'bookmark', 'url': url, 'title': None}
+                       for url in ["HTTPS://Example.com/", "httpx", "httpsx://example.com/", "javascript:void(0)",
+                                   "ftp://files.example/"]])
+
+    result = homiBrowser.BrowserDataImporter(db_path).run(path)
+
+    assert [url for url, _ in stored(db_path)[1]] == ["HTTPS://Example.com/", "ftp://files.example/"]
+    assert result['skipped'] == 3
+
+
+def test_exported_jsonl_imports_into_another_profile(db_path, tmp_path):
+    source = str(tmp_path / 'source.jsonl')
+    write_jsonl(source, [
+        {'type': 'visit', 'url': "https://example.com/", 'title': "Example", 'visited_at': 1700000000},
+        {'type': 'visit', 'url': "https://example.com/", 'title': "Example", 'visited_at': 1700000500},
+        {'type': 'visit', 'url': "https://python.org/", 'title': "Python", 'visited_at': 1700000100},
+        {'type': 'bookmark', 'url': "https://python.org/", 'title': "Python home"},
+        {'type': 'visit', 'url': "https://broken.example/", 'visited_at': None},
+    ])
+    homiBrowser.BrowserDataImporter(db_path).run(source)
+
+    exported = str(tmp_path / 'export.jsonl')
+    result = homiBrowser.BrowserDataExporter(db_path).run(exported)
+    assert result['written'] == 4
+
+    other = str(tmp_path / 'other.db')
+    conn = homiBrowser.connect_database(other)
+    homiBrowser.migrate_database(conn)
+    conn.close()
+    homiBrowser.BrowserDataImporter(other).run(exported)
+
+    assert stored(other) == stored(db_path)
+    # Importing the same file again adds nothing.
+    again = homiBrowser.BrowserDataImporter(other).run(exported)
+    assert (again['visits'], again['bookmarks'], again['skipped']) == (0, 0, 4)
+
+
+def test_bookmarks_export_as_html_and_import_back(db_path, tmp_path):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("INSERT INTO bookmarks (title, url) VALUES (?, ?)", ("Q&A <forum>", "https://example.com/?a=1&b=2"))
+    conn.close()
+    exported = str(tmp_path / 'bookmarks.html')
+    homiBrowser.BrowserDataExporter(db_path).run(exported)
+
+    other = str(tmp_path / 'other.db')
+    conn = homiBrowser.connect_database(other)
+    homiBrowser.migrate_database(conn)
+    conn.close()
+    importer = homiBrowser.BrowserDataImporter(other)
+    assert importer.detect_format(exported) == 'netscape-html'
+    importer.run(exported)
+
+    assert stored(other)[1] == [("https://example.com/?a=1&b=2", "Q&A <forum>")]
+
+
+class FailingJob:
+    progress = None
+
+    def run(self, path):
+        raise TypeError("unsupported operand type(s) for //: 'NoneType' and 'int'")
+
+
+def test_worker_reports_any_failure(qapp):
+    worker = homiBrowser.BrowserDataWorker(FailingJob(), "places.sqlite")
+    failed = []
+    finished = []
+    worker.failed.connect(failed.append)
+    worker.finished.connect(finished.append)
+
+    worker.run()
+
+    assert failed == ["unsupported operand type(s) for //: 'NoneType' and 'int'"]
+    assert finished == []
@@ -0,0 +1,154 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QUrl  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+@pytest.mark.parametrize('values, fraction, expected', [
+    (list(range(1, 11)), 0.95, 10),
+    (list(range(1, 11)), 0.5, 5),
+    (list(range(1, 11)), 0.1, 1),
+    (list(range(1, 101)), 0.99, 99),
+    (list(range(1, 101)), 0.07, 7),
+    (list(range(1, 21)), 0.95, 19),
+    ([3.0], 0.95, 3.0),
+    ([5, 1, 4, 2, 3], 0.0, 1),
+    ([5, 1, 4, 2, 3], 1.0, 5),
+])
+def test_percentile_is_nearest_rank(values, fraction, expected):
+    assert homiBrowser.percentile(values, fraction) == expected
+
+
+def loads(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT url, ok, wall_ms, ttfb_ms FROM page_loads ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def entry(url, **fields):
+    return dict({'url': url, 'domain': 'example.com', 'started_at': 0, 'ok': 1, 'wall_ms': 10.0}, **fields)
+
+
+def test_recorder_writes_pending_loads_on_stop(db_path):
+    recorder = homiBrowser.LoadTimingRecorder(db_path, flush_interval=60)
+    recorder.record(entry("https://example.com/a", ttfb_ms=5.0))
+    recorder.record(entry("https://example.com/b", ok=0))
+    recorder.stop()
+
+    assert loads(db_path) == [("https://example.com/a", 1, 10.0, 5.0), ("https://example.com/b", 0, 10.0, None)]
+
+
+def test_recorder_keeps_only_the_newest_records(db_path):
+    recorder = homiBrowser.LoadTimingRecorder(db_path, max_records=3, flush_interval=60)
+    for i in range(5):
+        recorder.record(entry(f"https://example.com/{i}"))
+    recorder.stop()
+
+    assert [row[0] for row in loads(db_path)] == [f"https://example.com/{i}" for i in (2, 3, 4)]
+
+
+def test_recorder_drops_loads_beyond_its_queue_and_after_stop(db_path):
+    recorder = homiBrowser.LoadTimingRecorder(db_path, flush_interval=60, max_pending=2)
+    for i in range(3):
+        recorder.record(entry(f"https://example.com/{i}"))
+    recorder.stop()
+    recorder.record(entry("https://example.com/late"))
+
+    assert recorder.dropped == 2
+    assert len(loads(db_path)) == 2
+
+
+class FakeRecorder:
+    def __init__(self):
+        self.entries = []
+
+    def record(self, entry):
+        self.entries.append(entry)
+
+
+class FakeProfile:
+    def __init__(self, private):
+        self.private = private
+
+    def isOffTheRecord(self):
+        return self.private
+
+
+class FakePage:
+    def __init__(self, private, timing):
+        self.private = private
+        self.timing = timing
+        self.scripts = 0
+
+    def profile(self):
+        return FakeProfile(self.private)
+
+    def runJavaScript(self, script, world, callback):
+        self.scripts += 1
+        callback(self.timing)
+
+
+class FakeView:
+    def __init__(self, url, private=False, timing=None):
+        self._url = QUrl(url)
+        self._page = FakePage(private, timing)
+
+    def url(self):
+        return self._url
+
+    def page(self):
+        return self._page
+
+
+def load(monitor, view, ok=True):
+    monitor.on_load_started(view)
+    monitor.on_load_progress(view, 0)
+    monitor.on_load_progress(view, 30)
+    monitor.on_load_finished(view, ok)
+
+
+def test_monitor_records_navigation_timing():
+    recorder = FakeRecorder()
+    monitor = homiBrowser.LoadTimingMonitor(recorder)
+    timing = {'ttfb': 12.5, 'domContentLoaded': 40.0, 'loadEvent': 55.0, 'transferSize': 2048,
+              'resourceCount': 3, 'resourceBytes': 4096}
+
+    load(monitor, FakeView("https://Example.com/page", timing=timing))
+
+    [recorded] = recorder.entries
+    assert recorded['url'] == "https://example.com/page"
+    assert recorded['domain'] == "example.com"
+    assert recorded['ok'] == 1
+    assert recorded['first_progress_ms'] is not None
+    assert recorded['wall_ms'] >= recorded['first_progress_ms']
+    assert (recorded['ttfb_ms'], recorded['load_event_ms'], recorded['resource_bytes']) == (12.5, 55.0, 4096)
+
+
+def test_monitor_records_failed_loads_without_asking_the_page():
+    recorder = FakeRecorder()
+    monitor = homiBrowser.LoadTimingMonitor(recorder)
+    view = FakeView("https://example.com/")
+
+    load(monitor, view, ok=False)
+
+    assert [recorded['ok'] for recorded in recorder.entries] == [0]
+    assert view.page().scripts == 0
+
+
+def test_monitor_skips_private_and_non_web_pages():
+    recorder = FakeRecorder()
+    monitor = homiBrowser.LoadTimingMonitor(recorder)
+
+    load(monitor, FakeView("https://example.com/", private=True, timing={}))
+    load(monitor, FakeView("file:///tmp/page.html", timing={}))
+    monitor.on_load_finished(FakeView("https://example.com/"), True)
+
+    assert recorder.entries == []
+    assert monitor.loads == {}
@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+def tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_fresh_database_reaches_latest_version(tmp_path):
+    conn = homiBrowser.connect_database(str(tmp_path / 'browser.db'))
+    report = homiBrowser.migrate_database(conn)
+
+    assert report['from_version'] == 0
+    assert report['to_version'] == len(homiBrowser.MIGRATIONS)
+    assert conn.execute("SELECT version FROM schema_version").fetchone()[0] == len(homiBrowser.MIGRATIONS)
+    assert {'urls', 'visits', 'bookmarks', 'session_tabs', 'downloads', 'snapshots'} <= tables(conn)
+    assert 'history' not in tables(conn)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_migrating_again_does_nothing(tmp_path):
+    conn = homiBrowser.connect_database(str(tmp_path / 'browser.db'))
+    homiBrowser.migrate_database(conn)
+
+    assert homiBrowser.migrate_database(conn) is None
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == 1
+
+
+def test_legacy_history_is_folded_into_urls_and_visits(tmp_path):
+    conn = homiBrowser.connect_database(str(tmp_path / 'browser.db'))
+    conn.execute("CREATE TABLE bookmarks (id INTEGER PRIMARY KEY, title TEXT, url TEXT)")
+    conn.execute('''CREATE TABLE history
+                    (id INTEGER PRIMARY KEY, title TEXT, url TEXT,
+                     visited_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+    conn.executemany("INSERT INTO history (title, url, visited_at) VALUES (?, ?, ?)", [
+        ("Example", "https://example.com/", "2023-01-01 10:00:00"),
+        ("Example again", "https://example.com/", "2023-01-02 10:00:00"),
+        ("Other", "https://other.example/", "2023-01-03 10:00:00"),
+    ])
+    conn.commit()
+
+    homiBrowser.migrate_database(conn)
+
+    assert 'history' not in tables(conn)
+    urls = dict(conn.execute("SELECT url, visit_count FROM urls"))
+    assert urls == {"https://example.com/": 2, "https://other.example/": 1}
+    assert conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0] == 3
+    assert conn.execute('''SELECT MAX(visited_at) FROM visits v JOIN urls u ON u.id = v.url_id
+                           WHERE u.url = 'https://example.com/' ''').fetchone()[0] == 1672653600
+    assert conn.execute("SELECT rowid FROM urls_fts WHERE urls_fts MATCH 'other'").fetchall()
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    def broken_migration(cursor):
+        cursor.execute("CREATE TABLE half_done (id INTEGER)")
+        raise sqlite3.OperationalError("broken")
+
+    conn = homiBrowser.connect_database(str(tmp_path / 'browser.db'))
+    monkeypatch.setattr(homiBrowser, 'MIGRATIONS', homiBrowser.MIGRATIONS[:2] + [broken_migration])
+
+    with pytest.raises(sqlite3.OperationalError):
+        homiBrowser.migrate_database(conn)
+
+    assert 'half_done' not in tables(conn)
+    assert conn.execute("SELECT version FROM schema_version").fetchone()[0] == 2
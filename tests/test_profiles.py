@@ -0,0 +1,158 @@
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5 import sip  # noqa: E402
+from PyQt5.QtCore import QObject, pyqtSignal  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+class FakeSettings:
+    def __init__(self):
+        self.attributes = {}
+
+    def setAttribute(self, attribute, enabled):
+        self.attributes[attribute] = enabled
+
+
+class FakeProfile(QObject):
+    downloadRequested = pyqtSignal(object)
+
+    DiskHttpCache = 'disk'
+    MemoryHttpCache = 'memory'
+    default = None
+
+    @classmethod
+    def defaultProfile(cls):
+        return cls.default
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = None
+        self.cache_size = None
+        self.handlers = {}
+        self._settings = FakeSettings()
+        self.deleted = False
+
+    def setHttpCacheType(self, cache):
+        self.cache = cache
+
+    def setHttpCacheMaximumSize(self, size):
+        self.cache_size = size
+
+    def settings(self):
+        return self._settings
+
+    def installUrlSchemeHandler(self, scheme, handler):
+        self.handlers[scheme] = handler
+
+    def deleteLater(self):
+        self.deleted = True
+
+
+class FakePage(QObject):
+    def __init__(self, profile, parent=None):
+        super().__init__(parent)
+        self._profile = profile
+        self.interceptor = None
+
+    def profile(self):
+        return self._profile
+
+    def setUrlRequestInterceptor(self, interceptor):
+        self.interceptor = interceptor
+
+
+class FakeRequestFilter:
+    def __init__(self, content_filter, page):
+        self.content_filter = content_filter
+
+
+@pytest.fixture
+def profiles(qapp, monkeypatch):
+    FakeProfile.default = FakeProfile()
+    monkeypatch.setattr(homiBrowser, 'QWebEngineProfile', FakeProfile)
+    monkeypatch.setattr(homiBrowser, 'CustomWebPage', FakePage)
+    monkeypatch.setattr(homiBrowser, 'PageRequestFilter', FakeRequestFilter)
+    monkeypatch.setattr(homiBrowser.ContentFilter, 'shared', classmethod(lambda cls: 'rules'))
+    return homiBrowser.ProfileManager(disk_cache_mb=8, private_cache_mb=2, attributes={'javascript': False})
+
+
+def test_normal_tabs_use_the_default_profile(profiles):
+    page = profiles.create_page()
+
+    assert page.profile() is FakeProfile.default
+    assert (page.profile().cache, page.profile().cache_size) == ('disk', 8 * 2**20)
+    assert page.interceptor.content_filter == 'rules'
+    assert profiles.private is None
+
+
+def test_private_tabs_share_one_in_memory_profile(profiles):
+    first = profiles.create_page(private=True)
+    second = profiles.create_page(private=True)
+
+    assert first.profile() is second.profile() is profiles.private
+    assert first.profile() is not FakeProfile.default
+    assert (first.profile().cache, first.profile().cache_size) == ('memory', 2 * 2**20)
+    assert first.profile().settings().attributes == {'javascript': False}
+    assert profiles.stats()['private_pages'] == 2
+
+
+def test_closing_the_last_private_tab_ends_the_private_session(profiles):
+    first = profiles.create_page(private=True)
+    second = profiles.create_page(private=True)
+    session = profiles.private
+
+    sip.delete(first)
+    assert profiles.private is session and not session.deleted
+    sip.delete(second)
+    assert profiles.private is None and session.deleted
+
+    assert profiles.create_page(private=True).profile() is not session
+    assert profiles.stats()['private_sessions'] == 2
+
+
+def test_scheme_handlers_reach_private_profiles_created_later(profiles):
+    profiles.install_scheme_handler('snapshot', 'handler')
+    profiles.install_scheme_handler('snapshot', 'other')
+    page = profiles.create_page(private=True)
+
+    assert FakeProfile.default.handlers == {b'snapshot': 'handler'}
+    assert page.profile().handlers == {b'snapshot': 'handler'}
+
+
+class FakeDownload:
+    def __init__(self, browser):
+        self.browser = browser
+        self.cancelled = False
+
+    def page(self):
+        return self
+
+    def view(self):
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.downloads = []
+
+    def handle_download(self, download):
+        self.downloads.append(download)
+
+
+def test_claimed_downloads_skip_the_download_manager(profiles):
+    browser = FakeBrowser()
+    claimed = []
+    profiles.add_download_claim(lambda download: download in claimed)
+    kept, passed = FakeDownload(browser), FakeDownload(browser)
+    claimed.append(kept)
+
+    FakeProfile.default.downloadRequested.emit(kept)
+    FakeProfile.default.downloadRequested.emit(passed)
+
+    assert browser.downloads == [passed]
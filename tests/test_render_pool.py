@@ -0,0 +1,193 @@
+import os
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QObject, pyqtSignal  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+class FakePage(QObject):
+    loadFinished = pyqtSignal(bool)
+    pdfPrintingFinished = pyqtSignal(str, bool)
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self.printed = []
+
+    def printToPdf(self, path):
+        self.printed.append(path)
+
+
+class FakeView:
+    def __init__(self):
+        self.loaded = []
+        self.pages = []
+
+    def setAttribute(self, attribute):
+        pass
+
+    def resize(self, size):
+        pass
+
+    def show(self):
+        pass
+
+    def deleteLater(self):
+        pass
+
+    def setPage(self, page):
+        self.pages.append(page)
+
+    def load(self, url):
+        self.loaded.append(url.toString())
+
+
+class FakeProfiles:
+    def create_page(self, private, parent):
+        return FakePage(parent)
+
+
+@pytest.fixture
+def make_pool(qapp, tmp_path, monkeypatch):
+    monkeypatch.setattr(homiBrowser, 'QWebEngineView', FakeView)
+    monkeypatch.setattr(homiBrowser.ProfileManager, 'shared', classmethod(lambda cls: FakeProfiles()))
+    pools = []
+
+    def make_pool(urls, **options):
+        pool = homiBrowser.RenderPool(urls, str(tmp_path), settle_ms=0, **options)
+        pools.append(pool)
+        return pool
+
+    yield make_pool
+    for pool in pools:
+        pool.close()
+
+
+def queued(pool):
+    return [url for _, url in pool.queue]
+
+
+def finish(pool, slot):
+    # A load that succeeds and whose PDF gets written.
+    job = slot['job']
+    slot['page'].loadFinished.emit(True)
+    pool.write_output(slot, job)
+    slot['page'].pdfPrintingFinished.emit(pool.output_path(job), True)
+
+
+URLS = ["https://a.example/", "https://b.example/", "https://c.example/"]
+
+
+def test_each_slot_takes_the_next_url(make_pool):
+    pool = make_pool(URLS, concurrency=2)
+    pool.start()
+
+    assert [slot['view'].loaded for slot in pool.slots] == [[URLS[0]], [URLS[1]]]
+    assert queued(pool) == [URLS[2]]
+
+    finish(pool, pool.slots[1])
+    assert pool.slots[1]['view'].loaded == [URLS[1], URLS[2]]
+    assert [result['url'] for result in pool.results] == [URLS[1]]
+
+
+def test_failed_load_is_retried_after_the_rest_of_the_queue(make_pool):
+    pool = make_pool(URLS, concurrency=1, retries=1)
+    pool.start()
+    slot = pool.slots[0]
+
+    slot['page'].loadFinished.emit(False)
+
+    assert slot['view'].loaded == [URLS[0], URLS[1]]
+    assert queued(pool) == [URLS[2], URLS[0]]
+    assert pool.retried == 1
+    assert pool.results == []
+
+
+def test_url_fails_once_its_retries_are_used_up(make_pool):
+    pool = make_pool(URLS[:1], concurrency=1, retries=1)
+    finished = []
+    pool.finished.connect(lambda: finished.append(True))
+    pool.start()
+    slot = pool.slots[0]
+
+    slot['page'].loadFinished.emit(False)
+    slot['page'].loadFinished.emit(False)
+
+    assert slot['view'].loaded == [URLS[0], URLS[0]]
+    assert len(pool.results) == 1
+    assert pool.results[0]['ok'] is False
+    assert pool.results[0]['error'] == "load failed"
+    assert pool.results[0]['attempts'] == 2
+    assert finished == [True]
+    assert pool.summary()['failed'] == 1
+
+
+def test_timeout_replaces_the_page_and_retries(make_pool):
+    pool = make_pool(URLS[:2], concurrency=1, retries=1, timeout=5)
+    pool.start()
+    slot = pool.slots[0]
+    old_page = slot['page']
+
+    pool.on_timeout(slot)
+
+    assert slot['page'] is not old_page
+    assert slot['view'].pages[-1] is slot['page']
+    assert slot['job']['url'] == URLS[1]
+    assert queued(pool) == [URLS[0]]
+
+    # The abandoned page finishing late is not mistaken for the new job.
+    old_page.loadFinished.emit(True)
+    assert slot['job']['loaded'] is False
+
+
+def test_repeated_load_finished_is_ignored(make_pool):
+    pool = make_pool(URLS[:1], concurrency=1)
+    pool.start()
+    slot = pool.slots[0]
+
+    slot['page'].loadFinished.emit(True)
+    slot['page'].loadFinished.emit(False)
+
+    assert pool.retried == 0
+    assert slot['job']['loaded'] is True
+
+
+def test_pdf_for_another_job_is_ignored(make_pool):
+    pool = make_pool(URLS[:1], concurrency=1)
+    pool.start()
+    slot = pool.slots[0]
+
+    slot['page'].pdfPrintingFinished.emit("/elsewhere.pdf", True)
+    assert pool.results == []
+
+
+def test_pool_finishes_when_every_url_is_written(make_pool):
+    pool = make_pool(URLS, concurrency=2)
+    finished = []
+    pool.finished.connect(lambda: finished.append(True))
+    pool.start()
+
+    finish(pool, pool.slots[0])
+    finish(pool, pool.slots[1])
+    assert finished == []
+    finish(pool, pool.slots[0])
+
+    assert finished == [True]
+    assert sorted(result['url'] for result in pool.results) == URLS
+    assert all(result['ok'] and result['attempts'] == 1 for result in pool.results)
+    assert pool.results[0]['path'].endswith("00001-a.example.pdf")
+    summary = pool.summary()
+    assert (summary['urls'], summary['written'], summary['failed']) == (3, 3, 0)
+
+
+def test_headless_environment_keeps_the_sandbox_unless_asked(monkeypatch):
+    monkeypatch.delenv('QTWEBENGINE_DISABLE_SANDBOX', raising=False)
+
+    homiBrowser.headless_environment()
+    assert 'QTWEBENGINE_DISABLE_SANDBOX' not in os.environ
+
+    homiBrowser.headless_environment(disable_sandbox=True)
+    assert os.environ['QTWEBENGINE_DISABLE_SANDBOX'] == '1'
@@ -0,0 +1,156 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QObject, QUrl, pyqtSignal  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not os.path.exists(f"/proc/{os.getpid()}/stat"), reason="needs /proc")
+
+
+def test_read_process_stats():
+    stats = homiBrowser.read_process_stats(os.getpid())
+
+    assert stats['cpu_seconds'] > 0
+    assert stats['rss'] > 0
+    assert stats['pss'] is None
+    # Kernels before 4.14 have no smaps_rollup.
+    pss = homiBrowser.read_process_stats(os.getpid(), pss=True)['pss']
+    assert pss is None or pss > 0
+
+
+def test_missing_process_has_no_stats():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+
+    assert homiBrowser.read_process_stats(process.pid) is None
+    assert homiBrowser.read_process_memory(process.pid) is None
+
+
+@pytest.fixture
+def renderer():
+    # A busy process standing in for a tab's renderer.
+    process = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+    yield process
+    process.kill()
+    process.wait()
+
+
+class FakeProfile:
+    def __init__(self, private):
+        self.private = private
+
+    def isOffTheRecord(self):
+        return self.private
+
+
+class FakePage:
+    def __init__(self, pid, private):
+        self.pid = pid
+        self._profile = FakeProfile(private)
+
+    def renderProcessPid(self):
+        return self.pid
+
+    def profile(self):
+        return self._profile
+
+
+class FakeView(QObject):
+    renderProcessTerminated = pyqtSignal(object, int)
+
+    def __init__(self, pid, url, title, private=False):
+        super().__init__()
+        self._page = FakePage(pid, private)
+        self._url = QUrl(url)
+        self._title = title
+
+    def page(self):
+        return self._page
+
+    def url(self):
+        return self._url
+
+    def title(self):
+        return self._title
+
+
+@pytest.fixture
+def monitor(qapp, tmp_path):
+    monitor = homiBrowser.RendererMonitor(interval=3600000, log_path=str(tmp_path / 'renderers.jsonl'))
+    yield monitor
+    monitor.stop()
+
+
+def sample(monitor, count):
+    deadline = time.monotonic() + 5
+    while monitor.stats()['samples'] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return {sample['pid']: sample for sample in monitor.latest()}
+
+
+def test_tabs_are_grouped_by_renderer_with_cpu_and_memory(monitor, renderer, tmp_path):
+    views = [FakeView(renderer.pid, "https://a.example/", "A"),
+             FakeView(renderer.pid, "https://secret.example/", "Secret", private=True),
+             FakeView(0, "https://loading.example/", "Not started")]
+    for view in views:
+        monitor.attach(view)
+
+    monitor.collect()
+    sample(monitor, 1)
+    time.sleep(0.3)
+    monitor.collect()
+    samples = sample(monitor, 2)
+
+    assert set(samples) == {os.getpid(), renderer.pid}
+    assert samples[os.getpid()]['kind'] == 'browser'
+    busy = samples[renderer.pid]
+    assert (busy['kind'], busy['tabs'], busy['urls']) == ('renderer', ["A", "Private tab"], ["https://a.example/"])
+    assert busy['rss'] > 0
+    assert busy['cpu_percent'] > 20
+    with open(tmp_path / 'renderers.jsonl') as log:
+        assert len([json.loads(line) for line in log]) == 4
+
+
+def test_alerts_fire_when_a_threshold_is_crossed(qapp, monitor):
+    monitor.cpu_alert = 50
+    alerts = []
+    monitor.alert.connect(lambda sample, reason: alerts.append(reason))
+
+    monitor.check_alerts([{'pid': 10, 'rss': 0, 'cpu_percent': 90.0}])
+    monitor.check_alerts([{'pid': 10, 'rss': 0, 'cpu_percent': 95.0}])
+    monitor.check_alerts([{'pid': 10, 'rss': 0, 'cpu_percent': 5.0}])
+    monitor.check_alerts([{'pid': 10, 'rss': 0, 'cpu_percent': 80.0}])
+
+    assert alerts == ["CPU 90%", "CPU 80%"]
+
+
+def test_only_known_renderers_can_be_ended(monitor, renderer):
+    view = FakeView(renderer.pid, "https://a.example/", "A")
+    monitor.attach(view)
+
+    assert not monitor.kill(renderer.pid)
+    monitor.collect()
+    assert not monitor.kill(os.getpid())
+    assert monitor.kill(renderer.pid)
+    assert renderer.wait(5) == -9
+
+
+def test_terminations_are_recorded(monitor):
+    view = FakeView(0, "https://a.example/", "A")
+    monitor.attach(view)
+    events = []
+    monitor.renderer_terminated.connect(events.append)
+
+    view.renderProcessTerminated.emit(homiBrowser.QWebEnginePage.CrashedTerminationStatus, 11)
+
+    assert [(event['title'], event['status'], event['exit_code']) for event in events] == [("A", "crashed", 11)]
+    assert list(monitor.terminations) == events
@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+class FakeSettings:
+    saved = {}
+
+    def __init__(self, *args):
+        pass
+
+    def value(self, key, default=None, type=None):
+        return self.saved.get(key, default)
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.setattr(homiBrowser, 'QSettings', FakeSettings)
+    monkeypatch.setattr(FakeSettings, 'saved', {})
+    monkeypatch.setattr(homiBrowser.ProfileManager, 'resource_profile', homiBrowser.DEFAULT_RESOURCE_PROFILE)
+    return FakeSettings.saved
+
+
+def test_the_default_profile_adds_no_switches(settings):
+    assert homiBrowser.select_resource_profile(["homi", "https://example.com/"]) == ["homi", "https://example.com/"]
+    assert homiBrowser.ProfileManager.resource_profile == 'balanced'
+
+
+def test_the_saved_profile_switches_come_after_the_program(settings):
+    settings["performance/resource_profile"] = 'low-memory'
+
+    argv = homiBrowser.select_resource_profile(["homi", "https://example.com/"])
+
+    switches = homiBrowser.RESOURCE_PROFILES['low-memory']['switches']
+    assert argv == ["homi"] + switches + ["https://example.com/"]
+    assert homiBrowser.ProfileManager.resource_profile == 'low-memory'
+
+
+def test_the_command_line_wins_over_the_saved_profile(settings):
+    settings["performance/resource_profile"] = 'low-memory'
+
+    argv = homiBrowser.select_resource_profile(["homi", "--resource-profile=performance", "--new-instance"])
+
+    switches = homiBrowser.RESOURCE_PROFILES['performance']['switches']
+    assert argv == ["homi"] + switches + ["--new-instance"]
+    assert homiBrowser.ProfileManager.resource_profile == 'performance'
+
+
+@pytest.mark.parametrize('saved, arg', [('turbo', None), ('low-memory', "--resource-profile=")])
+def test_unknown_profiles_fall_back_to_the_default(settings, capsys, saved, arg):
+    settings["performance/resource_profile"] = saved
+
+    argv = homiBrowser.select_resource_profile(["homi"] + ([arg] if arg else []))
+
+    assert argv == ["homi"]
+    assert homiBrowser.ProfileManager.resource_profile == homiBrowser.DEFAULT_RESOURCE_PROFILE
+    assert "Unknown resource profile" in capsys.readouterr().out
+
+
+def test_every_profile_is_complete():
+    for profile in homiBrowser.RESOURCE_PROFILES.values():
+        assert set(profile) == {'description', 'switches', 'attributes', 'disk_cache_mb', 'private_cache_mb'}
+        assert all(switch.startswith('--') for switch in profile['switches'])
+        assert profile['private_cache_mb'] <= profile['disk_cache_mb']
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtWidgets import QLineEdit  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+@pytest.fixture
+def registry(qapp, db_path):
+    registry = homiBrowser.SearchEngineRegistry(db_path)
+    yield registry
+    registry.conn.close()
+
+
+def test_default_engine_and_keywords(registry):
+    assert registry.default()['name'] == "Google"
+    assert registry.by_keyword("DDG")['name'] == "DuckDuckGo"
+
+    engine, query, keyword_used = registry.resolve("ddg  qt signals ")
+    assert (engine['name'], query, keyword_used) == ("DuckDuckGo", "qt signals", True)
+    # A keyword on its own is searched for, not taken as a keyword.
+    engine, query, keyword_used = registry.resolve("ddg")
+    assert (engine['name'], query, keyword_used) == ("Google", "ddg", False)
+
+
+@pytest.mark.parametrize('text, url', [
+    ("https://example.com/a b", "https://example.com/a b"),
+    ("about:blank", "about:blank"),
+    ("example.com", "http://example.com"),
+    ("localhost:8000", "http://localhost:8000"),
+    ("python sqlite", "https://www.google.com/search?q=python+sqlite"),
+    ("b c++ & rust", "https://www.bing.com/search?q=c%2B%2B+%26+rust"),
+    ("ddg example.com", "https://duckduckgo.com/?q=example.com"),
+])
+def test_input_to_url(registry, text, url):
+    assert registry.input_to_url(text) == url
+
+
+def test_engines_are_added_removed_and_made_default(registry):
+    changes = []
+    registry.engines_changed.connect(lambda: changes.append(True))
+
+    registry.add("Wiki", "w", "https://en.wikipedia.org/w/index.php?search={searchTerms}")
+    assert registry.input_to_url("w Qt") == "https://en.wikipedia.org/w/index.php?search=Qt"
+    with pytest.raises(ValueError):
+        registry.add("Broken", "x", "https://example.com/search")
+
+    registry.set_default(registry.by_keyword("w")['id'])
+    assert registry.default()['name'] == "Wiki"
+    registry.remove(registry.default()['id'])
+    assert registry.default()['name'] == "Google"
+    assert len(changes) == 3
+
+
+class SuggestionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SuggestionRequestHandler)
+        self.queries = []
+
+
+class SuggestionRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)['q'][0]
+        self.server.queries.append(query)
+        body = json.dumps([query, [f"{query} {n}" for n in range(10)]]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = SuggestionServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_registry(registry, server):
+    host, port = server.server_address
+    registry.add("Local", "l", "https://local.example/?q={searchTerms}",
+                 f"http://{host}:{port}/suggest?q={{searchTerms}}")
+    registry.set_default(registry.by_keyword("l")['id'])
+    return registry
+
+
+def wait_for(qapp, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        qapp.processEvents()
+        time.sleep(0.005)
+
+
+def test_suggestions_are_debounced_and_cached(qapp, local_registry, server):
+    fetcher = homiBrowser.SearchSuggestionFetcher(local_registry)
+    ready = []
+    fetcher.suggestions_ready.connect(lambda text, suggestions: ready.append((text, suggestions)))
+
+    for text in ["q", "qt", "qt s"]:
+        fetcher.request(text)
+    wait_for(qapp, lambda: ready)
+
+    assert server.queries == ["qt s"]
+    assert ready == [("qt s", [f"qt s {n}" for n in range(fetcher.MAX_SUGGESTIONS)])]
+
+    fetcher.request("QT S")
+    assert ready[-1][0] == "QT S"
+    assert (fetcher.requests_sent, fetcher.cache_hits) == (1, 1)
+
+
+def test_engines_without_suggestions_send_nothing(qapp, registry):
+    fetcher = homiBrowser.SearchSuggestionFetcher(registry)
+    registry.add("Plain", "p", "https://plain.example/?q={searchTerms}")
+
+    fetcher.request("p anything")
+
+    assert not fetcher.debounce_timer.isActive()
+    assert fetcher.requests_sent == 0
+
+
+@pytest.mark.parametrize('private', [False, True])
+def test_private_windows_never_ask_for_suggestions(qapp, db_path, local_registry, private):
+    line_edit = QLineEdit()
+    completer = homiBrowser.OmniboxCompleter(line_edit, db_path, local_registry, is_private=lambda: private)
+    try:
+        line_edit.setText("qt")
+        completer.on_text_edited("qt")
+
+        assert completer.suggestions.debounce_timer.isActive() is not private
+    finally:
+        completer.shutdown()
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_session_owner_running():
+    assert homiBrowser.session_owner_running(f"{os.getppid()}-0")
+    assert not homiBrowser.session_owner_running(f"{os.getpid()}-3")
+    assert not homiBrowser.session_owner_running(f"{exited_pid()}-0")
+    # Rows from before session keys carried a pid.
+    assert not homiBrowser.session_owner_running(0)
+    assert not homiBrowser.session_owner_running("2")
+
+
+class OtherWindow:
+    opened = []
+
+    def __init__(self, db_path, session_tabs=None):
+        OtherWindow.opened.append(session_tabs)
+
+    def show(self):
+        pass
+
+
+@pytest.fixture
+def load_session(db_path, monkeypatch):
+    # load_session only needs the window's connection; the windows it opens
+    # for the other saved groups are recorded instead of created.
+    load_session = homiBrowser.WebBrowser.load_session
+    monkeypatch.setattr(homiBrowser, 'WebBrowser', OtherWindow)
+    OtherWindow.opened = []
+    conn = homiBrowser.connect_database(db_path)
+    window = types.SimpleNamespace(conn=conn, db_path=db_path)
+    yield lambda: load_session(window)
+    conn.close()
+
+
+def save(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany('''INSERT INTO session_tabs (window, position, url, title, history, active)
+                            VALUES (?, ?, ?, ?, NULL, ?)''', rows)
+    conn.close()
+
+
+def remaining(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT window, url FROM session_tabs ORDER BY window, position").fetchall()
+    finally:
+        conn.close()
+
+
+def test_every_saved_window_is_restored_once(db_path, load_session):
+    dead = exited_pid()
+    save(db_path, [
+        (f"{dead}-0", 1, "https://b.example/", "B", 1),
+        (f"{dead}-0", 0, "https://a.example/", "A", 0),
+        (f"{dead}-1", 0, "https://c.example/", "C", 1),
+        (7, 0, "https://old.example/", None, 1),
+    ])
+
+    first = load_session()
+
+    groups = [first] + OtherWindow.opened
+    assert sorted(tuple(url for url, _, _, _ in group) for group in groups) == [
+        ("https://a.example/", "https://b.example/"), ("https://c.example/",), ("https://old.example/",)]
+    assert remaining(db_path) == []
+    assert load_session() is None
+
+
+def test_windows_of_a_running_browser_are_left_alone(db_path, load_session):
+    running = f"{os.getppid()}-0"
+    save(db_path, [
+        (running, 0, "https://running.example/", None, 1),
+        (f"{exited_pid()}-0", 0, "https://crashed.example/", None, 1),
+    ])
+
+    assert [url for url, _, _, _ in load_session()] == ["https://crashed.example/"]
+    assert OtherWindow.opened == []
+    assert remaining(db_path) == [(running, "https://running.example/")]
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QUrl  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+@pytest.fixture
+def primary(qapp, db_path):
+    primary = homiBrowser.SingleInstance(db_path)
+    assert primary.listen()
+    received = []
+    primary.urls_received.connect(received.append)
+    primary.received = received
+    yield primary
+    primary.close()
+
+
+def forward(qapp, instance, urls):
+    # The second launch is another process in real use; here it blocks in a
+    # thread while this one runs the primary's event loop.
+    result = []
+    thread = threading.Thread(target=lambda: result.append(instance.forward(urls)))
+    thread.start()
+    while thread.is_alive():
+        qapp.processEvents()
+        time.sleep(0.005)
+    qapp.processEvents()
+    return result[0]
+
+
+def test_forward_without_a_running_instance_fails(qapp, db_path):
+    assert homiBrowser.SingleInstance(db_path).forward(["https://example.com/"]) is False
+
+
+def test_urls_are_forwarded_to_the_running_instance(qapp, db_path, primary):
+    urls = ["https://example.com/", "file:///tmp/page.html"]
+
+    assert forward(qapp, homiBrowser.SingleInstance(db_path), urls)
+    assert primary.received == [urls]
+
+
+def test_urls_forwarded_during_startup_wait_for_release(qapp, db_path, primary):
+    primary.hold()
+
+    assert forward(qapp, homiBrowser.SingleInstance(db_path), ["https://a.example/"])
+    assert forward(qapp, homiBrowser.SingleInstance(db_path), ["https://b.example/"])
+    assert primary.received == []
+
+    primary.release()
+    assert primary.received == [["https://a.example/", "https://b.example/"]]
+    primary.release()
+    assert len(primary.received) == 1
+
+
+def test_only_one_instance_listens_per_profile(qapp, db_path, tmp_path, primary):
+    assert not homiBrowser.SingleInstance(db_path).listen()
+
+    other = homiBrowser.SingleInstance(str(tmp_path / 'other.db'))
+    assert other.listen()
+    other.close()
+
+
+def test_launch_urls_skip_options_and_resolve_paths(tmp_path, monkeypatch):
+    (tmp_path / 'page.html').write_text("<p>hi</p>")
+    monkeypatch.chdir(tmp_path)
+
+    urls = homiBrowser.launch_urls(["--new-window", "page.html", "example.com", "https://example.com/a?b=1"])
+
+    assert urls == [QUrl.fromLocalFile(str(tmp_path / 'page.html')).toString(),
+                    "http://example.com", "https://example.com/a?b=1"]
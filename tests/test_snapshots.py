@@ -0,0 +1,171 @@
+import base64
+import quopri
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QObject, QUrl  # noqa: E402
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestJob, QWebEngineUrlScheme  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+BOUNDARY = "----MultipartBoundary--test----"
+
+
+def mhtml(parts, newline="\r\n"):
+    # Laid out the way Chromium saves a page.
+    lines = [
+        "From: <Saved by Blink>",
+        "Snapshot-Content-Location: https://example.com/",
+        "Subject: Example",
+        "MIME-Version: 1.0",
+        f'Content-Type: multipart/related;{newline}\ttype="text/html";{newline}\tboundary="{BOUNDARY}"',
+        "",
+    ]
+    for headers, body in parts:
+        lines += [f"--{BOUNDARY}"] + headers + ["", body]
+    lines.append(f"--{BOUNDARY}--")
+    lines.append("")
+    return newline.join(lines).encode('ascii')
+
+
+PAGE = "<html><head><title>Café</title></head><body>" + "long line of text " * 10 + "</body></html>"
+IMAGE = bytes(range(256)) * 4
+
+
+def test_parts_are_decoded_in_order():
+    data = mhtml([
+        (["Content-Type: text/html; charset=utf-8", "Content-Transfer-Encoding: quoted-printable",
+          "Content-Location: https://example.com/"],
+         quopri.encodestring(PAGE.encode('utf-8')).decode('ascii').replace("\n", "\r\n")),
+        (["Content-Type: image/png", "Content-Transfer-Encoding: base64",
+          "Content-Location: https://example.com/logo.png"],
+         base64.encodebytes(IMAGE).decode('ascii').replace("\n", "\r\n")),
+        (["Content-Type: text/css", "Content-Transfer-Encoding: binary", "Content-ID: <frame-1@mhtml.blink>"],
+         "body { color: red }"),
+    ])
+
+    parts = homiBrowser.SnapshotStore.parse(data)
+
+    assert parts == [
+        ("https://example.com/", None, "text/html; charset=utf-8", PAGE.encode('utf-8')),
+        ("https://example.com/logo.png", None, "image/png", IMAGE),
+        (None, "frame-1@mhtml.blink", "text/css", b"body { color: red }"),
+    ]
+
+
+def test_bare_newlines_and_folded_locations():
+    data = mhtml([
+        (["Content-Type: text/html", "Content-Location: https://example.com/a/very/long/",
+          " path/page.html"], "<p>hi</p>"),
+    ], newline="\n")
+
+    assert homiBrowser.SnapshotStore.parse(data) == [
+        ("https://example.com/a/very/long/path/page.html", None, "text/html", b"<p>hi</p>"),
+    ]
+
+
+def test_anything_after_the_closing_boundary_is_ignored():
+    data = mhtml([(["Content-Type: text/html"], "<p>hi</p>")]) + f"--{BOUNDARY}\r\n\r\ntrailer".encode()
+
+    assert len(homiBrowser.SnapshotStore.parse(data)) == 1
+
+
+@pytest.mark.parametrize('data', [
+    b"<html><body>not multipart</body></html>",
+    b"Content-Type: multipart/related\r\n\r\nno boundary",
+    f'Content-Type: multipart/related; boundary="{BOUNDARY}"\r\n\r\n--{BOUNDARY}--\r\n'.encode(),
+])
+def test_other_files_are_rejected(data):
+    with pytest.raises(ValueError):
+        homiBrowser.SnapshotStore.parse(data)
+
+
+def test_base_is_added_once_inside_head():
+    page = homiBrowser.SnapshotStore.add_base(b"<html><HEAD lang=en><title>t</title></HEAD></html>",
+                                              "https://example.com/a?b=1&c=2")
+
+    assert page == (b'<html><HEAD lang=en><base href="https://example.com/a?b=1&amp;c=2">'
+                    b'<title>t</title></HEAD></html>')
+    assert homiBrowser.SnapshotStore.add_base(page, "https://other.example/") == page
+
+
+def test_snapshot_urls_round_trip():
+    url = homiBrowser.SnapshotStore.snapshot_url(12, "https://example.com/static/site.css")
+
+    assert url == f"{homiBrowser.SNAPSHOT_SCHEME}://s12/https/example.com/static/site.css"
+    assert homiBrowser.SnapshotStore.snapshot_id("s12") == 12
+    assert homiBrowser.SnapshotStore.snapshot_id("12") is None
+
+
+class FakeJob(QObject):
+    # The handler parents its reply buffer to the job, as with a real one.
+    def __init__(self, url):
+        super().__init__()
+        self.url = QUrl(url)
+        self.error = None
+        self.content_type = None
+        self.body = None
+
+    def requestUrl(self):
+        return self.url
+
+    def fail(self, error):
+        self.error = error
+
+    def reply(self, content_type, device):
+        self.content_type = bytes(content_type).decode()
+        self.body = bytes(device.readAll())
+
+
+@pytest.fixture
+def store(qapp, db_path):
+    store = homiBrowser.SnapshotStore(db_path)
+    store.saved_id, _ = store.write(store.conn, "https://example.com/page", "Example", [
+        ("https://example.com/page", None, "text/html", b"<html><head></head><body>Saved</body></html>"),
+        ("https://example.com/logo.png", None, "image/png", IMAGE),
+        ("https://example.com/search?q=a", None, "application/json", b"[]"),
+    ])
+    yield store
+    store.stop()
+
+
+def load(handler, url):
+    job = FakeJob(url)
+    handler.requestStarted(job)
+    return job
+
+
+def test_snapshot_scheme_is_registered(qapp):
+    scheme = QWebEngineUrlScheme.schemeByName(homiBrowser.SNAPSHOT_SCHEME.encode())
+
+    assert bytes(scheme.name()).decode() == homiBrowser.SNAPSHOT_SCHEME
+    assert scheme.syntax() == QWebEngineUrlScheme.Syntax.Host
+
+
+def test_scheme_handler_serves_the_page_and_its_resources(store):
+    snapshot_id = store.saved_id
+    handler = store.scheme_handler
+
+    page = load(handler, homiBrowser.SnapshotStore.snapshot_url(snapshot_id))
+    assert page.error is None
+    assert page.content_type == "text/html"
+    assert page.body == b'<html><head><base href="https://example.com/page"></head><body>Saved</body></html>'
+
+    logo = load(handler, homiBrowser.SnapshotStore.snapshot_url(snapshot_id, "https://example.com/logo.png"))
+    assert (logo.content_type, logo.body) == ("image/png", IMAGE)
+
+    search = load(handler, homiBrowser.SnapshotStore.snapshot_url(snapshot_id, "https://example.com/search?q=a"))
+    assert search.body == b"[]"
+
+
+def test_scheme_handler_fails_unknown_snapshots_and_resources(store):
+    snapshot_id = store.saved_id
+    handler = store.scheme_handler
+
+    missing = load(handler, homiBrowser.SnapshotStore.snapshot_url(snapshot_id, "https://elsewhere.example/x.js"))
+    assert missing.error == QWebEngineUrlRequestJob.UrlNotFound
+    assert load(handler, homiBrowser.SnapshotStore.snapshot_url(snapshot_id + 1)).error == \
+        QWebEngineUrlRequestJob.UrlNotFound
+    assert load(handler, f"{homiBrowser.SNAPSHOT_SCHEME}://example/").error == QWebEngineUrlRequestJob.UrlInvalid
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+@pytest.fixture
+def report_path(tmp_path):
+    return str(tmp_path / 'startup.jsonl')
+
+
+def test_marks_are_kept_from_their_first_occurrence(report_path):
+    profiler = homiBrowser.StartupProfiler(report_path)
+    profiler.mark('first_paint')
+    first = profiler.marks['first_paint']
+    profiler.mark('first_paint')
+    profiler.mark('deferred_init')
+
+    assert list(profiler.marks) == ['imports', 'first_paint', 'deferred_init']
+    assert profiler.marks['first_paint'] == first
+    assert 0 <= profiler.marks['imports'] <= first <= profiler.marks['deferred_init']
+
+
+def test_each_run_appends_one_report(report_path, capsys):
+    for _ in range(2):
+        profiler = homiBrowser.StartupProfiler(report_path)
+        profiler.mark('first_paint')
+        profiler.write_report()
+        profiler.write_report()
+
+    with open(report_path) as report:
+        records = [json.loads(line) for line in report]
+    assert len(records) == 2
+    assert set(records[1]['marks']) == {'imports', 'first_paint'}
+    output = capsys.readouterr().out
+    assert output.count("Startup profile") == 2
+    assert output.count("vs previous run") == 2
+
+
+@pytest.mark.parametrize('contents', ["", "not json\n", '{"recorded_at": "x"}\n'])
+def test_unreadable_previous_runs_are_ignored(report_path, contents):
+    with open(report_path, 'w') as report:
+        report.write(contents)
+
+    assert homiBrowser.StartupProfiler(report_path).previous_run() is None
+
+
+def test_missing_report_has_no_previous_run(report_path):
+    assert homiBrowser.StartupProfiler(report_path).previous_run() is None
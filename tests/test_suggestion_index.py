@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+import homiBrowser  # noqa: E402
+
+
+@pytest.fixture
+def index(db_path):
+    conn = homiBrowser.connect_database(db_path)
+    now = time.time()
+    with conn:
+        conn.executemany("INSERT INTO urls (url, title, visit_count, frecency) VALUES (?, ?, ?, ?)", [
+            ("https://docs.python.org/3/library/sqlite3.html", "sqlite3 - Python docs", 40,
+             homiBrowser.visit_frecency(now)),
+            ("https://www.sqlite.org/fts5.html", "SQLite FTS5 Extension", 3,
+             homiBrowser.visit_frecency(now - 30 * 24 * 3600)),
+            ("https://example.com/", "Example Domain", 1,
+             homiBrowser.visit_frecency(now - 365 * 24 * 3600)),
+        ])
+        conn.execute("INSERT INTO bookmarks (title, url) VALUES (?, ?)",
+                     ("Qt for Python", "https://doc.qt.io/qtforpython/"))
+    conn.close()
+    index = homiBrowser.SuggestionIndex(db_path)
+    yield index
+    index.close()
+
+
+def urls(results):
+    return [url for url, _ in results]
+
+
+def test_results_are_ranked_by_frecency(index):
+    assert urls(index.search("sqlite")) == ["https://docs.python.org/3/library/sqlite3.html",
+                                            "https://www.sqlite.org/fts5.html"]
+
+
+def test_every_word_must_match(index):
+    assert urls(index.search("sqlite extension")) == ["https://www.sqlite.org/fts5.html"]
+    assert index.search("sqlite nowhere") == []
+
+
+def test_matching_is_case_insensitive_over_url_and_title(index):
+    assert urls(index.search("EXAMPLE domain")) == ["https://example.com/"]
+
+
+def test_unvisited_bookmarks_are_suggested(index):
+    assert urls(index.search("qt python")) == ["https://doc.qt.io/qtforpython/"]
+
+
+def test_blank_input_has_no_suggestions(index):
+    assert index.search("   ") == []
+
+
+def test_limit(index):
+    assert len(index.search("https", limit=2)) == 2
+
+
+def test_entries_outside_the_hot_set_come_from_the_full_text_index(index, monkeypatch):
+    monkeypatch.setattr(homiBrowser.SuggestionIndex, 'HOT_SIZE', 1)
+    index.refresh_hot()
+    assert "https://example.com/" not in urls(index.hot_entries)
+
+    assert urls(index.search("exam")) == ["https://example.com/"]
+
+
+def test_punctuation_is_matched_literally(index):
+    assert urls(index.search("/3/library/sqlite3.")) == ["https://docs.python.org/3/library/sqlite3.html"]
+
+
+def test_hot_set_reloads_after_other_connections_write(index, db_path, monkeypatch):
+    assert index.search("newly") == []
+    conn = homiBrowser.connect_database(db_path)
+    with conn:
+        conn.execute("INSERT INTO urls (url, title, frecency) VALUES (?, ?, ?)",
+                     ("https://newly.example/", "Newly visited", homiBrowser.visit_frecency(time.time())))
+    conn.close()
+
+    assert not index.hot_is_stale()
+    monkeypatch.setattr(homiBrowser.SuggestionIndex, 'HOT_TTL', 0.0)
+    assert index.hot_is_stale()
+    assert urls(index.search("newly")) == ["https://newly.example/"]
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QObject, QUrl, pyqtSignal  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+class FakeView(QObject):
+    urlChanged = pyqtSignal(QUrl)
+    titleChanged = pyqtSignal(str)
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def dispatcher(qapp, events):
+    dispatcher = homiBrowser.TabEventDispatcher()
+    dispatcher.url_changed.connect(lambda view, url: events.append((view, 'url', url.toString())))
+    dispatcher.title_changed.connect(lambda view, title: events.append((view, 'title', title)))
+    return dispatcher
+
+
+def test_bursts_collapse_to_the_latest_value_per_tab(dispatcher, events):
+    first, second = FakeView(), FakeView()
+    dispatcher.attach(first)
+    dispatcher.attach(second)
+
+    for n in range(10):
+        first.urlChanged.emit(QUrl(f"https://example.com/{n}"))
+    first.titleChanged.emit("Loading")
+    first.titleChanged.emit("Example")
+    second.titleChanged.emit("Other")
+    assert events == []
+
+    dispatcher.flush()
+
+    assert events == [(first, 'url', "https://example.com/9"), (first, 'title', "Example"),
+                      (second, 'title', "Other")]
+    assert (dispatcher.received, dispatcher.delivered) == (13, 3)
+
+
+def test_events_are_delivered_on_the_next_frame(qapp, dispatcher, events):
+    view = FakeView()
+    dispatcher.attach(view)
+    view.titleChanged.emit("Example")
+    assert dispatcher.timer.isActive()
+
+    deadline = time.monotonic() + 2
+    while not events and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+
+    assert events == [(view, 'title', "Example")]
+    assert not dispatcher.timer.isActive()
+
+
+def test_detached_tabs_deliver_nothing(dispatcher, events):
+    view = FakeView()
+    dispatcher.attach(view)
+    view.urlChanged.emit(QUrl("https://example.com/"))
+
+    dispatcher.detach(view)
+    dispatcher.flush()
+
+    assert events == []
@@ -0,0 +1,96 @@
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtGui import QPixmap  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+
+def test_fuzzy_score_prefers_substrings_then_word_starts():
+    text = "python documentation https://docs.python.org/"
+
+    assert homiBrowser.fuzzy_score(["docs"], text) > homiBrowser.fuzzy_score(["pydoc"], text)
+    assert homiBrowser.fuzzy_score(["pd"], text) > homiBrowser.fuzzy_score(["yt"], "xyzxt")
+    assert homiBrowser.fuzzy_score(["python", "zzz"], text) is None
+    assert homiBrowser.fuzzy_score(["tdocp"], text) is not None
+    assert homiBrowser.fuzzy_score(["pdx"], text) is None
+
+
+@pytest.fixture
+def index():
+    index = homiBrowser.TabIndex()
+    for tab, url, title in [('docs', "https://docs.python.org/3/", "Python docs"),
+                            ('qt', "https://doc.qt.io/", "Qt Documentation"),
+                            ('news', "https://news.example/", "News")]:
+        index.update(tab, url, title)
+    for tab in ['news', 'qt', 'docs']:
+        index.touch(tab)
+    return index
+
+
+def test_empty_query_lists_tabs_most_recent_first(index):
+    assert index.search("") == ['docs', 'qt', 'news']
+    index.touch('news')
+    assert index.search("  ") == ['news', 'docs', 'qt']
+    assert index.search("", limit=1) == ['news']
+
+
+def test_matches_are_ranked_by_score(index):
+    assert index.search("python") == ['docs']
+    # Both contain "doc"; the earlier hit ranks first.
+    assert index.search("DOC") == ['qt', 'docs']
+    assert index.search("pydoc") == ['docs']
+    assert index.search("qt documentation") == ['qt']
+    assert index.search("missing") == []
+
+
+def test_equal_matches_are_ranked_by_recency():
+    index = homiBrowser.TabIndex()
+    index.update('first', "https://a.example/", "Mail")
+    index.update('second', "https://b.example/", "Mail")
+    index.touch('first')
+
+    assert index.search("mail") == ['first', 'second']
+    index.touch('second')
+    assert index.search("mail") == ['second', 'first']
+
+
+def test_new_tabs_count_as_least_recent(index):
+    index.update('background', "https://background.example/", "")
+
+    assert index.recent()[-1] == 'background'
+
+
+def test_updates_change_what_matches(index):
+    index.update('news', title="Weather")
+
+    assert index.search("weather") == ['news']
+    assert index.search("news") == ['news']
+
+
+def test_replaced_widget_keeps_its_place_and_thumbnail(qapp, index):
+    pixmap = QPixmap(640, 400)
+    pixmap.fill()
+    index.set_thumbnail('qt', pixmap)
+
+    index.replace('qt', 'qt-view')
+
+    assert index.recent() == ['docs', 'qt-view', 'news']
+    assert index.thumbnail('qt') is None
+    assert index.thumbnail('qt-view').size().width() == 160
+    index.remove('qt-view')
+    assert index.search("") == ['docs', 'news']
+    assert index.thumbnail('qt-view') is None
+
+
+def test_thumbnails_are_bounded(qapp, index, monkeypatch):
+    monkeypatch.setattr(homiBrowser.TabIndex, 'THUMBNAIL_LIMIT', 2)
+    pixmap = QPixmap(32, 32)
+    pixmap.fill()
+
+    for tab in ['docs', 'qt', 'news']:
+        index.set_thumbnail(tab, pixmap)
+    index.set_thumbnail('closed', pixmap)
+
+    assert [tab for tab in ['docs', 'qt', 'news', 'closed'] if index.thumbnail(tab)] == ['qt', 'news']
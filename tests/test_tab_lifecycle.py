@@ -0,0 +1,176 @@
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from PyQt5.QtCore import QObject, QPointF, QUrl, pyqtSignal  # noqa: E402
+
+import homiBrowser  # noqa: E402
+
+LifecycleState = homiBrowser.QWebEnginePage.LifecycleState
+
+
+class FakePage(QObject):
+    loadFinished = pyqtSignal(bool)
+
+    def __init__(self, pid):
+        super().__init__()
+        self.pid = pid
+        self.audible = False
+        self.states = []
+        self.scripts = []
+
+    def recentlyAudible(self):
+        return self.audible
+
+    def renderProcessPid(self):
+        return self.pid
+
+    def scrollPosition(self):
+        return QPointF(0, 480)
+
+    def setLifecycleState(self, state):
+        self.states.append(state)
+
+    def runJavaScript(self, script):
+        self.scripts.append(script)
+
+
+class FakeView:
+    def __init__(self, n):
+        self._page = FakePage(1000 + n)
+        self._url = QUrl(f"https://tab{n}.example/")
+        self._title = f"Tab {n}"
+
+    def page(self):
+        return self._page
+
+    def url(self):
+        return self._url
+
+    def title(self):
+        return self._title
+
+
+class FakeTabs(QObject):
+    currentChanged = pyqtSignal(int)
+
+    def __init__(self, views):
+        super().__init__()
+        self.views = views
+        self.current = 0
+        self.tooltips = {}
+
+    def count(self):
+        return len(self.views)
+
+    def widget(self, index):
+        return self.views[index]
+
+    def currentWidget(self):
+        return self.views[self.current]
+
+    def indexOf(self, view):
+        return self.views.index(view) if view in self.views else -1
+
+    def setTabToolTip(self, index, text):
+        self.tooltips[index] = text
+
+    def select(self, index):
+        self.current = index
+        self.currentChanged.emit(index)
+
+
+@pytest.fixture
+def tabs(qapp, monkeypatch):
+    monkeypatch.setattr(homiBrowser, 'QWebEngineView', FakeView)
+    monkeypatch.setattr(homiBrowser.TabLifecycleManager, 'HAS_LIFECYCLE_API', True)
+    return FakeTabs([FakeView(n) for n in range(5)])
+
+
+def make_manager(tabs, **options):
+    options.setdefault('freeze_after', 3600)
+    manager = homiBrowser.TabLifecycleManager(tabs, check_interval=3600000, **options)
+    # Tab n was last used n minutes ago.
+    now = time.monotonic()
+    for n, view in enumerate(tabs.views):
+        manager.last_active[view] = now - 60 * n
+    return manager
+
+
+def discarded(tabs, manager):
+    return [n for n, view in enumerate(tabs.views) if manager.is_discarded(view)]
+
+
+def test_lru_discards_the_least_recently_used_tabs(tabs):
+    manager = make_manager(tabs, max_live_tabs=3)
+
+    manager.check()
+
+    assert discarded(tabs, manager) == [3, 4]
+    assert tabs.views[4].page().states == [LifecycleState.Discarded]
+    assert tabs.tooltips[4] == "Tab 4 (hibernated)"
+    assert manager.stats()['live'] == 3
+
+
+def test_current_pinned_and_audible_tabs_are_kept(tabs):
+    manager = make_manager(tabs, max_live_tabs=1)
+    tabs.current = 4
+    manager.set_pinned(tabs.views[3], True)
+    tabs.views[2].page().audible = True
+
+    manager.check()
+
+    assert discarded(tabs, manager) == [0, 1]
+
+
+def test_idle_policy_discards_tabs_unused_for_the_timeout(tabs):
+    manager = make_manager(tabs, policy="idle", idle_timeout=150)
+
+    manager.check()
+
+    assert discarded(tabs, manager) == [3, 4]
+
+
+def test_rss_policy_discards_until_under_the_budget(tabs, monkeypatch):
+    memory = {pid: 100 for pid in range(1000, 1005)}
+    monkeypatch.setattr(homiBrowser, 'read_process_memory', lambda pid: memory.get(pid, 0))
+    manager = make_manager(tabs, policy="rss", rss_budget=250)
+
+    manager.check()
+
+    assert discarded(tabs, manager) == [2, 3, 4]
+
+
+def test_idle_tabs_are_frozen_and_thawed_when_selected(tabs):
+    manager = make_manager(tabs, freeze_after=90, max_live_tabs=5)
+
+    manager.check()
+    assert manager.frozen == {tabs.views[2], tabs.views[3], tabs.views[4]}
+    assert tabs.views[2].page().states == [LifecycleState.Frozen]
+
+    tabs.select(2)
+
+    assert tabs.views[2] not in manager.frozen
+    assert tabs.views[2].page().states == [LifecycleState.Frozen, LifecycleState.Active]
+
+
+def test_selecting_a_discarded_tab_restores_it_and_its_scroll_position(tabs):
+    manager = make_manager(tabs, max_live_tabs=4)
+    manager.check()
+    page = tabs.views[4].page()
+
+    tabs.select(4)
+
+    assert not manager.is_discarded(tabs.views[4])
+    assert page.states == [LifecycleState.Discarded, LifecycleState.Active]
+    assert tabs.tooltips[4] == "Tab 4"
+    page.loadFinished.emit(True)
+    page.loadFinished.emit(True)
+    assert page.scripts == ["window.scrollTo(0.0, 480.0);"]
+
+
+def test_unknown_policy(tabs):
+    with pytest.raises(ValueError):
+        homiBrowser.TabLifecycleManager(tabs, policy="random")